@@ -2,10 +2,11 @@
 Activity Log Utility
 Aggregates activities from various models into a unified activity feed for admin monitoring.
 """
+import heapq
 from django.db.models import Q, Prefetch
 from django.utils import timezone
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional
 from .models import (
     User, CustomerProfile, Account, LedgerEntry, 
     KYCDocument, Loan, VirtualCard, TaxRefundApplication,
@@ -290,7 +291,7 @@ def get_platform_activity(
     user_filter = Q(created_by_id=user_id) if user_id else Q()
     
     # Recent Transactions
-    for entry in LedgerEntry.objects.filter(date_filter).order_by('-created_at')[:limit]:
+    for entry in LedgerEntry.objects.filter(date_filter).select_related('created_by__profile').order_by('-created_at')[:limit]:
         customer = entry.created_by.profile if hasattr(entry.created_by, 'profile') else None
         activities.append(format_activity_entry(
             activity_type=ActivityType.TRANSACTION_CREATED,
@@ -304,7 +305,7 @@ def get_platform_activity(
         ))
     
     # Recent KYC Submissions
-    for doc in KYCDocument.objects.filter(uploaded_at__gte=date_from, uploaded_at__lte=date_to).order_by('-uploaded_at')[:50]:
+    for doc in KYCDocument.objects.filter(uploaded_at__gte=date_from, uploaded_at__lte=date_to).select_related('customer__user').order_by('-uploaded_at')[:50]:
         activities.append(format_activity_entry(
             activity_type=ActivityType.KYC_SUBMITTED,
             timestamp=doc.uploaded_at,
@@ -314,7 +315,7 @@ def get_platform_activity(
         ))
     
     # Recent Loans
-    for loan in Loan.objects.filter(application_date__gte=date_from, application_date__lte=date_to).order_by('-application_date')[:50]:
+    for loan in Loan.objects.filter(application_date__gte=date_from, application_date__lte=date_to).select_related('customer__user').order_by('-application_date')[:50]:
         activities.append(format_activity_entry(
             activity_type=ActivityType.LOAN_APPLIED,
             timestamp=loan.application_date,
@@ -325,7 +326,7 @@ def get_platform_activity(
         ))
     
     # Recent Virtual Cards
-    for card in VirtualCard.objects.filter(created_at__gte=date_from, created_at__lte=date_to).order_by('-created_at')[:50]:
+    for card in VirtualCard.objects.filter(created_at__gte=date_from, created_at__lte=date_to).select_related('customer__user').order_by('-created_at')[:50]:
         activities.append(format_activity_entry(
             activity_type=ActivityType.VIRTUAL_CARD_REQUESTED,
             timestamp=card.created_at,
@@ -335,7 +336,7 @@ def get_platform_activity(
         ))
     
     # Recent Tax Refunds
-    for tax_app in TaxRefundApplication.objects.filter(created_at__gte=date_from, created_at__lte=date_to).order_by('-created_at')[:50]:
+    for tax_app in TaxRefundApplication.objects.filter(created_at__gte=date_from, created_at__lte=date_to).select_related('customer__user').order_by('-created_at')[:50]:
         activities.append(format_activity_entry(
             activity_type=ActivityType.TAX_REFUND_SUBMITTED,
             timestamp=tax_app.submitted_at or tax_app.created_at,
@@ -346,7 +347,7 @@ def get_platform_activity(
         ))
     
     # Recent Grants
-    for grant_app in GrantApplication.objects.filter(created_at__gte=date_from, created_at__lte=date_to).order_by('-created_at')[:50]:
+    for grant_app in GrantApplication.objects.filter(created_at__gte=date_from, created_at__lte=date_to).select_related('customer__user', 'grant').order_by('-created_at')[:50]:
         activities.append(format_activity_entry(
             activity_type=ActivityType.GRANT_APPLIED,
             timestamp=grant_app.submitted_at or grant_app.created_at,
@@ -357,7 +358,7 @@ def get_platform_activity(
         ))
     
     # Recent Support Messages
-    for msg in SupportMessage.objects.filter(created_at__gte=date_from, created_at__lte=date_to).order_by('-created_at')[:50]:
+    for msg in SupportMessage.objects.filter(created_at__gte=date_from, created_at__lte=date_to).select_related('conversation__customer__user').order_by('-created_at')[:50]:
         customer = msg.conversation.customer
         activities.append(format_activity_entry(
             activity_type=ActivityType.SUPPORT_MESSAGE,
@@ -379,3 +380,256 @@ def get_platform_activity(
         activities = [a for a in activities if a['user_id'] == user_id]
     
     return activities[:limit]
+
+
+# ============ Streaming Export ============
+
+EXPORT_CHUNK_SIZE = 2000
+
+ACTIVITY_EXPORT_FIELDS = [
+    'activity_type', 'timestamp', 'user_id', 'user_email', 'user_name',
+    'description', 'reference', 'amount', 'status', 'actor_id', 'actor_email',
+    'metadata',
+]
+
+LEDGER_EXPORT_FIELDS = [
+    'entry_id', 'reference', 'entry_type', 'status', 'created_at',
+    'created_by_id', 'created_by_email', 'approved_by_email', 'approved_at',
+    'memo', 'account_number', 'account_owner_email', 'direction', 'amount',
+    'description',
+]
+
+
+def _default_export_range(date_from: datetime = None, date_to: datetime = None):
+    if not date_from:
+        date_from = timezone.now() - timedelta(days=30)
+    if not date_to:
+        date_to = timezone.now()
+    return date_from, date_to
+
+
+def _activity_sources(user_id: int = None):
+    """
+    Describe every activity source as (activity_type, queryset, timestamp field, builder).
+
+    Each queryset is already ordered newest first on its timestamp field and
+    joins everything its builder touches, so rows can be streamed straight
+    from a server-side cursor without per-row queries.
+    """
+    def _user_q(path):
+        return Q(**{path: user_id}) if user_id else Q()
+
+    def ledger_entry(entry):
+        creator = entry.created_by
+        return format_activity_entry(
+            activity_type=ActivityType.TRANSACTION_CREATED,
+            timestamp=entry.created_at,
+            user=creator,
+            customer=getattr(creator, 'profile', None),
+            description=f"{entry.get_entry_type_display()}: {entry.memo}",
+            reference=entry.reference,
+            status=entry.status,
+            metadata={'entry_type': entry.entry_type},
+        )
+
+    def kyc_document(doc):
+        return format_activity_entry(
+            activity_type=ActivityType.KYC_SUBMITTED,
+            timestamp=doc.uploaded_at,
+            customer=doc.customer,
+            description=f"KYC document uploaded: {doc.get_document_type_display()}",
+            status=doc.status,
+        )
+
+    def loan(obj):
+        return format_activity_entry(
+            activity_type=ActivityType.LOAN_APPLIED,
+            timestamp=obj.application_date,
+            customer=obj.customer,
+            description=f"Loan application: {obj.get_loan_type_display()}",
+            amount=float(obj.requested_amount),
+            status=obj.status,
+        )
+
+    def virtual_card(card):
+        return format_activity_entry(
+            activity_type=ActivityType.VIRTUAL_CARD_REQUESTED,
+            timestamp=card.created_at,
+            customer=card.customer,
+            description=f"Virtual card requested: {card.get_card_type_display()}",
+            status=card.status,
+        )
+
+    def tax_refund(tax_app):
+        return format_activity_entry(
+            activity_type=ActivityType.TAX_REFUND_SUBMITTED,
+            timestamp=tax_app.created_at,
+            customer=tax_app.customer,
+            description=f"Tax refund: {tax_app.application_number}",
+            amount=float(tax_app.estimated_refund) if tax_app.estimated_refund else None,
+            status=tax_app.status,
+            metadata={'submitted_at': tax_app.submitted_at.isoformat() if tax_app.submitted_at else None},
+        )
+
+    def grant_application(grant_app):
+        return format_activity_entry(
+            activity_type=ActivityType.GRANT_APPLIED,
+            timestamp=grant_app.created_at,
+            customer=grant_app.customer,
+            description=f"Grant: {grant_app.grant.title}",
+            amount=float(grant_app.requested_amount),
+            status=grant_app.status,
+            metadata={'submitted_at': grant_app.submitted_at.isoformat() if grant_app.submitted_at else None},
+        )
+
+    def support_message(msg):
+        return format_activity_entry(
+            activity_type=ActivityType.SUPPORT_MESSAGE,
+            timestamp=msg.created_at,
+            customer=msg.conversation.customer,
+            description=f"Support message from {msg.get_sender_type_display()}",
+            metadata={'sender_type': msg.sender_type, 'conversation_id': msg.conversation_id},
+        )
+
+    def crypto_deposit(crypto):
+        return format_activity_entry(
+            activity_type=ActivityType.CRYPTO_DEPOSIT_INITIATED,
+            timestamp=crypto.created_at,
+            customer=crypto.customer,
+            description=f"Crypto deposit: {crypto.crypto_wallet.get_crypto_type_display()}",
+            amount=float(crypto.amount_usd),
+            status=crypto.verification_status,
+        )
+
+    return [
+        (ActivityType.TRANSACTION_CREATED,
+         LedgerEntry.objects.filter(_user_q('created_by_id')).select_related('created_by__profile'),
+         'created_at', ledger_entry),
+        (ActivityType.KYC_SUBMITTED,
+         KYCDocument.objects.filter(_user_q('customer__user_id')).select_related('customer__user'),
+         'uploaded_at', kyc_document),
+        (ActivityType.LOAN_APPLIED,
+         Loan.objects.filter(_user_q('customer__user_id')).select_related('customer__user'),
+         'application_date', loan),
+        (ActivityType.VIRTUAL_CARD_REQUESTED,
+         VirtualCard.objects.filter(_user_q('customer__user_id')).select_related('customer__user'),
+         'created_at', virtual_card),
+        (ActivityType.TAX_REFUND_SUBMITTED,
+         TaxRefundApplication.objects.filter(_user_q('customer__user_id')).select_related('customer__user'),
+         'created_at', tax_refund),
+        (ActivityType.GRANT_APPLIED,
+         GrantApplication.objects.filter(_user_q('customer__user_id')).select_related('customer__user', 'grant'),
+         'created_at', grant_application),
+        (ActivityType.SUPPORT_MESSAGE,
+         SupportMessage.objects.filter(_user_q('conversation__customer__user_id')).select_related('conversation__customer__user'),
+         'created_at', support_message),
+        (ActivityType.CRYPTO_DEPOSIT_INITIATED,
+         CryptoDeposit.objects.filter(_user_q('customer__user_id')).select_related('customer__user', 'crypto_wallet'),
+         'created_at', crypto_deposit),
+    ]
+
+
+def iter_platform_activity(
+    activity_types: List[str] = None,
+    user_id: int = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream platform-wide activities for export, newest first.
+
+    Unlike get_platform_activity there is no limit: each source is read through
+    a server-side cursor (``iterator(chunk_size=...)``) and the per-source streams
+    are merged lazily, so memory stays flat regardless of the number of rows.
+    Filters are pushed down into SQL instead of being applied in Python.
+
+    Args:
+        activity_types: Only export these activity types
+        user_id: Only export activities of this user
+        date_from: Export activities from this date (defaults to 30 days ago)
+        date_to: Export activities until this date (defaults to now)
+        chunk_size: Rows fetched per round trip from each cursor
+
+    Returns:
+        Iterator of activity entries in the format_activity_entry structure
+    """
+    date_from, date_to = _default_export_range(date_from, date_to)
+
+    streams = []
+    for activity_type, queryset, field, builder in _activity_sources(user_id):
+        if activity_types and activity_type not in activity_types:
+            continue
+        queryset = queryset.filter(**{
+            f'{field}__gte': date_from,
+            f'{field}__lte': date_to,
+        }).order_by(f'-{field}', '-pk')
+        streams.append(_timestamped(queryset.iterator(chunk_size=chunk_size), field, builder))
+
+    for _, activity in heapq.merge(*streams, key=lambda item: item[0], reverse=True):
+        yield activity
+
+
+def _timestamped(rows, field, builder):
+    for row in rows:
+        yield getattr(row, field), builder(row)
+
+
+def iter_ledger_audit(
+    user_id: int = None,
+    entry_types: List[str] = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the ledger audit trail, one row per posting, oldest first.
+
+    Args:
+        user_id: Only export entries created by, or posted to accounts of, this user
+        entry_types: Only export these LedgerEntry entry types
+        date_from: Export entries from this date (defaults to 30 days ago)
+        date_to: Export entries until this date (defaults to now)
+        chunk_size: Rows fetched per round trip from the cursor
+
+    Returns:
+        Iterator of flat dictionaries keyed by LEDGER_EXPORT_FIELDS
+    """
+    from .models import LedgerPosting
+
+    date_from, date_to = _default_export_range(date_from, date_to)
+
+    postings = LedgerPosting.objects.filter(
+        entry__created_at__gte=date_from,
+        entry__created_at__lte=date_to,
+    )
+    if user_id:
+        postings = postings.filter(
+            Q(entry__created_by_id=user_id) | Q(account__customer__user_id=user_id)
+        )
+    if entry_types:
+        postings = postings.filter(entry__entry_type__in=entry_types)
+
+    postings = postings.select_related(
+        'entry__created_by', 'entry__approved_by', 'account__customer__user',
+    ).order_by('entry__created_at', 'entry_id', 'pk')
+
+    for posting in postings.iterator(chunk_size=chunk_size):
+        entry = posting.entry
+        yield {
+            'entry_id': entry.id,
+            'reference': entry.reference,
+            'entry_type': entry.entry_type,
+            'status': entry.status,
+            'created_at': entry.created_at.isoformat(),
+            'created_by_id': entry.created_by_id,
+            'created_by_email': entry.created_by.email if entry.created_by_id else None,
+            'approved_by_email': entry.approved_by.email if entry.approved_by else None,
+            'approved_at': entry.approved_at.isoformat() if entry.approved_at else None,
+            'memo': entry.memo,
+            'account_number': posting.account.account_number,
+            'account_owner_email': posting.account.customer.user.email if posting.account.customer else None,
+            'direction': posting.direction,
+            'amount': str(posting.amount),
+            'description': posting.description,
+        }
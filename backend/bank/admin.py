@@ -3,7 +3,7 @@ from django.utils.html import format_html
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
 
-from .models import Account, Beneficiary, CustomerProfile, LedgerEntry, LedgerPosting, Statement, CryptoWallet, CryptoDeposit, SupportConversation, SupportMessage, TelegramConfig, WithdrawalAttempt, OutgoingEmail, OutgoingEmailAttachment
+from .models import Account, Beneficiary, CustomerProfile, LedgerEntry, LedgerPosting, Statement, CryptoWallet, CryptoDeposit, SupportConversation, SupportMessage, TelegramConfig, WithdrawalAttempt, OutgoingEmail, OutgoingEmailAttachment, EmailAttachmentBlob
 
 @admin.register(CustomerProfile)
 class CustomerProfileAdmin(admin.ModelAdmin):
@@ -125,3 +125,11 @@ class OutgoingEmailAttachmentAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['filename', 'email__subject', 'email__to_emails']
     readonly_fields = ['created_at']
+    raw_id_fields = ['email', 'blob']
+
+
+@admin.register(EmailAttachmentBlob)
+class EmailAttachmentBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'file', 'size', 'ref_count', 'created_at']
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class BankConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bank'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import slow_queries
+        from .metrics import connect_celery_signals
+
+        connect_celery_signals()
+        slow_queries.connect()
@@ -0,0 +1,114 @@
+"""
+Cached User Resolution
+Resolves the user id carried by a JWT to a User (with its CustomerProfile
+already loaded) without touching the database on a warm cache.
+
+Users are cached in two tiers: a per-process dictionary that lives for
+AUTH_USER_LOCAL_CACHE_SECONDS and the shared Django cache (Redis in
+deployments) that lives for AUTH_USER_CACHE_SECONDS. Both hold pickled
+snapshots, so every request gets its own User instance. The password hash and
+the profile's clear_text_password are deferred and never cached, they are
+loaded from the database if something reads them.
+
+Saving or deleting a User or CustomerProfile invalidates the shared entry and
+this process's copy, see bank.signals. Two things are not covered: queryset
+.update() calls send no signals, so their changes show after up to
+AUTH_USER_CACHE_SECONDS (call invalidate_user after them when that matters,
+e.g. when deactivating users in bulk), and other processes keep their local
+copy for up to AUTH_USER_LOCAL_CACHE_SECONDS after an invalidation.
+
+The cached profile is for reads. Code that saves the profile, or decides a
+write from its fields, loads it with fresh_profile so a save never writes back
+columns another request changed in the meantime (a KYC or tier update).
+"""
+import pickle
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+USER_CACHE_KEY = 'auth:user:{}'
+
+_local_lock = threading.Lock()
+_local_users: Dict[int, Tuple[float, bytes]] = {}
+
+# Credentials stay out of the shared cache
+UNCACHED_FIELDS = ('password', 'profile__clear_text_password')
+
+
+def _load_user(user_id: int) -> Optional[bytes]:
+    # select_related on the reverse one-to-one also records a missing profile,
+    # so user.profile never issues a query later on
+    user = get_user_model().objects.select_related('profile').defer(*UNCACHED_FIELDS).filter(pk=user_id).first()
+    return pickle.dumps(user, pickle.HIGHEST_PROTOCOL) if user else None
+
+
+def get_cached_user(user_id):
+    """
+    Return a fresh User instance for user_id, or None if it does not exist.
+
+    Looks in the local cache, then the shared cache, then the database.
+    """
+    user_id = int(user_id)
+    now = time.monotonic()
+    with _local_lock:
+        entry = _local_users.get(user_id)
+    if entry and entry[0] > now:
+        return pickle.loads(entry[1])
+
+    key = USER_CACHE_KEY.format(user_id)
+    payload = cache.get(key)
+    if payload is None:
+        payload = _load_user(user_id)
+        if payload is None:
+            return None
+        cache.set(key, payload, getattr(settings, 'AUTH_USER_CACHE_SECONDS', 60))
+
+    with _local_lock:
+        _local_users[user_id] = (now + getattr(settings, 'AUTH_USER_LOCAL_CACHE_SECONDS', 5), payload)
+    return pickle.loads(payload)
+
+
+def invalidate_user(user_id) -> None:
+    """Drop the cached user from the shared cache and this process."""
+    with _local_lock:
+        _local_users.pop(int(user_id), None)
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+def fresh_profile(user):
+    """The user's CustomerProfile read from the database, for write paths."""
+    from .models import CustomerProfile
+
+    return CustomerProfile.objects.get(user_id=user.pk)
+
+
+def clear_local_cache() -> None:
+    with _local_lock:
+        _local_users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user through get_cached_user."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
@@ -0,0 +1,401 @@
+"""
+Service Benchmarks
+Timing and SQL query budgets for the hot service functions, run over a seeded
+dataset of configurable size by the benchmark_services management command.
+Query budgets do not depend on the dataset size, so an N+1 regression fails the
+run at any size. Timings are compared against the checked-in baseline.
+
+The benchmark_serializers command uses the same dataset to compare the rows
+per second of the DRF list serializers with their read_serializers fast paths,
+and checks that both render the same JSON.
+"""
+import json
+import statistics
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from .metrics import QueryTimer
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+BENCHMARK_DOMAIN = '@benchmark.invalid'
+NOISE_FLOOR_MS = 1.0
+
+BENCHMARKS: Dict[str, Dict[str, Any]] = {}
+
+
+def benchmark(name: str, max_queries: int):
+    """
+    Register a benchmark.
+
+    The decorated function receives the seeded dataset, does any per-round
+    setup and returns the zero-argument callable that is timed.
+    """
+    def register(func):
+        BENCHMARKS[name] = {'setup': func, 'max_queries': max_queries}
+        return func
+    return register
+
+
+# ============ Dataset ============
+
+def seed_dataset(size: int) -> Dict[str, Any]:
+    """
+    Create size customers with a funded checking account, a pending loan and a
+    support conversation, plus size * 10 posted deposits, size * 5 notifications
+    and an active loan on the first customer.
+    """
+    from .models import (
+        LedgerEntry, LedgerPosting, Loan, Notification, SupportConversation, SupportMessage,
+    )
+    from .services import approve_loan, create_customer_account, get_system_accounts, get_system_user
+
+    User = get_user_model()
+    funding, _ = get_system_accounts()
+    admin = User.objects.create_user(
+        username=f'admin{BENCHMARK_DOMAIN}', email=f'admin{BENCHMARK_DOMAIN}', is_staff=True,
+    )
+    users = User.objects.bulk_create([
+        User(username=f'customer-{index}{BENCHMARK_DOMAIN}', email=f'customer-{index}{BENCHMARK_DOMAIN}')
+        for index in range(size)
+    ])
+    accounts = [create_customer_account(user) for user in users]
+    customers = [account.customer for account in accounts]
+
+    # Every customer gets one deposit, the first customer the remaining bulk
+    owners = accounts + [accounts[0]] * (size * 9)
+    entries = LedgerEntry.objects.bulk_create([
+        LedgerEntry(
+            reference=f'BENCH-{index:08d}', entry_type='DEPOSIT', created_by=account.customer.user,
+            status='POSTED', memo='Benchmark deposit',
+        )
+        for index, account in enumerate(owners)
+    ])
+    postings = []
+    for entry, account in zip(entries, owners):
+        postings.append(LedgerPosting(entry=entry, account=account, direction='CREDIT', amount=Decimal('500.00')))
+        postings.append(LedgerPosting(entry=entry, account=funding, direction='DEBIT', amount=Decimal('500.00')))
+    LedgerPosting.objects.bulk_create(postings)
+
+    Loan.objects.bulk_create([
+        Loan(
+            customer=customer, loan_type='PERSONAL', requested_amount=Decimal('5000.00'),
+            term_months=36, purpose='Benchmark',
+        )
+        for customer in customers
+    ])
+    active_loan = approve_loan(
+        Loan.objects.create(
+            customer=customers[0], loan_type='PERSONAL', requested_amount=Decimal('12000.00'),
+            term_months=60, purpose='Benchmark',
+        ),
+        admin, Decimal('12000.00'), Decimal('7.50'),
+    )
+    active_loan.status = 'ACTIVE'
+    active_loan.disbursed_at = timezone.now()
+    active_loan.save(update_fields=['status', 'disbursed_at'])
+
+    conversations = SupportConversation.objects.bulk_create([
+        SupportConversation(customer=customer, subject='Benchmark') for customer in customers
+    ])
+    SupportMessage.objects.bulk_create([
+        SupportMessage(conversation=conversation, sender_type=sender_type, sender_user=sender, message='Benchmark')
+        for conversation, customer in zip(conversations, customers)
+        for sender_type, sender in (('CUSTOMER', customer.user), ('ADMIN', admin))
+    ])
+
+    Notification.objects.bulk_create([
+        Notification(customer=customers[0], notification_type='SYSTEM', title='Benchmark', message='Benchmark')
+        for _ in range(size * 5)
+    ])
+
+    return {
+        'size': size,
+        'admin': admin,
+        'system_user': get_system_user(),
+        'customers': customers,
+        'accounts': accounts,
+        'active_loan': active_loan,
+    }
+
+
+# ============ Benchmarks ============
+
+@benchmark('account_balance', max_queries=1)
+def bench_account_balance(dataset):
+    account = dataset['accounts'][0]
+    return account.balance
+
+
+@benchmark('approve_loan', max_queries=19)
+def bench_approve_loan(dataset):
+    from .models import Loan
+    from .services import approve_loan
+
+    loan = Loan.objects.create(
+        customer=dataset['customers'][-1], loan_type='AUTO', requested_amount=Decimal('5000.00'),
+        term_months=36, purpose='Benchmark',
+    )
+    return lambda: approve_loan(loan, dataset['admin'], Decimal('5000.00'), Decimal('6.25'))
+
+
+@benchmark('generate_loan_payment_schedule', max_queries=3)
+def bench_generate_loan_payment_schedule(dataset):
+    from .services import generate_loan_payment_schedule
+
+    loan = dataset['active_loan']
+    return lambda: generate_loan_payment_schedule(loan)
+
+
+@benchmark('process_loan_payment', max_queries=27)
+def bench_process_loan_payment(dataset):
+    from .services import process_loan_payment
+
+    loan = dataset['active_loan']
+    amount = loan.monthly_payment
+    return lambda: process_loan_payment(loan, amount)
+
+
+@benchmark('get_platform_activity', max_queries=7)
+def bench_get_platform_activity(dataset):
+    from .activity_log import get_platform_activity
+
+    return lambda: get_platform_activity(limit=100)
+
+
+@benchmark('calculate_tax_refund_estimate', max_queries=0)
+def bench_calculate_tax_refund_estimate(dataset):
+    from .services import calculate_tax_refund_estimate
+
+    data = {
+        'filing_status': 'SINGLE', 'total_income': '84250.00', 'federal_tax_withheld': '11800.00',
+        'estimated_tax_paid': '0', 'number_of_dependents': 2, 'use_standard_deduction': True,
+    }
+    return lambda: calculate_tax_refund_estimate(data)
+
+
+@benchmark('create_notification', max_queries=5)
+def bench_create_notification(dataset):
+    from .services import create_notification
+
+    customer = dataset['customers'][0]
+    return lambda: create_notification(
+        customer=customer, notification_type='TRANSACTION', title='Transfer Received',
+        message='You received $25.00', metadata={'amount': '25.00'},
+    )
+
+
+# ============ Runner ============
+
+def run_benchmarks(dataset: Dict[str, Any], repeat: int = 10, names: List[str] = None) -> Dict[str, Dict]:
+    """
+    Run each benchmark repeat times against the dataset.
+
+    Returns:
+        name -> {'median_ms', 'min_ms', 'queries', 'max_queries'}, queries being
+        the highest count seen in any round
+    """
+    results = {}
+    for name, spec in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        timings, queries = [], 0
+        for _ in range(repeat):
+            func: Callable = spec['setup'](dataset)
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, timer.count)
+        results[name] = {
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'queries': queries,
+            'max_queries': spec['max_queries'],
+        }
+    return results
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Any]:
+    try:
+        with open(path) as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return {}
+
+
+def write_baseline(results: Dict[str, Dict], size: int, path: Path = BASELINE_PATH) -> None:
+    baseline = {
+        'size': size,
+        'benchmarks': {
+            name: {'median_ms': result['median_ms'], 'queries': result['queries']}
+            for name, result in results.items()
+        },
+    }
+    with open(path, 'w') as output:
+        json.dump(baseline, output, indent=2, sort_keys=True)
+        output.write('\n')
+
+
+def check_results(results: Dict[str, Dict], baseline: Dict[str, Any], size: int, tolerance: float) -> List[str]:
+    """
+    Compare results with their budgets and the baseline.
+
+    Query budgets always apply. Timings are only compared when the run used
+    the baseline's dataset size, a benchmark fails when its median is more
+    than tolerance times the baseline median. Every benchmark may also run
+    NOISE_FLOOR_MS over its baseline, so timer jitter on sub-millisecond calls
+    does not fail the run.
+
+    Returns:
+        One message per failed benchmark
+    """
+    failures = []
+    compare_timing = baseline.get('size') == size
+    for name, result in results.items():
+        if result['queries'] > result['max_queries']:
+            failures.append(f"{name}: {result['queries']} queries, budget is {result['max_queries']}")
+        reference = baseline.get('benchmarks', {}).get(name)
+        if not (compare_timing and reference):
+            continue
+        limit = max(reference['median_ms'] * tolerance, reference['median_ms'] + NOISE_FLOOR_MS)
+        if result['median_ms'] > limit:
+            failures.append(
+                f"{name}: median {result['median_ms']}ms, baseline {reference['median_ms']}ms x {tolerance}"
+            )
+    return failures
+
+
+# ============ Serializer throughput ============
+
+SERIALIZER_COMPARISONS: Dict[str, Callable] = {}
+
+
+def serializer_comparison(name: str):
+    """
+    Register a serializer comparison.
+
+    The decorated function receives the seeded dataset, adds any rows it
+    needs and returns the DRF serializer call and its fast path as
+    zero-argument callables, each serializing a fresh queryset.
+    """
+    def register(func):
+        SERIALIZER_COMPARISONS[name] = func
+        return func
+    return register
+
+
+@serializer_comparison('transactions')
+def compare_transactions(dataset):
+    from .models import LedgerEntry
+    from .read_serializers import ledger_entry_rows
+    from .serializers import LedgerEntrySerializer
+
+    entries = LedgerEntry.objects.filter(
+        postings__account__customer=dataset['customers'][0],
+    ).distinct().order_by('-created_at')
+    return (
+        lambda: LedgerEntrySerializer(entries.all(), many=True).data,
+        lambda: ledger_entry_rows(entries.all()),
+    )
+
+
+@serializer_comparison('admin_transactions')
+def compare_admin_transactions(dataset):
+    from .models import LedgerEntry
+    from .read_serializers import admin_ledger_entry_rows
+    from .serializers import AdminLedgerEntrySerializer
+
+    entries = LedgerEntry.objects.order_by('-created_at')
+    return (
+        lambda: AdminLedgerEntrySerializer(entries.all(), many=True).data,
+        lambda: admin_ledger_entry_rows(entries.all()),
+    )
+
+
+@serializer_comparison('notifications')
+def compare_notifications(dataset):
+    from .models import Notification
+    from .read_serializers import notification_rows
+    from .serializers import NotificationSerializer
+
+    notifications = Notification.objects.filter(customer=dataset['customers'][0]).order_by('-created_at')[:100]
+    return (
+        lambda: NotificationSerializer(notifications.all(), many=True).data,
+        lambda: notification_rows(notifications.all()),
+    )
+
+
+@serializer_comparison('admin_kyc_documents')
+def compare_admin_kyc_documents(dataset):
+    from django.conf import settings
+    from django.test import RequestFactory
+    from .models import KYCDocument
+    from .read_serializers import kyc_document_rows
+    from .serializers import KYCDocumentSerializer
+
+    # One document per customer, the files are never written so size lookups fail as for a missing upload
+    KYCDocument.objects.bulk_create([
+        KYCDocument(
+            customer=customer, document_type='PASSPORT', document_number=f'P{index:08d}',
+            document_file=f'kyc_documents/benchmark-{index}.pdf',
+        )
+        for index, customer in enumerate(dataset['customers'])
+    ])
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    request = RequestFactory().get('/api/admin/kyc/documents/', HTTP_HOST=host)
+    documents = KYCDocument.objects.select_related('customer', 'customer__user').order_by('-uploaded_at')
+    return (
+        lambda: KYCDocumentSerializer(documents.all(), many=True, context={'request': request}).data,
+        lambda: kyc_document_rows(documents.all(), request),
+    )
+
+
+def compare_serializers(dataset: Dict[str, Any], repeat: int = 10, names: List[str] = None) -> Dict[str, Dict]:
+    """
+    Time each DRF serializer against its fast path, repeat rounds each.
+
+    Returns:
+        name -> {'rows', 'identical', 'drf_rows_per_sec', 'fast_rows_per_sec',
+        'speedup', 'drf_queries', 'fast_queries'}, identical being whether both
+        render to the same JSON bytes
+    """
+    from rest_framework.renderers import JSONRenderer
+
+    renderer = JSONRenderer()
+    results = {}
+    for name, setup in SERIALIZER_COMPARISONS.items():
+        if names and name not in names:
+            continue
+        drf, fast = setup(dataset)
+        measured = {}
+        for label, func in (('drf', drf), ('fast', fast)):
+            timings, queries = [], 0
+            for _ in range(repeat):
+                timer = QueryTimer()
+                with connection.execute_wrapper(timer):
+                    started = time.perf_counter()
+                    rows = func()
+                    timings.append(time.perf_counter() - started)
+                queries = max(queries, timer.count)
+            measured[label] = {'rows': rows, 'seconds': statistics.median(timings), 'queries': queries}
+
+        row_count = len(measured['fast']['rows'])
+        drf_rate = row_count / measured['drf']['seconds']
+        fast_rate = row_count / measured['fast']['seconds']
+        results[name] = {
+            'rows': row_count,
+            'identical': renderer.render(measured['drf']['rows']) == renderer.render(measured['fast']['rows']),
+            'drf_rows_per_sec': round(drf_rate),
+            'fast_rows_per_sec': round(fast_rate),
+            'speedup': round(fast_rate / drf_rate, 2),
+            'drf_queries': measured['drf']['queries'],
+            'fast_queries': measured['fast']['queries'],
+        }
+    return results
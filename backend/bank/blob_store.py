@@ -0,0 +1,164 @@
+"""
+Attachment Blob Store
+Content-addressed storage for outgoing email attachments. Each distinct
+attachment is stored once, keyed by its SHA-256 digest, and reference counted
+by the OutgoingEmailAttachment rows that point at it.
+"""
+import hashlib
+import logging
+import tempfile
+from datetime import timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import EmailAttachmentBlob, OutgoingEmailAttachment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# File-like attachments are spooled to disk past this size while being hashed
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def blob_name(digest: str) -> str:
+    return f'outgoing_email_blobs/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def _chunks(content) -> Iterator[bytes]:
+    if isinstance(content, (bytes, bytearray)):
+        view = memoryview(content)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield view[start:start + CHUNK_SIZE]
+        return
+    while True:
+        chunk = content.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def _prepare(content) -> Tuple[str, int, File]:
+    """
+    Hash content in a single streaming pass.
+
+    In-memory bytes are hashed through a memoryview and handed to storage as is.
+    File-like content is copied chunk by chunk into a spooled temporary file
+    while hashing, so it is never fully materialised in memory.
+
+    Returns:
+        (hex digest, size in bytes, File ready to be saved)
+    """
+    if not isinstance(content, (bytes, bytearray)) and not hasattr(content, 'read'):
+        content = str(content).encode('utf-8')
+
+    digest = hashlib.sha256()
+    size = 0
+    if isinstance(content, (bytes, bytearray)):
+        for chunk in _chunks(content):
+            digest.update(chunk)
+            size += len(chunk)
+        return digest.hexdigest(), size, ContentFile(content)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in _chunks(content):
+        digest.update(chunk)
+        spool.write(chunk)
+        size += len(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), size, File(spool)
+
+
+def store_blob(content) -> EmailAttachmentBlob:
+    """
+    Return the blob for content, writing it to storage only if it is new.
+
+    The reference count is not changed here, see add_references. Reusing a
+    blob marks it as used, which keeps collect_garbage away from it until the
+    caller has added its references.
+    """
+    digest, size, source = _prepare(content)
+    try:
+        # The UPDATE waits for a collection holding the row lock, so the blob is
+        # either already gone or safe from it for a whole grace period
+        if EmailAttachmentBlob.objects.filter(sha256=digest).update(last_used_at=timezone.now()):
+            blob = EmailAttachmentBlob.objects.filter(sha256=digest).first()
+            if blob:
+                return blob
+
+        name = blob_name(digest)
+        saved_name = name if default_storage.exists(name) else default_storage.save(name, source)
+        try:
+            with transaction.atomic():
+                return EmailAttachmentBlob.objects.create(sha256=digest, file=saved_name, size=size)
+        except IntegrityError:
+            # Another worker stored the same content first
+            blob = EmailAttachmentBlob.objects.get(sha256=digest)
+            if saved_name != blob.file.name:
+                default_storage.delete(saved_name)
+            return blob
+    finally:
+        source.close()
+
+
+def add_references(counts: Dict[int, int]) -> None:
+    """Atomically add references, counts maps blob id to the number of new attachment rows."""
+    for blob_id, count in counts.items():
+        EmailAttachmentBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + count)
+
+
+def release_blob(blob_id: int) -> None:
+    """Drop one reference, the blob is removed later by collect_garbage."""
+    EmailAttachmentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def repair_ref_counts() -> int:
+    """Recompute reference counts from the attachment rows. Returns blobs corrected."""
+    fixed = 0
+    blobs = EmailAttachmentBlob.objects.annotate(actual=Count('attachments')).values_list('pk', 'ref_count', 'actual')
+    for blob_id, ref_count, actual in blobs.iterator(chunk_size=2000):
+        if ref_count != actual:
+            EmailAttachmentBlob.objects.filter(pk=blob_id).update(ref_count=actual)
+            fixed += 1
+    return fixed
+
+
+def collect_garbage(grace_period: Optional[timedelta] = None) -> int:
+    """
+    Delete blobs nobody references any more, together with their files.
+
+    Blobs stored or reused within the grace period are kept so a send in
+    flight can still reference content it has just stored.
+
+    Returns:
+        Number of blobs removed
+    """
+    grace_period = grace_period if grace_period is not None else timedelta(hours=1)
+    cutoff = timezone.now() - grace_period
+    removed = 0
+
+    candidates = EmailAttachmentBlob.objects.filter(ref_count=0, last_used_at__lt=cutoff).values_list('pk', flat=True)
+    referenced = OutgoingEmailAttachment.objects.filter(blob=OuterRef('pk'))
+    for blob_id in list(candidates.iterator(chunk_size=2000)):
+        with transaction.atomic():
+            # Lock only the blob row, the reference check is a subquery rather than an outer join
+            blob = (
+                EmailAttachmentBlob.objects.select_for_update(of=('self',))
+                .filter(~Exists(referenced), pk=blob_id, ref_count=0, last_used_at__lt=cutoff)
+                .first()
+            )
+            if not blob:
+                continue
+            name = blob.file.name
+            blob.delete()
+        default_storage.delete(name)
+        removed += 1
+
+    if removed:
+        logger.info(f"Removed {removed} unreferenced email attachment blobs")
+    return removed
@@ -1,14 +1,61 @@
+import asyncio
 import json
 import logging
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+from . import ops_feed, presence, ws_protocol
 from .models import SupportConversation, SupportMessage
 from .serializers import SupportMessageSerializer
 
 logger = logging.getLogger(__name__)
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class FramedConsumerMixin:
+    """
+    Sends frames as JSON text, or as MessagePack binary when the client
+    negotiated the snel.msgpack.v1 subprotocol. Binary frames from such
+    clients are decoded and handed to receive() as JSON text.
+    """
+    frame_format = ws_protocol.JSON
+    
+    async def accept_negotiated(self):
+        if ws_protocol.MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', []):
+            self.frame_format = ws_protocol.MSGPACK
+            await self.accept(subprotocol=ws_protocol.MSGPACK_SUBPROTOCOL)
+        else:
+            await self.accept()
+    
+    async def send_encoded(self, data):
+        if isinstance(data, bytes):
+            await self.send(bytes_data=data)
+        else:
+            await self.send(text_data=data)
+    
+    async def send_frame(self, frame):
+        await self.send_encoded(ws_protocol.encode(frame, self.frame_format))
+    
+    async def send_group_frame(self, event):
+        """Forward a group message, using its pre-encoded frame when the sender attached one"""
+        frames = event.get('frames')
+        if frames:
+            await self.send_encoded(frames[self.frame_format])
+        else:
+            await self.send_frame(ws_protocol.client_frame(event))
+    
+    async def websocket_receive(self, message):
+        if message.get('bytes') is not None:
+            try:
+                message = {'text': json.dumps(ws_protocol.decode(message['bytes']))}
+            except (ValueError, TypeError):
+                logger.error("Invalid MessagePack frame received")
+                return
+        await super().websocket_receive(message)
+
+
+class NotificationConsumer(FramedConsumerMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for real-time notifications"""
     
     async def connect(self):
@@ -28,15 +75,26 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept_negotiated()
         
         logger.info(f"Notification WebSocket connected: user={self.user.id}")
         
         # Send connection confirmation
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'connection_established',
             'message': 'Connected to notifications'
-        }))
+        })
+        
+        # Send the current unread count so clients don't need to poll for it
+        await self.send_frame({
+            'type': 'unread_count',
+            'unread_count': await self.get_unread_count()
+        })
+        
+        # Reconnecting clients can pass their last seen id instead of sending resume
+        last_id = parse_qs(self.scope.get('query_string', b'').decode()).get('last_id', [None])[0]
+        if last_id and last_id.isdigit():
+            await self.resume(int(last_id))
     
     async def disconnect(self, close_code):
         # Leave notification group
@@ -56,20 +114,31 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             
             if message_type == 'ping':
                 # Respond to heartbeat
-                await self.send(text_data=json.dumps({
+                await self.send_frame({
                     'type': 'pong'
-                }))
+                })
             
             elif message_type == 'mark_read':
                 # Mark notification as read
                 notification_id = text_data_json.get('notification_id')
                 if notification_id:
                     success = await self.mark_notification_read(notification_id)
-                    await self.send(text_data=json.dumps({
+                    await self.send_frame({
                         'type': 'mark_read_response',
                         'notification_id': notification_id,
                         'success': success
-                    }))
+                    })
+            
+            elif message_type == 'resume':
+                # Replay what was missed while disconnected, falls back to the last acked id
+                last_id = text_data_json.get('last_id')
+                await self.resume(int(last_id) if last_id is not None else None)
+            
+            elif message_type == 'ack':
+                # Delivery ack for the highest notification id the client has processed
+                notification_id = text_data_json.get('notification_id')
+                if notification_id:
+                    await self.record_ack(int(notification_id))
                     
         except json.JSONDecodeError:
             logger.error(f"Invalid JSON received in notification WebSocket: {text_data}")
@@ -78,12 +147,53 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     
     async def notification_message(self, event):
         """Handle notification message from group"""
-        notification = event['notification']
+        await self.send_group_frame(event)
+    
+    async def unread_count(self, event):
+        """Handle unread counter change from group"""
+        await self.send_group_frame(event)
+    
+    async def resume(self, last_id):
+        """
+        Send notifications newer than last_id in one frame. has_more (also set
+        when there is no cursor at all) tells the client to reload its list.
+        """
+        notifications, has_more, cursor = await self.get_notifications_after(last_id)
+        await self.send_frame({
+            'type': 'resume',
+            'notifications': notifications,
+            'has_more': has_more,
+            'last_id': cursor
+        })
+    
+    @database_sync_to_async
+    def get_notifications_after(self, last_id):
+        from .services import get_notification_ack, get_notifications_after
+        from .serializers import NotificationSerializer
         
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'notification': notification
-        }))
+        if last_id is None:
+            last_id = get_notification_ack(self.user.id)
+        profile = getattr(self.user, 'profile', None)
+        if last_id is None or not profile:
+            return [], last_id is None, last_id
+        
+        notifications, has_more = get_notifications_after(profile.id, last_id)
+        cursor = notifications[-1].id if notifications else last_id
+        return NotificationSerializer(notifications, many=True).data, has_more, cursor
+    
+    @database_sync_to_async
+    def record_ack(self, notification_id):
+        from .services import record_notification_ack
+        
+        return record_notification_ack(self.user.id, notification_id)
+    
+    @database_sync_to_async
+    def get_unread_count(self):
+        """Get the user's unread notification count"""
+        from .services import get_unread_count
+        
+        profile = getattr(self.user, 'profile', None)
+        return get_unread_count(profile.id) if profile else 0
     
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
@@ -104,7 +214,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return False
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(FramedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
         self.room_group_name = f'chat_{self.conversation_id}'
@@ -112,7 +222,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         # Verify conversation existence and user access
         if await self.is_authorized():
-            await self.accept()
+            await self.accept_negotiated()
             
             # Join room group
             await self.channel_layer.group_add(
@@ -123,10 +233,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.info(f"WebSocket connected: conversation={self.conversation_id}, user={self.user.id if self.user else 'anonymous'}")
             
             # Send connection confirmation to client
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'connection_established',
                 'message': 'Connected to chat'
-            }))
+            })
             
             # Notify other participants that user is online
             await self.channel_layer.group_send(
@@ -137,12 +247,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     'status': 'online'
                 }
             )
+            
+            await self.update_presence(online=True)
+            
+            # Reconnecting clients pass the last message id they saw and only get what they missed
+            after = parse_qs(self.scope.get('query_string', b'').decode()).get('after', [None])[0]
+            if after and after.isdigit():
+                await self.send_messages_after(int(after))
         else:
             logger.warning(f"WebSocket unauthorized: conversation={self.conversation_id}")
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'error',
                 'message': 'Unauthorized access'
-            }))
+            })
             await self.close(code=4001)
 
     async def disconnect(self, close_code):
@@ -157,6 +274,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         'status': 'offline'
                     }
                 )
+                if self.user.is_authenticated:
+                    await self.update_presence(online=False)
             
             await self.channel_layer.group_discard(
                 self.room_group_name,
@@ -174,10 +293,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             if message_type == 'message':
                 message_text = text_data_json.get('message')
                 if not message_text or not message_text.strip():
-                    await self.send(text_data=json.dumps({
+                    await self.send_frame({
                         'type': 'error',
                         'message': 'Message cannot be empty'
-                    }))
+                    })
                     return
                 
                 # Save and broadcast message
@@ -188,16 +307,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     serializer = SupportMessageSerializer(message)
                     await self.channel_layer.group_send(
                         self.room_group_name,
-                        {
+                        ws_protocol.with_frames({
                             'type': 'chat_message',
                             'message': serializer.data
-                        }
+                        })
                     )
                 else:
-                    await self.send(text_data=json.dumps({
+                    await self.send_frame({
                         'type': 'error',
                         'message': 'Failed to save message'
-                    }))
+                    })
             
             elif message_type == 'typing':
                 # Broadcast typing indicator
@@ -214,49 +333,94 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             elif message_type == 'ping':
                 # Respond to heartbeat
-                await self.send(text_data=json.dumps({
+                await self.send_frame({
                     'type': 'pong'
-                }))
+                })
+                await self.update_presence(online=True)
+            
+            elif message_type == 'sync':
+                # Catch up on messages newer than the client's last seen id
+                try:
+                    await self.send_messages_after(int(text_data_json.get('after') or 0))
+                except (TypeError, ValueError):
+                    await self.send_frame({
+                        'type': 'error',
+                        'message': 'after must be a message id'
+                    })
                 
         except json.JSONDecodeError:
             logger.error(f"Invalid JSON received: {text_data}")
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'error',
                 'message': 'Invalid message format'
-            }))
+            })
         except Exception as e:
             logger.error(f"Error in receive: {e}", exc_info=True)
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'error',
                 'message': 'An error occurred processing your message'
-            }))
+            })
 
     async def chat_message(self, event):
         """Handle chat message event"""
-        message = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'message',
-            'message': message
-        }))
+        await self.send_group_frame(event)
 
     async def typing_indicator(self, event):
         """Handle typing indicator event"""
         # Don't send typing indicator back to the sender
         if event.get('user_id') != (self.user.id if self.user else None):
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'typing',
                 'is_typing': event['is_typing'],
                 'sender_type': event['sender_type']
-            }))
+            })
 
     async def user_status(self, event):
         """Handle user online/offline status"""
         # Don't send status back to the user themselves
         if event.get('user_id') != (self.user.id if self.user else None):
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'user_status',
                 'status': event['status']
-            }))
+            })
+
+    async def send_messages_after(self, after):
+        """Send messages newer than after, page by page"""
+        while True:
+            messages, has_more = await self.get_messages_after(after)
+            if not messages:
+                return
+            await self.send_frame({
+                'type': 'history',
+                'messages': messages,
+                'has_more': has_more
+            })
+            if not has_more:
+                return
+            after = messages[-1]['id']
+
+    @database_sync_to_async
+    def get_messages_after(self, after):
+        from .services import get_support_message_page
+        
+        messages, has_more = get_support_message_page(self.conversation_id, after=after)
+        return SupportMessageSerializer(messages, many=True).data, has_more
+
+    async def update_presence(self, online):
+        """Refresh or drop this socket in the presence store and publish changes to the admin stream"""
+        try:
+            if online:
+                changed = await sync_to_async(presence.heartbeat, thread_sensitive=False)(self.user.id, self.channel_name)
+            else:
+                changed = await sync_to_async(presence.disconnect, thread_sensitive=False)(self.user.id, self.channel_name)
+            if changed:
+                await self.channel_layer.group_send(
+                    presence.PRESENCE_GROUP,
+                    presence.presence_event(self.user.id, 'online' if online else 'offline')
+                )
+        except Exception as e:
+            # Presence is best effort, chat keeps working without it
+            logger.warning(f"Presence update failed for user {self.user.id}: {e}")
 
     @database_sync_to_async
     def is_authorized(self):
@@ -292,8 +456,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def save_message(self, message_text):
         """Save message to database"""
-        from .models import SupportConversation, SupportMessage
-        from django.utils import timezone
+        from .models import SupportConversation
+        from .services import record_support_message
         
         user = self.scope.get('user')
         if not user or not user.is_authenticated:
@@ -302,22 +466,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
         try:
             conversation = SupportConversation.objects.get(pk=self.conversation_id)
-            sender_type = 'ADMIN' if user.is_staff else 'CUSTOMER'
-            
-            message = SupportMessage.objects.create(
-                conversation=conversation,
-                sender_type=sender_type,
-                sender_user=user,
-                message=message_text
-            )
             
-            # Update conversation metadata
-            conversation.last_message_at = timezone.now()
-            if conversation.status == 'OPEN' and sender_type == 'ADMIN':
-                conversation.status = 'IN_PROGRESS'
-            conversation.save(update_fields=['last_message_at', 'status'])
+            # Stores the message and updates the conversation's inbox columns
+            message = record_support_message(conversation, user, message_text)
             
-            logger.info(f"Message saved: conversation={self.conversation_id}, sender={sender_type}, msg_id={message.id}")
+            logger.info(f"Message saved: conversation={self.conversation_id}, sender={message.sender_type}, msg_id={message.id}")
             return message
             
         except SupportConversation.DoesNotExist:
@@ -326,3 +479,109 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error saving message: {e}", exc_info=True)
             return None
+
+
+class SupportPresenceConsumer(AsyncWebsocketConsumer):
+    """
+    Admin stream of customer presence for open support conversations.
+
+    Sends a snapshot on connect, then presence changes batched every
+    PRESENCE_BATCH_SECONDS so reconnect storms reach admins as a few frames.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if not self.user or not self.user.is_authenticated or not self.user.is_staff:
+            await self.close(code=4001)
+            return
+
+        self.pending = {}
+        self.flush_task = None
+        await self.channel_layer.group_add(presence.PRESENCE_GROUP, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps({
+            'type': 'presence_snapshot',
+            'online': await database_sync_to_async(presence.presence_snapshot)()
+        }))
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'flush_task', None):
+            self.flush_task.cancel()
+        await self.channel_layer.group_discard(presence.PRESENCE_GROUP, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            if json.loads(text_data).get('type') == 'ping':
+                await self.send(text_data=json.dumps({'type': 'pong'}))
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON received in presence WebSocket: {text_data}")
+
+    async def presence_update(self, event):
+        """Queue a presence change, the latest status per user wins"""
+        self.pending[event['user_id']] = (event['status'], event['at'])
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(getattr(settings, 'PRESENCE_BATCH_SECONDS', 1))
+        pending, self.pending, self.flush_task = self.pending, {}, None
+        try:
+            conversations = await database_sync_to_async(presence.open_conversations_by_user)(list(pending))
+        except Exception as e:
+            logger.error(f"Error loading conversations for presence batch: {e}", exc_info=True)
+            return
+        changes = [
+            {'user_id': user_id, 'status': status, 'at': at, 'conversation_ids': conversations[user_id]}
+            for user_id, (status, at) in pending.items()
+            if user_id in conversations
+        ]
+        if changes:
+            await self.send(text_data=json.dumps({'type': 'presence_batch', 'changes': changes}))
+
+
+class AdminOpsConsumer(AsyncWebsocketConsumer):
+    """
+    Admin stream of new and resolved work with the affected pending counts.
+
+    Sends every pending count on connect and again on {"type": "refresh"},
+    then forwards ops_event messages published by bank.ops_feed.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if not self.user or not self.user.is_authenticated or not self.user.is_staff:
+            await self.close(code=4001)
+            return
+
+        await self.channel_layer.group_add(ops_feed.OPS_GROUP, self.channel_name)
+        await self.accept()
+        await self.send_snapshot()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(ops_feed.OPS_GROUP, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            message_type = json.loads(text_data).get('type')
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON received in ops WebSocket: {text_data}")
+            return
+        if message_type == 'ping':
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+        elif message_type == 'refresh':
+            await self.send_snapshot()
+
+    async def send_snapshot(self):
+        await self.send(text_data=json.dumps({
+            'type': 'ops_snapshot',
+            'counts': await database_sync_to_async(ops_feed.pending_counts)()
+        }))
+
+    async def ops_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'ops_event',
+            'event': event['event'],
+            'data': event['data'],
+            'counts': event['counts'],
+            'at': event['at'],
+        }))
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import smtplib
+import threading
 from email.utils import getaddresses
 from typing import Any, Iterable
 
@@ -7,9 +9,10 @@ from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
 from django.core.mail.backends.smtp import EmailBackend as SmtpEmailBackend
 from django.core.mail.backends.filebased import EmailBackend as FilebasedEmailBackend
-from django.core.files.base import ContentFile
+from django.db import transaction
 from django.utils import timezone
 
+from .blob_store import add_references, store_blob
 from .models import OutgoingEmail, OutgoingEmailAttachment
 
 
@@ -27,53 +30,170 @@ def _parse_recipients(value: Any) -> list[str]:
     return [str(value)]
 
 
+_shared_smtp_lock = threading.Lock()
+_shared_smtp_backends: dict[tuple, SmtpEmailBackend] = {}
+
+
+def _shared_smtp_backend(**kwargs: Any) -> SmtpEmailBackend:
+    """
+    Return this process's long-lived SMTP backend for the given settings.
+
+    Celery worker processes reuse one open SMTP connection across tasks instead
+    of doing a TCP/TLS handshake and login for every email.
+    """
+    key = (
+        kwargs.get('host') or settings.EMAIL_HOST,
+        kwargs.get('port') or settings.EMAIL_PORT,
+        kwargs.get('username') or settings.EMAIL_HOST_USER,
+        kwargs.get('use_tls', settings.EMAIL_USE_TLS),
+        kwargs.get('use_ssl', settings.EMAIL_USE_SSL),
+        bool(kwargs.get('fail_silently', False)),
+    )
+    with _shared_smtp_lock:
+        backend = _shared_smtp_backends.get(key)
+        if backend is None:
+            backend = SmtpEmailBackend(**kwargs)
+            _shared_smtp_backends[key] = backend
+        return backend
+
+
 class AuditingEmailBackend(BaseEmailBackend):
     """Wrap the configured email backend and persist outgoing messages to the DB."""
 
     def __init__(self, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
+        self._persistent = False
         self._inner = self._build_inner_backend(*args, **kwargs)
 
     def _build_inner_backend(self, *args: Any, **kwargs: Any) -> BaseEmailBackend:
         backend_path = getattr(settings, 'AUDIT_EMAIL_INNER_BACKEND', '')
         if backend_path == 'django.core.mail.backends.filebased.EmailBackend':
             return FilebasedEmailBackend(*args, **kwargs)
+        if getattr(settings, 'AUDIT_EMAIL_PERSISTENT_CONNECTION', True) and not args:
+            self._persistent = True
+            return _shared_smtp_backend(**kwargs)
         return SmtpEmailBackend(*args, **kwargs)
 
     def open(self):
         return self._inner.open()
 
     def close(self):
-        return self._inner.close()
+        # The shared SMTP connection outlives this wrapper; it is reopened on failure
+        if not self._persistent:
+            return self._inner.close()
 
     def send_messages(self, email_messages):
+        """
+        Send a batch of messages.
+
+        All audit rows are inserted with one bulk_create, the messages go out over
+        a single inner connection, and the outcomes are written back with one
+        bulk_update. When fail_silently is off, the first error is raised after
+        every message has been attempted and audited.
+        """
         if not email_messages:
             return 0
 
+        audits = self._create_audit_rows(email_messages)
+
         count = 0
-        for message in email_messages:
-            audit = self._create_audit_row(message)
+        first_error = None
+        now = timezone.now()
+        try:
             try:
-                sent = self._inner.send_messages([message])
+                self._inner.open()
+            except Exception as exc:
+                # Nothing can be sent without a connection, every message failed with its error
+                for audit in audits:
+                    audit.status = 'FAILED'
+                    audit.error_message = str(exc)
+                first_error = exc
+                email_messages = []
+
+            for message, audit in zip(email_messages, audits):
+                try:
+                    sent = self._send_with_reconnect(message)
+                except Exception as exc:
+                    audit.status = 'FAILED'
+                    audit.error_message = str(exc)
+                    first_error = first_error or exc
+                    continue
+
                 if sent:
                     audit.status = 'SENT'
                     audit.sent_at = timezone.now()
-                    audit.save(update_fields=['status', 'sent_at', 'updated_at'])
                     count += sent
                 else:
                     audit.status = 'FAILED'
                     audit.error_message = 'Email backend reported 0 messages sent.'
-                    audit.save(update_fields=['status', 'error_message', 'updated_at'])
-            except Exception as exc:
-                audit.status = 'FAILED'
-                audit.error_message = str(exc)
-                audit.save(update_fields=['status', 'error_message', 'updated_at'])
-                if not self.fail_silently:
-                    raise
+        finally:
+            if not self._persistent:
+                self._inner.close()
+
+            for audit in audits:
+                audit.updated_at = now
+            OutgoingEmail.objects.bulk_update(audits, ['status', 'sent_at', 'error_message', 'updated_at'])
 
+        if first_error is not None and not self.fail_silently:
+            raise first_error
         return count
 
-    def _create_audit_row(self, message) -> OutgoingEmail:
+    def _send_with_reconnect(self, message) -> int:
+        """Send one message, reconnecting once if the server dropped the connection."""
+        inner = self._inner
+        if not isinstance(inner, SmtpEmailBackend):
+            return inner.send_messages([message])
+
+        # The backend may be shared by threads; hold its lock across the retry.
+        # Errors are raised instead of swallowed so a stale connection is detected.
+        with inner._lock:
+            fail_silently = inner.fail_silently
+            inner.fail_silently = False
+            try:
+                try:
+                    return inner.send_messages([message])
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    try:
+                        inner.close()
+                    except Exception:
+                        inner.connection = None
+                    inner.open()
+                    return inner.send_messages([message])
+            finally:
+                inner.fail_silently = fail_silently
+
+    def _create_audit_rows(self, messages) -> list[OutgoingEmail]:
+        backend = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        audits = [self._build_audit_row(message, backend) for message in messages]
+        OutgoingEmail.objects.bulk_create(audits)
+
+        attachments = []
+        references: dict[int, int] = {}
+        for message, audit in zip(messages, audits):
+            for attachment in getattr(message, 'attachments', None) or []:
+                filename, content, mimetype = self._normalize_attachment(attachment)
+                if filename is None or content is None:
+                    continue
+
+                # Identical content (e.g. a policy PDF sent to thousands) is stored once
+                blob = store_blob(content)
+                references[blob.pk] = references.get(blob.pk, 0) + 1
+                attachments.append(OutgoingEmailAttachment(
+                    email=audit,
+                    blob=blob,
+                    file=blob.file.name,
+                    filename=filename,
+                    content_type=mimetype or '',
+                    size=blob.size,
+                ))
+        if attachments:
+            with transaction.atomic():
+                OutgoingEmailAttachment.objects.bulk_create(attachments)
+                add_references(references)
+
+        return audits
+
+    def _build_audit_row(self, message, backend: str) -> OutgoingEmail:
         to_emails = _parse_recipients(getattr(message, 'to', None))
         cc_emails = _parse_recipients(getattr(message, 'cc', None))
         bcc_emails = _parse_recipients(getattr(message, 'bcc', None))
@@ -88,9 +208,9 @@ class AuditingEmailBackend(BaseEmailBackend):
             if mimetype == 'text/html':
                 html_body = alt_body
 
-        audit = OutgoingEmail.objects.create(
+        return OutgoingEmail(
             status='PENDING',
-            backend=f"{self.__class__.__module__}.{self.__class__.__name__}",
+            backend=backend,
             from_email=getattr(message, 'from_email', '') or '',
             to_emails=_emails_to_csv(to_emails),
             cc_emails=_emails_to_csv(cc_emails),
@@ -101,28 +221,6 @@ class AuditingEmailBackend(BaseEmailBackend):
             html_body=html_body,
         )
 
-        attachments = getattr(message, 'attachments', None) or []
-        for attachment in attachments:
-            filename, content, mimetype = self._normalize_attachment(attachment)
-            if filename is None or content is None:
-                continue
-
-            if isinstance(content, bytes):
-                content_bytes = content
-            else:
-                content_bytes = str(content).encode('utf-8')
-
-            saved_file = ContentFile(content_bytes, name=filename)
-            OutgoingEmailAttachment.objects.create(
-                email=audit,
-                file=saved_file,
-                filename=filename,
-                content_type=mimetype or '',
-                size=len(content_bytes),
-            )
-
-        return audit
-
     def _normalize_attachment(self, attachment):
         if isinstance(attachment, tuple):
             if len(attachment) == 3:
@@ -131,10 +229,7 @@ class AuditingEmailBackend(BaseEmailBackend):
                 return attachment[0], attachment[1], ''
 
         if hasattr(attachment, 'read') and hasattr(attachment, 'name'):
-            try:
-                data = attachment.read()
-            except Exception:
-                return None, None, None
-            return getattr(attachment, 'name', 'attachment'), data, getattr(attachment, 'content_type', '')
+            # Returned unread, store_blob streams it
+            return getattr(attachment, 'name', 'attachment'), attachment, getattr(attachment, 'content_type', '')
 
         return None, None, None
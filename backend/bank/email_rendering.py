@@ -0,0 +1,115 @@
+"""
+Email Rendering
+Compiles each email template once per worker process and renders the HTML and
+plain-text bodies from the compiled templates. The plain-text body comes from a
+sibling .txt template (emails/welcome.html -> emails/welcome.txt) instead of
+running strip_tags over the rendered HTML on every send.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Context, Template, TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATE_DIR = 'emails'
+
+_lock = threading.Lock()
+_compiled: Dict[str, Tuple[Template, Optional[Template]]] = {}
+
+
+@dataclass(frozen=True)
+class RenderedEmail:
+    html: str
+    text: str
+
+
+def text_template_name(template_name: str) -> str:
+    return template_name.rsplit('.', 1)[0] + '.txt'
+
+
+def available_templates() -> List[str]:
+    """Email templates under templates/emails, excluding the shared base layout."""
+    directory = Path(settings.BASE_DIR) / 'templates' / EMAIL_TEMPLATE_DIR
+    return sorted(
+        f'{EMAIL_TEMPLATE_DIR}/{path.name}'
+        for path in directory.glob('*.html')
+        if path.name != 'base.html'
+    )
+
+
+def get_compiled(template_name: str) -> Tuple[Template, Optional[Template]]:
+    """
+    Return the compiled (html, text) templates, compiling them on first use.
+
+    The text template is None when no .txt sibling exists, in which case the
+    text body falls back to strip_tags.
+    """
+    compiled = _compiled.get(template_name)
+    if compiled is not None:
+        return compiled
+
+    html_template = get_template(template_name).template
+    try:
+        text_template = get_template(text_template_name(template_name)).template
+    except TemplateDoesNotExist:
+        logger.warning(f"No plain-text template for {template_name}, falling back to strip_tags")
+        text_template = None
+
+    with _lock:
+        return _compiled.setdefault(template_name, (html_template, text_template))
+
+
+def warm(template_names: Optional[Iterable[str]] = None) -> int:
+    """Compile templates ahead of the first send. Returns the number compiled."""
+    names = list(template_names) if template_names is not None else available_templates()
+    for name in names:
+        get_compiled(name)
+    return len(names)
+
+
+def clear_cache() -> None:
+    with _lock:
+        _compiled.clear()
+
+
+@receiver(setting_changed)
+def _clear_on_template_settings_change(setting, **kwargs):
+    if setting in ('TEMPLATES', 'BASE_DIR'):
+        clear_cache()
+
+
+def _render(html_template: Template, text_template: Optional[Template], context: Context) -> RenderedEmail:
+    html = html_template.render(context)
+    text = text_template.render(context) if text_template else strip_tags(html)
+    return RenderedEmail(html=html, text=text.strip() + '\n')
+
+
+def render_email(template_name: str, context: Dict[str, Any]) -> RenderedEmail:
+    """Render the HTML and plain-text bodies of one email."""
+    html_template, text_template = get_compiled(template_name)
+    return _render(html_template, text_template, Context(context))
+
+
+def render_many(template_name: str, contexts: Iterable[Dict[str, Any]]) -> List[RenderedEmail]:
+    """
+    Render one template for many recipients.
+
+    The templates are looked up once and a single Context is reused, with each
+    recipient's values pushed on top of it for the duration of their render.
+    """
+    html_template, text_template = get_compiled(template_name)
+    context = Context()
+    rendered = []
+    for values in contexts:
+        with context.push(values):
+            rendered.append(_render(html_template, text_template, context))
+    return rendered
@@ -1,10 +1,10 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from celery import shared_task
 from django.contrib.auth import get_user_model
 
+from .email_rendering import render_email, render_many
+
 User = get_user_model()
 
 @shared_task
@@ -19,17 +19,16 @@ def send_welcome_email(user_id, password):
             'password': password,
         }
         
-        html_message = render_to_string('emails/welcome.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/welcome.html', context)
         
         print(f"Sending welcome email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except User.DoesNotExist:
         print(f"User {user_id} not found for welcome email")
@@ -49,17 +48,16 @@ def send_crypto_approval_email(crypto_deposit_id):
             'wallet_type': crypto_deposit.crypto_wallet.get_crypto_type_display(),
         }
         
-        html_message = render_to_string('emails/crypto_deposit_approved.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/crypto_deposit_approved.html', context)
 
         print(f"Sending crypto approval email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except CryptoDeposit.DoesNotExist:
         print(f"CryptoDeposit {crypto_deposit_id} not found")
@@ -80,17 +78,16 @@ def send_crypto_rejection_email(crypto_deposit_id, notes=''):
             'notes': notes
         }
         
-        html_message = render_to_string('emails/crypto_deposit_rejected.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/crypto_deposit_rejected.html', context)
 
         print(f"Sending crypto rejection email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except CryptoDeposit.DoesNotExist:
         print(f"CryptoDeposit {crypto_deposit_id} not found")
@@ -109,17 +106,16 @@ def send_transfer_received_email(to_user_id, amount, from_desc, memo=''):
             'memo': memo
         }
         
-        html_message = render_to_string('emails/transfer_received.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/transfer_received.html', context)
 
         print(f"Sending transfer receipt email to {to_user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [to_user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except User.DoesNotExist:
         print(f"User {to_user_id} not found for transfer receipt")
@@ -145,17 +141,16 @@ def send_account_status_email(account_id, status, reference=None):
             'reference': reference
         }
         
-        html_message = render_to_string(template, context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email(template, context)
 
         print(f"Sending account {status} status email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except Account.DoesNotExist:
         print(f"Account {account_id} not found for status email")
@@ -172,17 +167,16 @@ def send_verification_email(user_id, code):
             'code': code
         }
         
-        html_message = render_to_string('emails/verification_code.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/verification_code.html', context)
         
         print(f"Sending verification email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except User.DoesNotExist:
         print(f"User {user_id} not found for verification email")
@@ -199,17 +193,16 @@ def send_password_reset_email(user_id, code):
             'code': code
         }
         
-        html_message = render_to_string('emails/password_reset_code.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/password_reset_code.html', context)
         
         print(f"Sending password reset email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except User.DoesNotExist:
         print(f"User {user_id} not found for password reset email")
@@ -241,17 +234,16 @@ def send_transaction_status_email(entry_id, status):
             'amount': posting.amount
         }
         
-        html_message = render_to_string('emails/transaction_status.html', context)
-        plain_message = strip_tags(html_message)
+        rendered = render_email('emails/transaction_status.html', context)
 
         print(f"Sending transaction {status} email to {user.email}")
         send_mail(
             subject,
-            plain_message,
+            rendered.text,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
-            html_message=html_message
+            html_message=rendered.html
         )
     except LedgerEntry.DoesNotExist:
         print(f"LedgerEntry {entry_id} not found for status email")
@@ -278,20 +270,31 @@ def send_kyc_status_email(profile, status, rejection_reason=None):
         'dashboard_url': f"{settings.FRONTEND_URL}/app/profile" if hasattr(settings, 'FRONTEND_URL') else '#',
     }
     
-    html_message = render_to_string('emails/kyc_status_update.html', context)
-    plain_message = strip_tags(html_message)
+    rendered = render_email('emails/kyc_status_update.html', context)
     
     print(f"Sending KYC {status} email to {user.email}")
     send_mail(
         subject,
-        plain_message,
+        rendered.text,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         fail_silently=False,
-        html_message=html_message
+        html_message=rendered.html
     )
 
 
+@shared_task
+def send_kyc_status_email_task(profile_id, status, rejection_reason=None):
+    """Send the KYC status email from a worker."""
+    from .models import CustomerProfile
+    
+    profile = CustomerProfile.objects.select_related('user').filter(id=profile_id).first()
+    if not profile:
+        print(f"CustomerProfile {profile_id} not found for KYC status email")
+        return
+    send_kyc_status_email(profile, status, rejection_reason)
+
+
 def send_account_verification_email(user):
     """Notify user that their account has been verified."""
     subject = 'Account Verified - Welcome to SnelROI!'
@@ -300,17 +303,16 @@ def send_account_verification_email(user):
         'user': user,
     }
     
-    html_message = render_to_string('emails/account_active.html', context)
-    plain_message = strip_tags(html_message)
+    rendered = render_email('emails/account_active.html', context)
     
     print(f"Sending account verification email to {user.email}")
     send_mail(
         subject,
-        plain_message,
+        rendered.text,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         fail_silently=False,
-        html_message=html_message
+        html_message=rendered.html
     )
 
 
@@ -323,15 +325,48 @@ def send_account_rejection_email(user, rejection_reason):
         'rejection_reason': rejection_reason,
     }
     
-    html_message = render_to_string('emails/account_frozen.html', context)
-    plain_message = strip_tags(html_message)
+    rendered = render_email('emails/account_frozen.html', context)
     
     print(f"Sending account rejection email to {user.email}")
     send_mail(
         subject,
-        plain_message,
+        rendered.text,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         fail_silently=False,
-        html_message=html_message
+        html_message=rendered.html
     )
+
+
+def send_mass(messages, batch_size=100, fail_silently=True):
+    """
+    Send many prepared EmailMessage objects over one connection.
+
+    Each batch is audited with bulk writes by AuditingEmailBackend. Returns the
+    number of messages sent.
+    """
+    messages = list(messages)
+    connection = get_connection(fail_silently=fail_silently)
+    sent = 0
+    connection.open()
+    try:
+        for start in range(0, len(messages), batch_size):
+            sent += connection.send_messages(messages[start:start + batch_size]) or 0
+    finally:
+        connection.close()
+    return sent
+
+
+@shared_task
+def send_campaign_email(subject, template_name, user_ids, extra_context=None):
+    """Render a template for each user and send the campaign through send_mass."""
+    users = list(User.objects.filter(id__in=user_ids, is_active=True))
+    rendered = render_many(template_name, ({'user': user, **(extra_context or {})} for user in users))
+    messages = []
+    for user, body in zip(users, rendered):
+        message = EmailMultiAlternatives(subject, body.text, settings.DEFAULT_FROM_EMAIL, [user.email])
+        message.attach_alternative(body.html, 'text/html')
+        messages.append(message)
+    
+    print(f"Sending campaign '{subject}' to {len(messages)} users")
+    return send_mass(messages)
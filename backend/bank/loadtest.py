@@ -0,0 +1,57 @@
+"""
+Load Test Helpers
+Shared by the loadtest_websockets and loadtest_api management commands.
+Load-test users live under the reserved @loadtest.invalid domain so a run can
+always find and delete what it created.
+"""
+import resource
+import subprocess
+from typing import Dict, Iterable, Optional
+
+from django.contrib.auth import get_user_model
+
+LOADTEST_DOMAIN = '@loadtest.invalid'
+
+
+def loadtest_email(prefix: str, index) -> str:
+    return f'{prefix}{index}{LOADTEST_DOMAIN}'
+
+
+def delete_loadtest_users(prefix: str) -> int:
+    """Delete load-test users whose email starts with prefix, with the ledger entries they created."""
+    from .models import LedgerEntry
+
+    users = get_user_model().objects.filter(email__startswith=prefix, email__endswith=LOADTEST_DOMAIN)
+    LedgerEntry.objects.filter(created_by__in=users).delete()
+    return users.delete()[0]
+
+
+def summarize(samples: Iterable[float]) -> Dict:
+    """Latency percentiles in milliseconds for samples given in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0}
+
+    def pick(fraction):
+        return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 2)
+
+    return {'count': len(ordered), 'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': pick(1.0)}
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak when /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_commit() -> Optional[str]:
+    """The checked out git commit, so reports from different commits can be told apart."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,69 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from bank.email_rendering import available_templates, render_many, warm
+
+
+def sample_context(index):
+    """One context that satisfies every template in templates/emails."""
+    user = SimpleNamespace(
+        first_name=f'Customer{index}', username=f'customer{index}', email=f'customer{index}@example.com',
+    )
+    return {
+        'user': user,
+        'customer_name': f'Customer {index}',
+        'password': 'Temp-Pass-123',
+        'code': f'{index % 1000000:06d}',
+        'amount': '1250.00',
+        'amount_usd': '1250.00',
+        'wallet_type': 'Bitcoin',
+        'notes': 'Amount did not match the transaction on chain',
+        'from_desc': 'ACME Payroll',
+        'memo': 'Salary',
+        'account_number': f'10{index:08d}',
+        'reference': f'REF-{index}',
+        'status': 'APPROVED',
+        'entry_type': 'Transfer',
+        'rejection_reason': 'Document expired',
+        'dashboard_url': 'https://snelroi.com/app/profile',
+        'application_number': f'TR-{index}',
+        'tax_year': 2025,
+        'approved_refund': '830.00',
+        'admin_notes': '',
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measure email renders per second for each template, compared with render_to_string + strip_tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help='Renders per template')
+        parser.add_argument(
+            '--template',
+            action='append',
+            default=None,
+            help='Only benchmark this template, e.g. emails/welcome.html (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        templates = options['template'] or available_templates()
+        contexts = [sample_context(i) for i in range(iterations)]
+        warm(templates)
+
+        self.stdout.write(f"{'template':<40}{'legacy/s':>12}{'compiled/s':>12}{'speedup':>10}")
+        for name in templates:
+            started = time.perf_counter()
+            for context in contexts:
+                strip_tags(render_to_string(name, context))
+            legacy = iterations / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            render_many(name, contexts)
+            compiled = iterations / (time.perf_counter() - started)
+
+            self.stdout.write(f'{name:<40}{legacy:>12.0f}{compiled:>12.0f}{compiled / legacy:>9.1f}x')
@@ -0,0 +1,55 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bank import benchmarks
+
+from .benchmark_services import Rollback
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the rows serialized per second of the DRF list serializers and their read_serializers fast '
+        'paths over a seeded dataset, which is rolled back afterwards. Exits non-zero when the outputs differ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=200, help='Customers in the seeded dataset')
+        parser.add_argument('--repeat', type=int, default=10, help='Rounds per serializer, the median is reported')
+        parser.add_argument('--only', nargs='+', choices=sorted(benchmarks.SERIALIZER_COMPARISONS), help='Compare only these')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['size'] < 1 or options['repeat'] < 1:
+            raise CommandError('--size and --repeat must be at least 1')
+
+        if options['verbosity'] < 2:
+            for name in ('bank', 'celery'):
+                logging.getLogger(name).setLevel(logging.WARNING)
+
+        try:
+            with transaction.atomic():
+                dataset = benchmarks.seed_dataset(options['size'])
+                results = benchmarks.compare_serializers(dataset, options['repeat'], options['only'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps({'size': options['size'], 'results': results}, indent=2))
+        else:
+            self.stdout.write(
+                f"{'endpoint':<24}{'rows':>7}{'drf rows/s':>13}{'fast rows/s':>14}{'speedup':>9}{'queries':>11}{'same':>6}"
+            )
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{name:<24}{result['rows']:>7}{result['drf_rows_per_sec']:>13}{result['fast_rows_per_sec']:>14}"
+                    f"{result['speedup']:>8}x{result['drf_queries']:>6} -> {result['fast_queries']:<3}"
+                    f"{'yes' if result['identical'] else 'NO':>4}"
+                )
+
+        different = [name for name, result in results.items() if not result['identical']]
+        if different:
+            raise CommandError('Fast path output differs from the serializer for: ' + ', '.join(different))
@@ -0,0 +1,75 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bank import benchmarks
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the hot service functions over a seeded dataset and check their SQL query budgets and the '
+        'checked-in timing baseline. The dataset is rolled back afterwards. Exits non-zero on a regression.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=200, help='Customers in the seeded dataset')
+        parser.add_argument('--repeat', type=int, default=20, help='Rounds per benchmark, the median is reported')
+        parser.add_argument('--tolerance', type=float, default=2.0, help='Allowed slowdown against the baseline median')
+        parser.add_argument('--only', nargs='+', choices=sorted(benchmarks.BENCHMARKS), help='Run only these benchmarks')
+        parser.add_argument('--update-baseline', action='store_true', help='Write the measured timings as the new baseline')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['size'] < 1 or options['repeat'] < 1:
+            raise CommandError('--size and --repeat must be at least 1')
+        if options['update_baseline'] and options['only']:
+            raise CommandError('--update-baseline needs every benchmark, drop --only')
+
+        if options['verbosity'] < 2:
+            # Per-call INFO logging would dominate the measurements
+            for name in ('bank', 'celery'):
+                logging.getLogger(name).setLevel(logging.WARNING)
+
+        try:
+            with transaction.atomic():
+                dataset = benchmarks.seed_dataset(options['size'])
+                results = benchmarks.run_benchmarks(dataset, options['repeat'], options['only'])
+                # Nothing the benchmarks wrote, outbox rows included, should survive the run
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['update_baseline']:
+            benchmarks.write_baseline(results, options['size'])
+            self.stdout.write(f'Baseline written to {benchmarks.BASELINE_PATH}')
+
+        baseline = benchmarks.load_baseline()
+        failures = benchmarks.check_results(results, baseline, options['size'], options['tolerance'])
+
+        if options['json']:
+            self.stdout.write(json.dumps({'size': options['size'], 'results': results, 'failures': failures}, indent=2))
+        else:
+            self.print_results(results, baseline, options['size'])
+
+        if failures:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(failures))
+
+    def print_results(self, results, baseline, size):
+        reference = baseline.get('benchmarks', {}) if baseline.get('size') == size else {}
+        self.stdout.write(
+            f"{'benchmark':<32}{'median ms':>11}{'min ms':>10}{'baseline ms':>13}{'queries':>9}{'budget':>8}"
+        )
+        for name, result in results.items():
+            base = reference.get(name, {}).get('median_ms', '-')
+            self.stdout.write(
+                f"{name:<32}{result['median_ms']:>11}{result['min_ms']:>10}{base:>13}"
+                f"{result['queries']:>9}{result['max_queries']:>8}"
+            )
+        if not reference:
+            self.stdout.write(f"Timings not compared: the baseline was recorded with --size {baseline.get('size')}")
@@ -0,0 +1,93 @@
+import time
+
+from channels_redis.core import RedisChannelLayer
+from django.core.management.base import BaseCommand
+
+from bank import ws_protocol
+
+
+def sample_messages():
+    """Group messages shaped like the ones the notification and chat sockets receive."""
+    return {
+        'notification_message': {
+            'type': 'notification_message',
+            'notification': {
+                'id': 184220,
+                'notification_type': 'TRANSACTION',
+                'priority': 'MEDIUM',
+                'title': 'Transfer Received',
+                'message': 'You received $1,250.00 from ACME Payroll. Reference REF-20261019-8841.',
+                'action_url': '/app/transactions',
+                'metadata': {'reference': 'REF-20261019-8841', 'amount': '1250.00', 'status': 'POSTED'},
+                'is_read': False,
+                'read_at': None,
+                'created_at': '2026-10-19T08:41:12.482016Z',
+            },
+        },
+        'chat_message': {
+            'type': 'chat_message',
+            'message': {
+                'id': 90211,
+                'sender_type': 'ADMIN',
+                'sender_name': 'Support Team',
+                'message': 'Your card has been shipped and should arrive within 3-5 business days.',
+                'is_read': False,
+                'created_at': '2026-10-19T08:41:12.482016Z',
+            },
+        },
+        'unread_count': {'type': 'unread_count', 'unread_count': 7},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare WebSocket frame size, channel layer payload and fan-out cost for JSON and '
+        'snel.msgpack.v1, with and without pre-encoded frames'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deliveries', type=int, default=10000, help='Sockets a message fans out to')
+
+    def handle(self, *args, **options):
+        deliveries = options['deliveries']
+        # Only serialize() is used, the layer never connects
+        layer = RedisChannelLayer()
+
+        self.stdout.write(
+            f"{'message':<22}{'json B':>8}{'msgpack B':>11}{'raw layer B':>13}{'framed layer B':>16}"
+            f"{'per-socket encode ms':>22}{'pre-encoded ms':>16}"
+        )
+        for name, message in sample_messages().items():
+            frame = ws_protocol.client_frame(message)
+            json_size = len(ws_protocol.encode(frame, ws_protocol.JSON).encode())
+            msgpack_size = len(ws_protocol.encode(frame, ws_protocol.MSGPACK))
+            framed = ws_protocol.with_frames(message)
+            # channels_redis serializes the whole group message once per receiving channel
+            raw_layer_size = len(layer.serialize(message))
+            framed_layer_size = len(layer.serialize(framed))
+
+            # Raw payload: the layer carries the message, every consumer builds and encodes its frame
+            started = time.perf_counter()
+            for index in range(deliveries):
+                event = layer.deserialize(layer.serialize(message))
+                ws_protocol.encode(
+                    ws_protocol.client_frame(event), ws_protocol.MSGPACK if index % 2 else ws_protocol.JSON
+                )
+            per_socket = (time.perf_counter() - started) * 1000
+
+            # Pre-encoded: encode once per group_send, the layer carries the frames and consumers pick theirs
+            started = time.perf_counter()
+            framed = ws_protocol.with_frames(message)
+            for index in range(deliveries):
+                event = layer.deserialize(layer.serialize(framed))
+                event['frames'][ws_protocol.MSGPACK if index % 2 else ws_protocol.JSON]
+            pre_encoded = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(
+                f'{name:<22}{json_size:>8}{msgpack_size:>11}{raw_layer_size:>13}{framed_layer_size:>16}'
+                f'{per_socket:>22.1f}{pre_encoded:>16.1f}'
+            )
+        self.stdout.write(
+            f'Layer columns are bytes per delivered channel, CPU columns milliseconds for {deliveries} deliveries '
+            'including channel layer serialization'
+        )
@@ -7,7 +7,8 @@ from bank.services import (
     create_virtual_card_notification,
     create_crypto_deposit_notification,
     create_security_notification,
-    create_system_notification
+    create_system_notification,
+    broadcast_notification
 )
 
 User = get_user_model()
@@ -23,10 +24,26 @@ class Command(BaseCommand):
             help='Email of the user to create notifications for',
             default=None
         )
+        parser.add_argument(
+            '--broadcast',
+            action='store_true',
+            help='Broadcast the system maintenance notice to every customer instead',
+        )
 
     def handle(self, *args, **options):
         email = options.get('email')
         
+        if options.get('broadcast'):
+            total = broadcast_notification(
+                segment='ALL',
+                title='System Maintenance',
+                message='Scheduled maintenance will occur on Sunday from 2:00 AM to 4:00 AM EST. Banking services may be temporarily unavailable.',
+                priority='MEDIUM',
+                action_url='/app/help'
+            )
+            self.stdout.write(self.style.SUCCESS(f'Broadcast system maintenance notice to {total} customers'))
+            return
+        
         if email:
             try:
                 user = User.objects.get(email=email)
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from bank.loadtest import LOADTEST_DOMAIN, current_commit, delete_loadtest_users, loadtest_email, summarize
+
+USER_PREFIX = 'api-'
+ADMIN_EMAIL = loadtest_email(USER_PREFIX, 'admin')
+PAYEE_EMAIL = loadtest_email(USER_PREFIX, 'payee')
+PASSWORD = 'Load-Test-Pass-123'
+
+
+def seed():
+    """Create the admin that approves transfers and the customer that receives them."""
+    from bank.services import create_customer_account
+
+    User = get_user_model()
+    admin, created = User.objects.get_or_create(
+        username=ADMIN_EMAIL, defaults={'email': ADMIN_EMAIL, 'is_staff': True, 'is_active': True},
+    )
+    if created:
+        admin.set_password(PASSWORD)
+        admin.save()
+    payee, _ = User.objects.get_or_create(username=PAYEE_EMAIL, defaults={'email': PAYEE_EMAIL, 'is_active': True})
+    return create_customer_account(payee).account_number
+
+
+def verification_code(email):
+    from bank.models import VerificationCode
+
+    return (
+        VerificationCode.objects.filter(user__email=email, purpose='EMAIL_VERIFICATION')
+        .order_by('-created_at').values_list('code', flat=True).first()
+    )
+
+
+class Recorder:
+    """Latency, status codes and errors per endpoint, keyed by method and route template."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    async def call(self, client, method, url, route=None, expect=(200, 201), **kwargs):
+        label = f'{method} {route or url}'
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.latencies[label].append(time.perf_counter() - started)
+            self.statuses[label][type(e).__name__] += 1
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - started)
+        self.statuses[label][str(response.status_code)] += 1
+        if response.status_code not in expect:
+            self.errors[label] += 1
+            return None
+        return response
+
+    def report(self, elapsed):
+        endpoints = {}
+        for label in sorted(self.latencies):
+            count = len(self.latencies[label])
+            endpoints[label] = {
+                **summarize(self.latencies[label]),
+                'errors': self.errors[label],
+                'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+                'status_codes': dict(sorted(self.statuses[label].items())),
+            }
+        requests = sum(len(samples) for samples in self.latencies.values())
+        return {
+            'requests': requests,
+            'errors': sum(self.errors.values()),
+            'throughput_rps': round(requests / elapsed, 2) if elapsed else 0,
+            'endpoints': endpoints,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Run scripted customer journeys (register, verify, login, dashboard, transactions, transfer) and '
+        'admin approval loops against the REST API, and report throughput, latency percentiles and errors '
+        'per endpoint. Runs in-process through the ASGI application unless --base-url is given. Needs httpx.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=None, help='Server to load, e.g. http://localhost:8000. Default: in-process')
+        parser.add_argument('--users', type=int, default=20, help='Customers that run the journey')
+        parser.add_argument('--concurrency', type=int, default=10, help='Journeys running at the same time')
+        parser.add_argument('--iterations', type=int, default=3, help='Dashboard, transactions and transfer rounds per customer')
+        parser.add_argument('--admins', type=int, default=1, help='Admin loops approving pending transfers, 0 to skip approvals')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument('--output', default=None, help='Also write the JSON report to this file')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--keep-users', action='store_true', help='Keep seeded and registered users')
+        parser.add_argument('--cleanup', action='store_true', help='Only delete users left by earlier runs')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.stdout.write(f'Deleted {delete_loadtest_users(USER_PREFIX)} load-test rows')
+            return
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError('loadtest_api needs httpx, install it with: pip install httpx')
+        if options['users'] < 1 or options['concurrency'] < 1 or options['admins'] < 0:
+            raise CommandError('--users and --concurrency must be at least 1, --admins at least 0')
+
+        if options['verbosity'] < 2:
+            # Per-request INFO logging would dominate the measurements
+            for name in ('bank', 'celery', 'django.request', 'httpx'):
+                logging.getLogger(name).setLevel(logging.ERROR)
+
+        payee_account = seed()
+        try:
+            report = asyncio.run(self.run_load(payee_account, options))
+        finally:
+            if not options['keep_users']:
+                delete_loadtest_users(USER_PREFIX)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+        else:
+            self.print_report(report)
+
+    def client(self, options):
+        import httpx
+
+        if options['base_url']:
+            return httpx.AsyncClient(base_url=options['base_url'], timeout=options['timeout'])
+        from banking.asgi import application
+
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=application), base_url='http://localhost', timeout=options['timeout'],
+        )
+
+    async def run_load(self, payee_account, options):
+        recorder = Recorder()
+        run_id = uuid.uuid4().hex[:8]
+        gate = asyncio.Semaphore(options['concurrency'])
+        journeys_done = asyncio.Event()
+        get_code = sync_to_async(verification_code)
+
+        async def journey(client, index):
+            email = loadtest_email(USER_PREFIX, f'{run_id}-{index}')
+            async with gate:
+                registered = await recorder.call(client, 'POST', '/api/auth/register/', json={
+                    'first_name': 'Load', 'last_name': f'Test {index}', 'username': email, 'email': email,
+                    'password': PASSWORD, 'confirm_password': PASSWORD, 'terms_accepted': True,
+                })
+                code = await get_code(email) if registered else None
+                if not code:
+                    return
+                if not await recorder.call(client, 'POST', '/api/auth/verify-email/', json={'email': email, 'code': code}):
+                    return
+                login = await recorder.call(client, 'POST', '/api/auth/login/', json={'email': email, 'password': PASSWORD})
+                if not login:
+                    return
+                headers = {'Authorization': f"Bearer {login.json()['access']}"}
+
+                for _ in range(options['iterations']):
+                    await recorder.call(client, 'GET', '/api/dashboard/', headers=headers)
+                    await recorder.call(client, 'GET', '/api/transactions/', headers=headers)
+                    await recorder.call(client, 'POST', '/api/transfers/', headers=headers, json={
+                        'amount': '1.00', 'memo': 'Load test', 'target_account_number': payee_account,
+                    })
+
+        async def approvals(client, index):
+            login = await recorder.call(client, 'POST', '/api/auth/login/', json={'email': ADMIN_EMAIL, 'password': PASSWORD})
+            if not login:
+                return
+            headers = {'Authorization': f"Bearer {login.json()['access']}"}
+            while True:
+                # Read the flag before polling so transfers made by the last journeys are still approved
+                finished = journeys_done.is_set()
+                pending = await recorder.call(
+                    client, 'GET', '/api/admin/transactions/?status=PENDING', route='/api/admin/transactions/',
+                    headers=headers,
+                )
+                # Only entries created by load-test users, real customers' requests are never touched
+                entries = [
+                    entry for entry in (pending.json() if pending else [])
+                    if entry.get('created_by_email', '').endswith(LOADTEST_DOMAIN) and entry['id'] % options['admins'] == index
+                ]
+                for entry in entries:
+                    await recorder.call(
+                        client, 'POST', f"/api/admin/transactions/{entry['id']}/approve/",
+                        route='/api/admin/transactions/{id}/approve/', headers=headers,
+                    )
+                if finished:
+                    return
+                if not entries:
+                    await asyncio.sleep(0.2)
+
+        async with self.client(options) as client:
+            started = time.perf_counter()
+            admin_loops = [asyncio.ensure_future(approvals(client, index)) for index in range(options['admins'])]
+            await asyncio.gather(*(journey(client, index) for index in range(options['users'])))
+            journeys_done.set()
+            await asyncio.gather(*admin_loops)
+            elapsed = time.perf_counter() - started
+
+        return {
+            'commit': current_commit(),
+            'target': options['base_url'] or 'in-process',
+            'config': {key: options[key] for key in ('users', 'concurrency', 'iterations', 'admins')},
+            'elapsed_seconds': round(elapsed, 2),
+            **recorder.report(elapsed),
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['requests']} requests in {report['elapsed_seconds']}s against {report['target']} "
+            f"({report['throughput_rps']} req/s, {report['errors']} errors)"
+        )
+        self.stdout.write(
+            f"{'endpoint':<46}{'count':>7}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}"
+        )
+        for label, stats in report['endpoints'].items():
+            self.stdout.write(
+                f"{label:<46}{stats['count']:>7}{stats['throughput_rps']:>8}"
+                f"{stats['p50']:>9}{stats['p95']:>9}{stats['p99']:>9}{stats['errors']:>8}"
+            )
+        self.stdout.write('Latencies in milliseconds')
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from bank.loadtest import delete_loadtest_users, loadtest_email, rss_bytes, summarize
+
+USER_PREFIX = 'loadtest-'
+
+
+def prepare_users(count):
+    """Create (or reuse) count load-test customers, each with one open support conversation."""
+    from rest_framework_simplejwt.tokens import AccessToken
+    from bank.models import SupportConversation
+    from bank.services import create_customer_account
+
+    User = get_user_model()
+    emails = [loadtest_email(USER_PREFIX, index) for index in range(count)]
+    existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    new_users = []
+    for email in emails:
+        if email not in existing:
+            user = User(username=email, email=email, is_active=True)
+            user.set_unusable_password()
+            new_users.append(user)
+    User.objects.bulk_create(new_users, batch_size=500)
+
+    users = list(User.objects.filter(email__in=emails).select_related('profile').order_by('id'))
+    for user in users:
+        if not hasattr(user, 'profile'):
+            create_customer_account(user)
+    profiles = {user.id: user.profile for user in User.objects.filter(email__in=emails).select_related('profile')}
+
+    conversations = dict(
+        SupportConversation.objects.filter(customer__in=profiles.values(), subject='Load test')
+        .values_list('customer__user_id', 'id')
+    )
+    missing = [SupportConversation(customer=profiles[user.id], subject='Load test') for user in users if user.id not in conversations]
+    SupportConversation.objects.bulk_create(missing, batch_size=500)
+    conversations = dict(
+        SupportConversation.objects.filter(customer__in=profiles.values(), subject='Load test')
+        .values_list('customer__user_id', 'id')
+    )
+    return [
+        {'user_id': user.id, 'token': str(AccessToken.for_user(user)), 'conversation_id': conversations[user.id]}
+        for user in users
+    ]
+
+
+class Socket:
+    """One client connection, records the latency of every reply it can match to a send."""
+
+    def __init__(self, communicator, kind, stats):
+        self.communicator = communicator
+        self.kind = kind
+        self.stats = stats
+        self.pings = []
+
+    async def send(self, frame):
+        from bank import ws_protocol
+
+        if self.stats['msgpack']:
+            await self.communicator.send_to(bytes_data=ws_protocol.encode(frame, ws_protocol.MSGPACK))
+        else:
+            await self.communicator.send_to(text_data=json.dumps(frame))
+
+    async def ping(self):
+        self.pings.append(time.perf_counter())
+        await self.send({'type': 'ping'})
+
+    async def read(self, stop_at):
+        from bank import ws_protocol
+
+        while True:
+            remaining = stop_at - time.perf_counter()
+            if remaining <= 0:
+                return
+            try:
+                output = await self.communicator.receive_output(timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+            if output['type'] == 'websocket.close':
+                self.stats['closed'] += 1
+                return
+            received = time.perf_counter()
+            if output.get('bytes') is not None:
+                frame = ws_protocol.decode(output['bytes'])
+                self.stats['bytes_in'] += len(output['bytes'])
+            else:
+                frame = json.loads(output['text'])
+                self.stats['bytes_in'] += len(output['text'].encode())
+            self.stats['frames_in'] += 1
+            self.record(frame, received)
+
+    def record(self, frame, received):
+        frame_type = frame.get('type')
+        latencies = self.stats['latency']
+        if frame_type == 'pong' and self.pings:
+            latencies[f'{self.kind}_ping'].append(received - self.pings.pop(0))
+        elif frame_type == 'notification':
+            sent = frame['notification'].get('metadata', {}).get('loadtest_sent_at')
+            if sent:
+                latencies['notification_fanout'].append(received - sent)
+        elif frame_type == 'message':
+            text = frame['message'].get('message', '')
+            if text.startswith('lt '):
+                latencies['chat_message'].append(received - float(text[3:]))
+        elif frame_type == 'error':
+            self.stats['errors'] += 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Open N authenticated notification and support chat sockets against the ASGI application in this '
+        'process, drive pings, typing, chat messages and notification fan-out, and report connect latency, '
+        'message latency percentiles and memory per connection'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=200, help='Virtual customers, each opens a notification socket')
+        parser.add_argument('--chat-ratio', type=float, default=1.0, help='Share of customers that also open their chat socket')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to drive traffic after everyone connected')
+        parser.add_argument('--connect-concurrency', type=int, default=50, help='Connections opened at the same time')
+        parser.add_argument('--ping-interval', type=float, default=30.0, help='Seconds between pings on every socket')
+        parser.add_argument('--typing-rate', type=float, default=0.2, help='Typing events per chat socket per second')
+        parser.add_argument('--message-rate', type=float, default=0.05, help='Chat messages per chat socket per second')
+        parser.add_argument('--fanout-interval', type=float, default=5.0, help='Seconds between notifications pushed to every customer')
+        parser.add_argument('--layer', choices=['memory', 'redis'], default='memory', help='Channel layer to run against')
+        parser.add_argument('--redis-url', default='redis://localhost:6379/0', help='Channel layer Redis for --layer redis')
+        parser.add_argument('--msgpack', action='store_true', help='Negotiate the snel.msgpack.v1 subprotocol')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--keep-users', action='store_true', help='Keep the load-test customers for the next run')
+        parser.add_argument('--cleanup', action='store_true', help='Only delete load-test customers left by earlier runs')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.stdout.write(f'Deleted {delete_loadtest_users(USER_PREFIX)} load-test rows')
+            return
+        if options['connections'] < 1:
+            raise CommandError('--connections must be at least 1')
+
+        if options['layer'] == 'redis':
+            layer = {'BACKEND': 'channels_redis.core.RedisChannelLayer', 'CONFIG': {'hosts': [options['redis_url']]}}
+        else:
+            layer = {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 10000}}
+
+        if options['verbosity'] < 2:
+            # Per-message INFO logging would dominate the measurements
+            for name in ('bank', 'celery'):
+                logging.getLogger(name).setLevel(logging.WARNING)
+
+        clients = prepare_users(options['connections'])
+        try:
+            with override_settings(CHANNEL_LAYERS={'default': layer}, PRESENCE_BACKEND='memory'):
+                from bank import presence
+
+                presence.reset_store()
+                report = asyncio.run(self.run_load(clients, options))
+                presence.reset_store()
+        finally:
+            if not options['keep_users']:
+                delete_loadtest_users(USER_PREFIX)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    async def run_load(self, clients, options):
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from banking.asgi import application
+        from bank import ws_protocol
+
+        stats = {
+            'msgpack': options['msgpack'], 'frames_in': 0, 'bytes_in': 0, 'errors': 0, 'closed': 0,
+            'latency': {name: [] for name in ('notifications_ping', 'chat_ping', 'notification_fanout', 'chat_message')},
+        }
+        subprotocols = [ws_protocol.MSGPACK_SUBPROTOCOL] if options['msgpack'] else None
+        chat_clients = set(random.sample(range(len(clients)), int(len(clients) * options['chat_ratio'])))
+        connect_times = []
+        failures = 0
+        sockets = []
+        gate = asyncio.Semaphore(options['connect_concurrency'])
+
+        async def open_socket(path, kind):
+            nonlocal failures
+            communicator = WebsocketCommunicator(application, path, subprotocols=subprotocols)
+            async with gate:
+                started = time.perf_counter()
+                connected, _ = await communicator.connect(timeout=30)
+                if not connected:
+                    failures += 1
+                    return None
+                connect_times.append(time.perf_counter() - started)
+            sockets.append(Socket(communicator, kind, stats))
+            return sockets[-1]
+
+        rss_before = rss_bytes()
+        await asyncio.gather(*(
+            open_socket(f"/ws/notifications/?token={client['token']}", 'notifications') for client in clients
+        ), *(
+            open_socket(f"/ws/support/chat/{clients[index]['conversation_id']}/?token={clients[index]['token']}", 'chat')
+            for index in chat_clients
+        ))
+        rss_after = rss_bytes()
+
+        stop_at = time.perf_counter() + options['duration']
+        channel_layer = get_channel_layer()
+
+        async def every(interval, action):
+            if interval <= 0:
+                return
+            # Spread the first tick so sockets do not fire in lockstep
+            await asyncio.sleep(random.uniform(0, interval))
+            while time.perf_counter() < stop_at:
+                await action()
+                await asyncio.sleep(interval)
+
+        async def fan_out():
+            sent = time.perf_counter()
+            notification = {
+                'id': 0, 'notification_type': 'SYSTEM', 'priority': 'LOW', 'title': 'Load test',
+                'message': 'Fan-out probe', 'action_url': '', 'metadata': {'loadtest_sent_at': sent},
+                'is_read': False, 'read_at': None, 'created_at': '',
+            }
+            await asyncio.gather(*(
+                channel_layer.group_send(
+                    f"notifications_{client['user_id']}",
+                    ws_protocol.with_frames({'type': 'notification_message', 'notification': notification}),
+                )
+                for client in clients
+            ))
+
+        drivers = [every(options['fanout_interval'], fan_out)]
+        for socket in sockets:
+            drivers.append(every(options['ping_interval'], socket.ping))
+            if socket.kind == 'chat':
+                if options['typing_rate'] > 0:
+                    drivers.append(every(1 / options['typing_rate'], lambda s=socket: s.send({'type': 'typing', 'is_typing': True})))
+                if options['message_rate'] > 0:
+                    drivers.append(every(
+                        1 / options['message_rate'],
+                        lambda s=socket: s.send({'type': 'message', 'message': f'lt {time.perf_counter():.9f}'}),
+                    ))
+
+        # Readers keep draining a little longer so in-flight replies are counted
+        readers = [socket.read(stop_at + 2) for socket in sockets]
+        started = time.perf_counter()
+        await asyncio.gather(*drivers, *readers)
+        elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*(socket.communicator.disconnect() for socket in sockets), return_exceptions=True)
+
+        return {
+            'connections': len(sockets),
+            'connect_failures': failures,
+            'layer': options['layer'],
+            'protocol': ws_protocol.MSGPACK_SUBPROTOCOL if options['msgpack'] else 'json',
+            'connect_latency_ms': summarize(connect_times),
+            'message_latency_ms': {name: summarize(samples) for name, samples in stats['latency'].items()},
+            'frames_received': stats['frames_in'],
+            'bytes_received': stats['bytes_in'],
+            'frames_per_second': round(stats['frames_in'] / elapsed, 1) if elapsed else 0,
+            'server_errors': stats['errors'],
+            'closed_by_server': stats['closed'],
+            'rss_per_connection_bytes': round((rss_after - rss_before) / len(sockets)) if sockets else 0,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['connections']} sockets ({report['connect_failures']} failed) on the {report['layer']} layer, "
+            f"{report['protocol']} frames"
+        )
+        self.stdout.write(f"{'latency (ms)':<22}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        rows = [('connect', report['connect_latency_ms'])] + list(report['message_latency_ms'].items())
+        for name, summary in rows:
+            if summary['count']:
+                self.stdout.write(
+                    f"{name:<22}{summary['count']:>8}{summary['p50']:>10}{summary['p95']:>10}{summary['p99']:>10}{summary['max']:>10}"
+                )
+            else:
+                self.stdout.write(f"{name:<22}{0:>8}")
+        self.stdout.write(
+            f"{report['frames_received']} frames received ({report['frames_per_second']}/s), "
+            f"{report['server_errors']} error frames, {report['closed_by_server']} closed by server"
+        )
+        self.stdout.write(
+            f"RSS per connection: {report['rss_per_connection_bytes'] / 1024:.1f} KiB "
+            f"(includes the in-process test client)"
+        )
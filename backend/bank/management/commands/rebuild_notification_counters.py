@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from bank.services import rebuild_unread_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-customer unread notification counters from the Notification table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--customer',
+            type=int,
+            action='append',
+            help='Only rebuild the counter of this customer profile id (repeatable)',
+            default=None
+        )
+
+    def handle(self, *args, **options):
+        processed = rebuild_unread_counters(customer_ids=options.get('customer'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt unread counters for {processed} customers'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from bank.services import rebuild_support_inbox
+
+
+class Command(BaseCommand):
+    help = 'Recompute support conversation unread counts and last message previews from the messages'
+
+    def handle(self, *args, **options):
+        processed = rebuild_support_inbox()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt inbox columns for {processed} conversations'))
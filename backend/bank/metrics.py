@@ -0,0 +1,233 @@
+"""
+Request and Task Metrics
+Per-request latency, SQL query count and time, response size and status code,
+and per-task Celery queue wait, run time, retries and failures, exposed in
+Prometheus text format on /metrics.
+
+Requests are labelled by the matched route template (e.g.
+``api/admin/transactions/<int:pk>/approve/``) rather than the raw path, so ids
+in URLs do not explode the label cardinality. When PROMETHEUS_MULTIPROC_DIR is
+set, every process writes its samples there and /metrics aggregates them, so
+all workers behind the load balancer report as one. Directories listed in
+METRICS_COLLECT_DIRS (e.g. the Celery workers' directory on a shared volume)
+are aggregated into the same scrape.
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+UNMATCHED_ROUTE = '<unmatched>'
+
+if prometheus_client is not None:
+    if MULTIPROC_DIR:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+    REQUESTS = Counter(
+        'http_requests_total', 'HTTP requests by route, method and status',
+        ['route', 'method', 'status'],
+    )
+    LATENCY = Histogram(
+        'http_request_duration_seconds', 'Time spent handling the request',
+        ['route', 'method'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    )
+    SQL_QUERIES = Histogram(
+        'http_request_sql_queries', 'SQL queries executed per request',
+        ['route', 'method'],
+        buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+    )
+    SQL_DURATION = Histogram(
+        'http_request_sql_duration_seconds', 'Time spent in SQL per request',
+        ['route', 'method'],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    )
+    RESPONSE_SIZE = Histogram(
+        'http_response_size_bytes', 'Response body size, streamed responses are not counted',
+        ['route', 'method'],
+        buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    )
+
+    TASK_QUEUE_WAIT = Histogram(
+        'celery_task_queue_wait_seconds', 'Time between publishing a task and a worker starting it',
+        ['task'],
+        buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+    )
+    TASK_RUNTIME = Histogram(
+        'celery_task_runtime_seconds', 'Task run time by final state',
+        ['task', 'state'],
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+    )
+    TASK_RETRIES = Counter('celery_task_retries_total', 'Task retries requested', ['task'])
+    TASK_FAILURES = Counter('celery_task_failures_total', 'Tasks that raised', ['task', 'exception'])
+
+
+class QueryTimer:
+    """connection.execute_wrapper hook counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def request_route(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match and match.route else UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """Record latency, SQL usage, response size and status for every HTTP request."""
+
+    def __init__(self, get_response):
+        if prometheus_client is None or not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        try:
+            route = request_route(request)
+            method = request.method
+            REQUESTS.labels(route, method, str(response.status_code)).inc()
+            LATENCY.labels(route, method).observe(elapsed)
+            SQL_QUERIES.labels(route, method).observe(timer.count)
+            SQL_DURATION.labels(route, method).observe(timer.duration)
+            if not response.streaming:
+                RESPONSE_SIZE.labels(route, method).observe(len(response.content))
+        except Exception as e:
+            # Metrics must never fail the request
+            logger.warning(f"Could not record request metrics: {e}")
+        return response
+
+
+def render_metrics() -> bytes:
+    """Samples of every process sharing PROMETHEUS_MULTIPROC_DIR, or of this process only."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        extra = [path for path in getattr(settings, 'METRICS_COLLECT_DIRS', []) if os.path.isdir(path)]
+        for path in [MULTIPROC_DIR, *extra]:
+            multiprocess.MultiProcessCollector(registry, path=path)
+        return prometheus_client.generate_latest(registry)
+    return prometheus_client.generate_latest()
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, guarded by METRICS_TOKEN when it is set."""
+    if prometheus_client is None:
+        return HttpResponse('prometheus_client is not installed', status=503, content_type='text/plain')
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+# ============ Celery ============
+
+PUBLISHED_AT_HEADER = 'published_at'
+
+# task_id -> perf_counter at task_prerun, popped again at task_postrun
+_task_started = {}
+
+
+def stamp_published_at(headers=None, **kwargs):
+    """before_task_publish: record the publish time in the message headers."""
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+def record_task_start(task_id=None, task=None, **kwargs):
+    """task_prerun: observe how long the message waited in the queue."""
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+    if published_at:
+        TASK_QUEUE_WAIT.labels(task.name).observe(max(time.time() - float(published_at), 0))
+
+
+def record_task_end(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+def record_task_retry(sender=None, **kwargs):
+    TASK_RETRIES.labels(sender.name).inc()
+
+
+def record_task_failure(sender=None, exception=None, **kwargs):
+    TASK_FAILURES.labels(sender.name, type(exception).__name__).inc()
+
+
+def connect_celery_signals():
+    """Instrument every task, publishers stamp messages and workers record timings."""
+    if prometheus_client is None or not getattr(settings, 'METRICS_ENABLED', True):
+        return
+    from celery import signals
+
+    signals.before_task_publish.connect(stamp_published_at, weak=False)
+    signals.task_prerun.connect(record_task_start, weak=False)
+    signals.task_postrun.connect(record_task_end, weak=False)
+    signals.task_retry.connect(record_task_retry, weak=False)
+    signals.task_failure.connect(record_task_failure, weak=False)
+
+
+def celery_queue_depths(app=None, timeout: float = 2.0) -> dict:
+    """
+    Messages waiting in each known queue, read from the broker.
+
+    Covers the default queue and any configured task_queues. On Redis the
+    count includes every priority sub-queue.
+    """
+    from celery import current_app
+
+    app = app or current_app
+    names = [app.conf.task_default_queue] + [queue.name for queue in (app.conf.task_queues or [])]
+    depths = {}
+    with app.connection_for_read() as conn:
+        conn.ensure_connection(max_retries=1, timeout=timeout)
+        channel = conn.default_channel
+        for name in dict.fromkeys(names):
+            try:
+                depths[name] = channel.queue_declare(queue=name, passive=True).message_count
+            except Exception:
+                # Passive declare fails for a queue nobody has declared yet
+                depths[name] = 0
+    return depths
+
+
+def celery_worker_load(app=None, timeout: float = 1.0) -> dict:
+    """Active and prefetched (reserved) task counts per worker, from a broadcast inspect."""
+    from celery import current_app
+
+    inspect = (app or current_app).control.inspect(timeout=timeout)
+    active = inspect.active() or {}
+    reserved = inspect.reserved() or {}
+    return {
+        worker: {'active': len(active.get(worker, [])), 'reserved': len(reserved.get(worker, []))}
+        for worker in sorted(set(active) | set(reserved))
+    }
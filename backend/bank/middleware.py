@@ -2,7 +2,6 @@
 WebSocket Authentication Middleware for Django Channels
 """
 from urllib.parse import parse_qs
-from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
@@ -10,8 +9,9 @@ from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 import logging
 
+from .authentication import get_cached_user
+
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 
 class JWTAuthMiddleware(BaseMiddleware):
@@ -49,8 +49,8 @@ class JWTAuthMiddleware(BaseMiddleware):
 
     @database_sync_to_async
     def get_user(self, user_id):
-        """Retrieve user from database"""
-        try:
-            return User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        """Retrieve the user (and profile) through the shared auth cache"""
+        user = get_cached_user(user_id)
+        if user is None or not user.is_active:
             return AnonymousUser()
+        return user
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0019_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outgoingemailattachment',
+            name='file',
+            field=models.FileField(blank=True, upload_to='outgoing_email_attachments/'),
+        ),
+        migrations.CreateModel(
+            name='EmailAttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(upload_to='outgoing_email_blobs/')),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count'], name='bank_emaila_ref_cou_3422d4_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='outgoingemailattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='bank.emailattachmentblob'),
+        ),
+    ]
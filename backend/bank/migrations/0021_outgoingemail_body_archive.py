@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0020_emailattachmentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='body_archive_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='body_archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
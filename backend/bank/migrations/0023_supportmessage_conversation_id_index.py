@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0022_outgoingemail_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supportmessage',
+            index=models.Index(fields=['conversation', 'id'], name='bank_suppor_convers_e5c724_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+
+
+def backfill_inbox_columns(apps, schema_editor):
+    SupportConversation = apps.get_model('bank', 'SupportConversation')
+    SupportMessage = apps.get_model('bank', 'SupportMessage')
+    SupportInboxCounter = apps.get_model('bank', 'SupportInboxCounter')
+
+    latest = SupportMessage.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+    conversations = SupportConversation.objects.annotate(
+        admin_unread=Count('messages', filter=Q(messages__sender_type='CUSTOMER', messages__is_read=False)),
+        customer_unread=Count('messages', filter=Q(messages__sender_type='ADMIN', messages__is_read=False)),
+        latest_text=Subquery(latest.values('message')[:1]),
+        latest_sender=Subquery(latest.values('sender_type')[:1]),
+    ).order_by('pk')
+
+    fields = ['unread_by_admin', 'unread_by_customer', 'last_message_preview', 'last_message_sender_type']
+    admin_total = 0
+    batch = []
+    for conversation in conversations.iterator(chunk_size=500):
+        conversation.unread_by_admin = conversation.admin_unread
+        conversation.unread_by_customer = conversation.customer_unread
+        conversation.last_message_preview = (conversation.latest_text or '')[:100]
+        conversation.last_message_sender_type = conversation.latest_sender or ''
+        admin_total += conversation.admin_unread
+        batch.append(conversation)
+        if len(batch) >= 500:
+            SupportConversation.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        SupportConversation.objects.bulk_update(batch, fields)
+
+    SupportInboxCounter.objects.create(key='admin', unread_count=admin_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0023_supportmessage_conversation_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupportInboxCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=20, unique=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='supportconversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='supportconversation',
+            name='last_message_sender_type',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='supportconversation',
+            name='unread_by_admin',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supportconversation',
+            name='unread_by_customer',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='supportconversation',
+            index=models.Index(fields=['-last_message_at', '-created_at'], name='bank_suppor_last_me_2d78a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportconversation',
+            index=models.Index(fields=['status', '-last_message_at', '-created_at'], name='bank_suppor_status_fd42e8_idx'),
+        ),
+        migrations.RunPython(backfill_inbox_columns, migrations.RunPython.noop),
+    ]
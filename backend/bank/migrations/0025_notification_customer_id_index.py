@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0024_support_inbox_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['customer', 'id'], name='bank_notifi_custome_e882b5_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0026_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveIntegerField(unique=True)),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('sql', models.TextField()),
+                ('param_shape', models.JSONField(blank=True, default=list)),
+                ('duration_ms', models.FloatField()),
+                ('source_type', models.CharField(choices=[('VIEW', 'View'), ('TASK', 'Celery Task'), ('OTHER', 'Other')], default='OTHER', max_length=10)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('stack', models.JSONField(blank=True, default=list)),
+                ('captured_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-captured_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:53
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_last_used_at(apps, schema_editor):
+    EmailAttachmentBlob = apps.get_model('bank', 'EmailAttachmentBlob')
+    EmailAttachmentBlob.objects.update(last_used_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0027_slow_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailattachmentblob',
+            name='last_used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_last_used_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# On PostgreSQL icontains compiles to UPPER("col"::text) LIKE UPPER(%s), so the
+# trigram indexes from 0022 on the raw columns were never used by the admin
+# email search. These index the same expression the lookup produces.
+TRIGRAM_INDEXES = [
+    ('bank_outgoingemail_subject_upper_trgm', 'subject'),
+    ('bank_outgoingemail_to_emails_upper_trgm', 'to_emails'),
+]
+RAW_TRIGRAM_INDEXES = [
+    ('bank_outgoingemail_subject_trgm', 'subject'),
+    ('bank_outgoingemail_to_emails_trgm', 'to_emails'),
+]
+
+
+def create_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON bank_outgoingemail USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+    for name, _column in RAW_TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def restore_raw_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in RAW_TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON bank_outgoingemail USING gin ({column} gin_trgm_ops)'
+        )
+    for name, _column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('bank', '0028_emailattachmentblob_last_used_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_trigram_indexes, restore_raw_trigram_indexes),
+    ]
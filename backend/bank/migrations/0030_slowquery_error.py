@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0029_outgoingemail_upper_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slowquery',
+            name='error',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models import Sum
 from django.utils import timezone
@@ -546,9 +547,18 @@ class SupportConversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_message_at = models.DateTimeField(null=True, blank=True)
+    # Inbox columns, maintained by services.record_support_message and mark_support_conversation_read
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_message_sender_type = models.CharField(max_length=10, blank=True)
+    unread_by_admin = models.PositiveIntegerField(default=0)
+    unread_by_customer = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-last_message_at', '-created_at']
+        indexes = [
+            models.Index(fields=['-last_message_at', '-created_at']),
+            models.Index(fields=['status', '-last_message_at', '-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.customer.full_name} - {self.get_status_display()}"
@@ -570,11 +580,25 @@ class SupportMessage(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Cursor paging walks a conversation's messages by id
+            models.Index(fields=['conversation', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.conversation.id} - {self.sender_type} - {self.created_at}"
 
 
+class SupportInboxCounter(models.Model):
+    """Running unread total for an inbox, 'admin' counts customer messages no admin has read"""
+    key = models.CharField(max_length=20, unique=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.unread_count}"
+
+
 class Notification(models.Model):
     """User notifications for banking events"""
     TYPE_CHOICES = [
@@ -623,6 +647,8 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['customer', '-created_at']),
             models.Index(fields=['customer', 'is_read']),
+            # Resume after a reconnect reads (customer, id > last seen)
+            models.Index(fields=['customer', 'id']),
         ]
     
     def __str__(self):
@@ -631,9 +657,64 @@ class Notification(models.Model):
     def mark_as_read(self):
         """Mark notification as read"""
         if not self.is_read:
+            from .services import adjust_unread_count
+            
             self.is_read = True
             self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            # Conditional update so concurrent readers only decrement the counter once
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(
+                is_read=True, read_at=self.read_at
+            )
+            if updated:
+                adjust_unread_count(self.customer_id, -updated)
+    
+    def mark_as_unread(self):
+        """Mark notification as unread"""
+        if self.is_read:
+            from .services import adjust_unread_count
+            
+            self.is_read = False
+            self.read_at = None
+            updated = Notification.objects.filter(pk=self.pk, is_read=True).update(
+                is_read=False, read_at=None
+            )
+            if updated:
+                adjust_unread_count(self.customer_id, updated)
+
+
+class NotificationArchive(models.Model):
+    """Notifications moved out of the live table by the retention job"""
+    original_id = models.BigIntegerField(unique=True)
+    customer = models.ForeignKey(CustomerProfile, on_delete=models.CASCADE, related_name='archived_notifications')
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_CHOICES)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    action_url = models.CharField(max_length=255, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.customer.full_name} - {self.title} (archived)"
+
+
+class NotificationCounter(models.Model):
+    """Per-customer unread notification count, kept in step with Notification rows"""
+    customer = models.OneToOneField(CustomerProfile, on_delete=models.CASCADE, related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.customer.full_name} - {self.unread_count} unread"
 
 
 class OutgoingEmail(models.Model):
@@ -663,6 +744,9 @@ class OutgoingEmail(models.Model):
     subject = models.CharField(max_length=998, blank=True)
     text_body = models.TextField(blank=True)
     html_body = models.TextField(blank=True)
+    # Set once the retention job has cleared the bodies, only the headers remain
+    body_archived_at = models.DateTimeField(null=True, blank=True)
+    body_archive_name = models.CharField(max_length=255, blank=True)
 
     created_by = models.ForeignKey(
         User,
@@ -683,9 +767,37 @@ class OutgoingEmail(models.Model):
         return f"{self.subject} -> {self.to_emails} ({self.status})"
 
 
+class EmailAttachmentBlob(models.Model):
+    """Attachment content stored once per SHA-256 digest and shared by every email that carries it."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='outgoing_email_blobs/')
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever a send reuses the blob, garbage collection's grace period counts from here
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class OutgoingEmailAttachment(models.Model):
     email = models.ForeignKey(OutgoingEmail, on_delete=models.CASCADE, related_name='attachments')
-    file = models.FileField(upload_to='outgoing_email_attachments/')
+    # Points at the blob's file; rows written before blobs existed own their file
+    file = models.FileField(upload_to='outgoing_email_attachments/', blank=True)
+    blob = models.ForeignKey(
+        EmailAttachmentBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='attachments',
+    )
     filename = models.CharField(max_length=255)
     content_type = models.CharField(max_length=255, blank=True)
     size = models.BigIntegerField(default=0)
@@ -1154,3 +1266,91 @@ class WithdrawalAttempt(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.amount} {self.currency} at {self.created_at}"
+
+
+class OutboxMessage(models.Model):
+    """Side effect recorded in the business transaction and delivered after commit"""
+    KIND_CHOICES = [
+        ('TASK', 'Celery Task'),
+        ('TELEGRAM', 'Telegram Alert'),
+        ('WEBSOCKET', 'WebSocket Group Message'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    dedupe_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class RequestProfile(models.Model):
+    """Profiler output and SQL trace of one request an admin asked to profile"""
+    PROFILER_CHOICES = [
+        ('CPROFILE', 'cProfile'),
+        ('PYINSTRUMENT', 'pyinstrument'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='requested_profiles')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    route = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_time_ms = models.FloatField(default=0)
+    sql_trace = models.JSONField(default=list, blank=True)
+    profiler = models.CharField(max_length=20, choices=PROFILER_CHOICES)
+    summary = models.TextField(blank=True)
+    profile_file = models.FileField(upload_to='request_profiles/')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class SlowQuery(models.Model):
+    """One slot of the slow query ring buffer, overwritten as captures wrap around"""
+    SOURCE_TYPE_CHOICES = [
+        ('VIEW', 'View'),
+        ('TASK', 'Celery Task'),
+        ('OTHER', 'Other'),
+    ]
+
+    slot = models.PositiveIntegerField(unique=True)
+    fingerprint = models.CharField(max_length=16, db_index=True)
+    sql = models.TextField()
+    param_shape = models.JSONField(default=list, blank=True)
+    duration_ms = models.FloatField()
+    error = models.CharField(max_length=100, blank=True)
+    source_type = models.CharField(max_length=10, choices=SOURCE_TYPE_CHOICES, default='OTHER')
+    source = models.CharField(max_length=255, blank=True)
+    stack = models.JSONField(default=list, blank=True)
+    captured_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-captured_at']
+
+    def __str__(self):
+        return f"{self.fingerprint} {self.duration_ms:.0f} ms ({self.source or self.source_type})"
@@ -0,0 +1,134 @@
+"""
+Admin Operations Feed
+Pushes new work for the admin console (pending transactions, crypto deposit
+proofs, KYC submissions, loan applications, customer support messages) and
+its resolution to the OPS_GROUP channel layer group, so open admin tabs stay
+current without polling the dashboard and pending-approval endpoints.
+
+Each event carries only the pending counts it can change, named like the
+dashboard's pending_approvals keys. A snapshot of every count is sent when
+the admin socket connects. Events are queued through the outbox, so they go
+out only if the caller's transaction commits.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+from django.utils import timezone
+
+OPS_GROUP = 'admin_ops'
+
+
+def _count_transactions():
+    from .models import LedgerEntry
+    return LedgerEntry.objects.filter(status='PENDING').count()
+
+
+def _count_kyc_documents():
+    from .models import CustomerProfile
+    return CustomerProfile.objects.filter(kyc_status='UNDER_REVIEW').count()
+
+
+def _count_loans():
+    from .models import Loan
+    return Loan.objects.filter(status='PENDING').count()
+
+
+def _count_virtual_cards():
+    from .models import VirtualCard
+    return VirtualCard.objects.filter(status='PENDING').count()
+
+
+def _count_tax_refunds():
+    from .models import TaxRefundApplication
+    return TaxRefundApplication.objects.filter(status__in=['SUBMITTED', 'UNDER_REVIEW']).count()
+
+
+def _count_grants():
+    from .models import GrantApplication
+    return GrantApplication.objects.filter(status__in=['SUBMITTED', 'UNDER_REVIEW']).count()
+
+
+def _count_crypto_deposits():
+    from .models import CryptoDeposit
+    return CryptoDeposit.objects.filter(verification_status='PENDING_VERIFICATION').count()
+
+
+def _count_support_unread():
+    from .services import get_admin_support_unread_count
+    return get_admin_support_unread_count()
+
+
+PENDING_COUNTS = {
+    'transactions': _count_transactions,
+    'kyc_documents': _count_kyc_documents,
+    'loans': _count_loans,
+    'virtual_cards': _count_virtual_cards,
+    'tax_refunds': _count_tax_refunds,
+    'grants': _count_grants,
+    'crypto_deposits': _count_crypto_deposits,
+    'support_unread': _count_support_unread,
+}
+
+
+def pending_counts(names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Current pending counts, all of them or just the named ones."""
+    names = PENDING_COUNTS if names is None else names
+    return {name: PENDING_COUNTS[name]() for name in names}
+
+
+def emit_ops_event(event: str, data: Dict[str, Any], counts: Iterable[str] = ()) -> None:
+    """
+    Queue an ops feed event for every connected admin.
+
+    Args:
+        event: Dotted event name, e.g. 'transaction.pending'
+        data: JSON-serializable details of the affected object
+        counts: Names from PENDING_COUNTS to recompute and attach
+    """
+    from .outbox import enqueue_group_send
+
+    enqueue_group_send(OPS_GROUP, {
+        'type': 'ops_event',
+        'event': event,
+        'data': data,
+        'counts': pending_counts(counts),
+        'at': timezone.now().isoformat(),
+    })
+
+
+def entry_event_data(entry) -> Dict[str, Any]:
+    return {
+        'id': entry.id,
+        'reference': entry.reference,
+        'entry_type': entry.entry_type,
+        'status': entry.status,
+        'memo': entry.memo,
+        'created_by': entry.created_by.email if entry.created_by_id else None,
+    }
+
+
+def loan_event_data(loan) -> Dict[str, Any]:
+    return {
+        'id': loan.id,
+        'loan_type': loan.loan_type,
+        'status': loan.status,
+        'requested_amount': str(loan.requested_amount),
+        'customer_email': loan.customer.user.email,
+    }
+
+
+def crypto_deposit_event_data(deposit) -> Dict[str, Any]:
+    return {
+        'id': deposit.id,
+        'status': deposit.verification_status,
+        'amount_usd': str(deposit.amount_usd),
+        'purpose': deposit.purpose,
+        'customer_email': deposit.customer.user.email,
+    }
+
+
+def kyc_event_data(profile) -> Dict[str, Any]:
+    return {
+        'customer_id': profile.id,
+        'status': profile.kyc_status,
+        'customer_email': profile.user.email,
+    }
@@ -0,0 +1,268 @@
+"""
+Transactional Outbox
+Side effects (Celery tasks such as emails, Telegram alerts and WebSocket group
+messages) are written as OutboxMessage rows in the same transaction as the
+business change. After commit the dispatch_outbox task drains them in batches,
+retrying failures with exponential backoff. Nothing here performs external I/O
+on the request path. Delivery is at least once: a worker that dies after
+sending but before recording the outcome leaves its batch to be sent again.
+"""
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None, delay_seconds: int = 0) -> None:
+    """
+    Record a side effect in the current transaction.
+
+    Args:
+        kind: One of OutboxMessage.KIND_CHOICES
+        payload: JSON-serializable description of the side effect
+        dedupe_key: Optional unique key, a second message with the same key is dropped
+        delay_seconds: Hold the message back, e.g. to coalesce bursts
+    """
+    # ignore_conflicts keeps a duplicate dedupe_key from aborting the caller's transaction
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(
+            kind=kind,
+            payload=payload,
+            dedupe_key=dedupe_key,
+            available_at=timezone.now() + timedelta(seconds=delay_seconds),
+        )],
+        ignore_conflicts=True,
+    )
+    _wake_after_commit(delay_seconds or None)
+
+
+def enqueue_task(task, *args, dedupe_key: Optional[str] = None, countdown: Optional[int] = None, **kwargs) -> None:
+    """Publish a Celery task once the current transaction commits."""
+    enqueue('TASK', {
+        'task': task.name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'countdown': countdown,
+    }, dedupe_key=dedupe_key)
+
+
+def enqueue_group_send(group: str, message: Dict[str, Any], dedupe_key: Optional[str] = None) -> None:
+    """Send a channel layer group message once the current transaction commits."""
+    enqueue('WEBSOCKET', {'group': group, 'message': message}, dedupe_key=dedupe_key)
+
+
+def enqueue_telegram(text: str, dedupe_key: Optional[str] = None, delay_seconds: int = 0) -> None:
+    """Send a Telegram alert once the current transaction commits."""
+    enqueue('TELEGRAM', {'text': text}, dedupe_key=dedupe_key, delay_seconds=delay_seconds)
+
+
+def _wake_after_commit(countdown: Optional[int]) -> None:
+    """
+    Coalesce the wake-ups of the messages enqueued in a transaction.
+
+    Every message registers its own cheap on_commit callback, so a rolled back
+    savepoint only drops its own. The requested countdowns are collected on the
+    connection and the first callback to run after commit wakes the dispatcher
+    once per distinct countdown and clears them, the rest find nothing to do.
+    Countdowns left behind by a rollback only cause one spare wake-up later.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        wake_dispatcher(countdown=countdown)
+        return
+    pending = getattr(connection, 'outbox_wake_countdowns', None)
+    if pending is None:
+        pending = connection.outbox_wake_countdowns = set()
+    pending.add(countdown)
+    transaction.on_commit(lambda: _flush_wakes(connection))
+
+
+def _flush_wakes(connection) -> None:
+    countdowns = getattr(connection, 'outbox_wake_countdowns', None)
+    if not countdowns:
+        return
+    connection.outbox_wake_countdowns = set()
+    for countdown in sorted(countdowns, key=lambda countdown: countdown or 0):
+        wake_dispatcher(countdown=countdown)
+
+
+def wake_dispatcher(countdown: Optional[int] = None):
+    """Ask a worker to drain the outbox now instead of waiting for the beat sweep."""
+    from .tasks import dispatch_outbox
+
+    try:
+        dispatch_outbox.apply_async(countdown=countdown)
+    except Exception as e:
+        # The periodic sweep will pick the messages up
+        logger.warning(f"Could not schedule outbox dispatch: {e}")
+
+
+# ============ Delivery ============
+
+def _deliver_tasks(messages: List[OutboxMessage]) -> Dict[int, str]:
+    from celery import current_app
+
+    errors = {}
+    for message in messages:
+        payload = message.payload
+        try:
+            current_app.tasks[payload['task']].apply_async(
+                args=payload.get('args') or [],
+                kwargs=payload.get('kwargs') or {},
+                countdown=payload.get('countdown'),
+            )
+        except Exception as e:
+            errors[message.id] = str(e)
+    return errors
+
+
+def _deliver_group_messages(messages: List[OutboxMessage]) -> Dict[int, str]:
+    import asyncio
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    from .ws_protocol import with_frames
+
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return {}
+
+    async def send_all():
+        return await asyncio.gather(*(
+            channel_layer.group_send(m.payload['group'], with_frames(m.payload['message'])) for m in messages
+        ), return_exceptions=True)
+
+    results = async_to_sync(send_all)()
+    return {
+        message.id: str(result)
+        for message, result in zip(messages, results)
+        if isinstance(result, Exception)
+    }
+
+
+def _deliver_telegram(messages: List[OutboxMessage]) -> Dict[int, str]:
+    from .telegram import TelegramDeliveryError, deliver_telegram_messages
+
+    # The batch goes out as digest messages, only those in digests that were not sent are retried
+    try:
+        deliver_telegram_messages([message.payload['text'] for message in messages])
+    except TelegramDeliveryError as e:
+        return {messages[index].id: str(e) for index in e.unsent}
+    except Exception as e:
+        return {message.id: str(e) for message in messages}
+    return {}
+
+
+DELIVERY_HANDLERS = {
+    'TASK': _deliver_tasks,
+    'TELEGRAM': _deliver_telegram,
+    'WEBSOCKET': _deliver_group_messages,
+}
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base * 2^(attempts - 1), capped."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 5)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def claim_batch(batch_size: int) -> List[OutboxMessage]:
+    """
+    Lease up to batch_size due messages to this worker.
+
+    Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED only long enough to
+    push their available_at OUTBOX_LEASE_SECONDS ahead, so other workers skip
+    them while they are delivered outside any transaction. Messages of a worker
+    that dies mid-delivery become due again when the lease runs out.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', available_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(available_at=now + lease)
+    return messages
+
+
+def dispatch_batch(batch_size: Optional[int] = None) -> int:
+    """
+    Deliver one batch of due outbox messages.
+
+    The batch is claimed in a short transaction, see claim_batch. Delivery
+    (broker publishes, channel layer sends, Telegram requests and their rate
+    limit waits) holds no row locks, and the outcomes are written back in one
+    bulk update.
+
+    Returns:
+        Number of messages processed (sent or rescheduled)
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0
+
+    errors = {}
+    for kind, handler in DELIVERY_HANDLERS.items():
+        of_kind = [m for m in messages if m.kind == kind]
+        if of_kind:
+            errors.update(handler(of_kind))
+
+    sent_at = timezone.now()
+    for message in messages:
+        message.attempts += 1
+        if message.id in errors:
+            message.last_error = errors[message.id]
+            if message.attempts >= max_attempts:
+                message.status = 'FAILED'
+                logger.error(f"Outbox message {message.id} failed permanently: {message.last_error}")
+            else:
+                message.available_at = sent_at + retry_delay(message.attempts)
+        else:
+            message.status = 'SENT'
+            message.sent_at = sent_at
+            message.last_error = ''
+
+    OutboxMessage.objects.bulk_update(
+        messages, ['status', 'attempts', 'available_at', 'last_error', 'sent_at']
+    )
+    return len(messages)
+
+
+def dispatch(max_batches: int = 50, batch_size: Optional[int] = None) -> int:
+    """Drain due outbox messages batch by batch. Returns messages processed."""
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+    processed = 0
+    for _ in range(max_batches):
+        count = dispatch_batch(batch_size)
+        processed += count
+        if count < batch_size:
+            break
+    return processed
+
+
+def purge_sent(older_than_days: Optional[int] = None, batch_size: int = 5000) -> int:
+    """Delete delivered messages past the retention window in bounded batches."""
+    days = older_than_days or getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    purged = 0
+    while True:
+        ids = list(
+            OutboxMessage.objects.filter(status='SENT', sent_at__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        purged += OutboxMessage.objects.filter(id__in=ids).delete()[0]
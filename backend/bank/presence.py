@@ -0,0 +1,196 @@
+"""
+Support Chat Presence
+Tracks which users have a live support chat socket. Every socket refreshes a
+heartbeat on connect and on each client ping; a user is online while at least
+one of their sockets has a heartbeat younger than PRESENCE_TTL_SECONDS.
+
+State lives in Redis sorted sets so all ASGI workers share it:
+
+    presence:users          member user id, score last heartbeat
+    presence:conn:<user>    member channel name, score heartbeat expiry
+
+Every operation is a constant number of round trips, independent of how many
+sockets are connected. Changes are published to the PRESENCE_GROUP channel
+layer group, which only the admin presence stream listens to.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+PRESENCE_GROUP = 'support_presence'
+OPEN_CONVERSATION_STATUSES = ('OPEN', 'IN_PROGRESS')
+
+_store_lock = threading.Lock()
+_store = None
+
+
+def presence_ttl() -> int:
+    return getattr(settings, 'PRESENCE_TTL_SECONDS', 75)
+
+
+# KEYS: connection set, users set. ARGV: channel name, now, user id.
+# Runs atomically, so a touch from another socket cannot land between the
+# count of live sockets and taking the user offline.
+REMOVE_CONNECTION_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[1]) > 0 then
+    return 0
+end
+return redis.call('ZREM', KEYS[2], ARGV[3])
+"""
+
+
+class RedisPresenceStore:
+    def __init__(self, client, prefix: str = 'presence'):
+        self.client = client
+        self.users_key = f'{prefix}:users'
+        self.prefix = prefix
+        self._remove_connection = client.register_script(REMOVE_CONNECTION_SCRIPT)
+
+    def _conn_key(self, user_id: int) -> str:
+        return f'{self.prefix}:conn:{user_id}'
+
+    def touch(self, user_id: int, connection: str, now: float, ttl: int) -> bool:
+        """Refresh one socket's heartbeat. Returns True if the user just came online."""
+        conn_key = self._conn_key(user_id)
+        pipe = self.client.pipeline()
+        pipe.zscore(self.users_key, user_id)
+        pipe.zadd(conn_key, {connection: now + ttl})
+        pipe.expire(conn_key, ttl * 2)
+        pipe.zadd(self.users_key, {user_id: now})
+        previous = pipe.execute()[0]
+        return previous is None or previous <= now - ttl
+
+    def remove(self, user_id: int, connection: str, now: float) -> bool:
+        """Drop one socket. Returns True if it was the user's last live socket."""
+        removed = self._remove_connection(keys=[self._conn_key(user_id), self.users_key], args=[connection, now, user_id])
+        return bool(removed)
+
+    def expire(self, now: float, ttl: int) -> List[int]:
+        """Remove users whose sockets all missed their heartbeat. Returns their ids."""
+        offline = []
+        for member in self.client.zrangebyscore(self.users_key, '-inf', now - ttl):
+            user_id = int(member)
+            if self.remove(user_id, '', now):
+                offline.append(user_id)
+        return offline
+
+    def online(self, now: float, ttl: int) -> Dict[int, float]:
+        members = self.client.zrangebyscore(self.users_key, now - ttl, '+inf', withscores=True)
+        return {int(member): score for member, score in members}
+
+
+class MemoryPresenceStore:
+    """Single-process stand-in for RedisPresenceStore, used in tests and local runs without Redis."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users: Dict[int, float] = {}
+        self.connections: Dict[int, Dict[str, float]] = {}
+
+    def touch(self, user_id: int, connection: str, now: float, ttl: int) -> bool:
+        with self.lock:
+            previous = self.users.get(user_id)
+            self.connections.setdefault(user_id, {})[connection] = now + ttl
+            self.users[user_id] = now
+            return previous is None or previous <= now - ttl
+
+    def remove(self, user_id: int, connection: str, now: float) -> bool:
+        with self.lock:
+            live = {
+                name: expires for name, expires in self.connections.get(user_id, {}).items()
+                if name != connection and expires > now
+            }
+            if live:
+                self.connections[user_id] = live
+                return False
+            self.connections.pop(user_id, None)
+            return self.users.pop(user_id, None) is not None
+
+    def expire(self, now: float, ttl: int) -> List[int]:
+        with self.lock:
+            stale = [user_id for user_id, seen in self.users.items() if seen <= now - ttl]
+        return [user_id for user_id in stale if self.remove(user_id, '', now)]
+
+    def online(self, now: float, ttl: int) -> Dict[int, float]:
+        with self.lock:
+            return {user_id: seen for user_id, seen in self.users.items() if seen > now - ttl}
+
+
+def get_store():
+    """Return the process-wide presence store configured by PRESENCE_BACKEND."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if getattr(settings, 'PRESENCE_BACKEND', 'redis') == 'memory':
+                _store = MemoryPresenceStore()
+            else:
+                import redis
+
+                _store = RedisPresenceStore(redis.Redis.from_url(settings.PRESENCE_REDIS_URL))
+        return _store
+
+
+def reset_store() -> None:
+    global _store
+    with _store_lock:
+        _store = None
+
+
+def heartbeat(user_id: int, connection: str) -> bool:
+    """Record a heartbeat for one socket. Returns True if the user came online."""
+    return get_store().touch(user_id, connection, time.time(), presence_ttl())
+
+
+def disconnect(user_id: int, connection: str) -> bool:
+    """Forget one socket. Returns True if the user went offline."""
+    return get_store().remove(user_id, connection, time.time())
+
+
+def presence_event(user_id: int, status: str) -> Dict:
+    return {'type': 'presence_update', 'user_id': user_id, 'status': status, 'at': time.time()}
+
+
+def sweep() -> List[int]:
+    """
+    Mark users whose sockets stopped heartbeating (crashed workers, dropped
+    networks) offline and publish the changes. Returns the affected user ids.
+    """
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    offline = get_store().expire(time.time(), presence_ttl())
+    channel_layer = get_channel_layer()
+    if offline and channel_layer:
+        for user_id in offline:
+            async_to_sync(channel_layer.group_send)(PRESENCE_GROUP, presence_event(user_id, 'offline'))
+    return offline
+
+
+def open_conversations_by_user(user_ids: Optional[Iterable[int]] = None) -> Dict[int, List[int]]:
+    """Map customer user ids to their open support conversation ids."""
+    from .models import SupportConversation
+
+    conversations = SupportConversation.objects.filter(status__in=OPEN_CONVERSATION_STATUSES)
+    if user_ids is not None:
+        conversations = conversations.filter(customer__user_id__in=list(user_ids))
+
+    result: Dict[int, List[int]] = {}
+    for conversation_id, user_id in conversations.values_list('id', 'customer__user_id').order_by('id'):
+        result.setdefault(user_id, []).append(conversation_id)
+    return result
+
+
+def presence_snapshot() -> List[Dict]:
+    """Online customers that have an open support conversation."""
+    online = get_store().online(time.time(), presence_ttl())
+    if not online:
+        return []
+    conversations = open_conversations_by_user(online.keys())
+    return [
+        {'user_id': user_id, 'conversation_ids': conversations[user_id], 'last_seen': online[user_id]}
+        for user_id in sorted(conversations)
+    ]
@@ -0,0 +1,256 @@
+"""
+On-demand Request Profiling
+An admin requests a short-lived signed token and sends it with the request to
+profile, either as the X-Snel-Profile header or the __profile query parameter.
+The token is good for REQUEST_PROFILE_TOKEN_USES requests by default. Each of
+them runs under the profiler with its SQL traced (statement, parameter shape
+and duration), and the result is stored as a RequestProfile for download.
+purge_profiles keeps the stored profiles within REQUEST_PROFILE_MAX_STORED
+rows and REQUEST_PROFILE_RETENTION_DAYS. Requests without the token only pay
+for a header and query string lookup.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import secrets
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.utils import timezone
+
+from .slow_queries import param_shape
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - optional dependency
+    pyinstrument = None
+
+PROFILE_HEADER = 'HTTP_X_SNEL_PROFILE'
+PROFILE_QUERY_PARAM = '__profile'
+PROFILE_RESPONSE_HEADER = 'X-Request-Profile-Id'
+TOKEN_SALT = 'bank.profiling'
+TOKEN_USES_KEY = 'profiling:token_uses:{}'
+# SQL statements are kept up to these limits so a runaway request stays storable
+SQL_TRACE_MAX_QUERIES = 2000
+SQL_TRACE_MAX_CHARS = 4000
+SUMMARY_LINES = 40
+
+
+def issue_token(admin, uses: Optional[int] = None) -> str:
+    """Signed token that lets the next uses requests carrying it be profiled on behalf of admin."""
+    nonce = secrets.token_hex(8)
+    uses = uses or settings.REQUEST_PROFILE_TOKEN_USES
+    cache.set(TOKEN_USES_KEY.format(nonce), uses, timeout=settings.REQUEST_PROFILE_TOKEN_MAX_AGE)
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(f'{admin.pk}:{nonce}')
+
+
+def consume_use(nonce: str) -> bool:
+    """Take one use off the token, False once it has none left or has expired."""
+    try:
+        return cache.decr(TOKEN_USES_KEY.format(nonce)) >= 0
+    except ValueError:
+        return False
+
+
+def token_admin(token: str):
+    """
+    The staff user a token was issued to, or None when it is invalid, expired,
+    used up or revoked. A valid token loses one use.
+    """
+    try:
+        admin_id, nonce = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.REQUEST_PROFILE_TOKEN_MAX_AGE
+        ).split(':', 1)
+    except (signing.BadSignature, ValueError):
+        return None
+    admin = get_user_model().objects.filter(pk=admin_id, is_staff=True, is_active=True).first()
+    if admin is None or not consume_use(nonce):
+        return None
+    return admin
+
+
+def requested_token(request) -> Optional[str]:
+    token = request.META.get(PROFILE_HEADER)
+    if token:
+        return token
+    # Only parse the query string when the flag can be in it
+    if PROFILE_QUERY_PARAM in request.META.get('QUERY_STRING', ''):
+        return request.GET.get(PROFILE_QUERY_PARAM)
+    return None
+
+
+class SQLTrace:
+    """
+    connection.execute_wrapper hook keeping every statement with its duration.
+    Parameters are stored by shape only, like slow query captures, since they
+    can hold verification codes and tokens.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if len(self.queries) < SQL_TRACE_MAX_QUERIES:
+                self.queries.append({
+                    'sql': sql[:SQL_TRACE_MAX_CHARS],
+                    'param_shape': param_shape(params, many),
+                    'many': many,
+                    'duration_ms': round(elapsed * 1000, 3),
+                })
+
+
+class CProfileRunner:
+    profiler = 'CPROFILE'
+    extension = 'prof'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def output(self):
+        """The pstats dump (readable with snakeviz or flameprof) and a text summary."""
+        self.profile.create_stats()
+        # Dump first, pstats.Stats takes the stats over and leaves the profile empty
+        data = marshal.dumps(self.profile.stats)
+        summary = io.StringIO()
+        pstats.Stats(self.profile, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        return data, summary.getvalue()
+
+
+class PyinstrumentRunner:
+    profiler = 'PYINSTRUMENT'
+    extension = 'html'
+
+    def __init__(self):
+        self.profile = pyinstrument.Profiler(async_mode='disabled')
+
+    def start(self):
+        self.profile.start()
+
+    def stop(self):
+        self.profile.stop()
+
+    def output(self):
+        """The interactive HTML flame view and a text call tree."""
+        return self.profile.output_html().encode(), self.profile.output_text()
+
+
+def profiler_runner():
+    if settings.REQUEST_PROFILER == 'pyinstrument' and pyinstrument is not None:
+        return PyinstrumentRunner()
+    return CProfileRunner()
+
+
+class RequestProfilerMiddleware:
+    """Profile requests that carry a valid admin-issued token."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = requested_token(request)
+        if not token:
+            return self.get_response(request)
+        admin = token_admin(token)
+        if admin is None:
+            logger.warning(f"Ignoring invalid or used up profiling token on {request.path}")
+            return self.get_response(request)
+        return self.profile(request, admin)
+
+    def profile(self, request, admin):
+        runner = profiler_runner()
+        trace = SQLTrace()
+        started = time.perf_counter()
+        with connection.execute_wrapper(trace):
+            runner.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                runner.stop()
+        elapsed = time.perf_counter() - started
+
+        try:
+            profile = save_profile(request, response, admin, runner, trace, elapsed)
+            response[PROFILE_RESPONSE_HEADER] = str(profile.pk)
+        except Exception as e:
+            # Profiling must never fail the request it observed
+            logger.error(f"Could not store request profile for {request.path}: {e}")
+        return response
+
+
+def profiled_path(request) -> str:
+    """The request path and query string without the profiling token."""
+    query = request.GET.copy()
+    query.pop(PROFILE_QUERY_PARAM, None)
+    return f'{request.path}?{query.urlencode()}' if query else request.path
+
+
+def save_profile(request, response, admin, runner, trace, elapsed):
+    from .metrics import request_route
+    from .models import RequestProfile
+
+    data, summary = runner.output()
+    user = getattr(request, 'user', None)
+    profile = RequestProfile(
+        requested_by=admin,
+        user=user if user is not None and user.is_authenticated else None,
+        method=request.method,
+        path=profiled_path(request),
+        route=request_route(request),
+        status_code=response.status_code,
+        duration_ms=round(elapsed * 1000, 3),
+        sql_count=trace.count,
+        sql_time_ms=round(trace.duration * 1000, 3),
+        sql_trace=trace.queries,
+        profiler=runner.profiler,
+        summary=summary,
+    )
+    profile.profile_file.save(f'profile-{int(time.time())}.{runner.extension}', ContentFile(data), save=False)
+    profile.save()
+    return profile
+
+
+def purge_profiles() -> int:
+    """Delete profiles past the retention window or beyond the newest REQUEST_PROFILE_MAX_STORED, with their files."""
+    from .models import RequestProfile
+
+    cutoff = timezone.now() - timedelta(days=settings.REQUEST_PROFILE_RETENTION_DAYS)
+    keep = (
+        RequestProfile.objects.filter(created_at__gte=cutoff)
+        .order_by('-created_at', '-pk').values_list('pk', flat=True)[:settings.REQUEST_PROFILE_MAX_STORED]
+    )
+    expired = RequestProfile.objects.exclude(pk__in=list(keep))
+    purged = 0
+    for profile in expired.only('pk', 'profile_file').iterator():
+        profile.profile_file.delete(save=False)
+        profile.delete()
+        purged += 1
+    return purged
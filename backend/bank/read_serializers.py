@@ -0,0 +1,134 @@
+"""
+Read Serializers
+Fast paths for the high-volume list endpoints. Rows come from .values() with
+nested postings fetched in one query and the admin amount computed by
+annotation, and the response dicts are built directly instead of going
+through a model instance and a DRF field per attribute. The output renders to
+the same JSON as the ModelSerializer each function stands in for, which is
+still used for single objects and writes.
+"""
+from typing import Any, Dict, List
+
+from django.db.models import Q, Sum
+from rest_framework import serializers
+
+from .models import KYCDocument, LedgerPosting
+
+# Formatting is delegated to the same DRF fields the ModelSerializers use
+DATETIME = serializers.DateTimeField()
+AMOUNT = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+KYC_DOCUMENT_TYPES = dict(KYCDocument.DOCUMENT_TYPE_CHOICES)
+KYC_STATUSES = dict(KYCDocument.STATUS_CHOICES)
+
+
+def _datetime(value):
+    return None if value is None else DATETIME.to_representation(value)
+
+
+def _postings_by_entry(entry_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """LedgerPostingSerializer output for every posting of the entries, in one query."""
+    postings = {entry_id: [] for entry_id in entry_ids}
+    rows = (
+        LedgerPosting.objects.filter(entry_id__in=entry_ids)
+        .order_by('id')
+        .values_list('entry_id', 'id', 'account__account_number', 'direction', 'amount', 'description')
+    )
+    for entry_id, posting_id, account_number, direction, amount, description in rows:
+        postings[entry_id].append({
+            'id': posting_id,
+            'account_number': account_number,
+            'direction': direction,
+            'amount': AMOUNT.to_representation(amount),
+            'description': description,
+        })
+    return postings
+
+
+def ledger_entry_rows(entries) -> List[Dict[str, Any]]:
+    """LedgerEntrySerializer(entries, many=True).data in two queries."""
+    rows = list(entries.values('id', 'reference', 'entry_type', 'created_at', 'status', 'memo'))
+    postings = _postings_by_entry([row['id'] for row in rows])
+    for row in rows:
+        row['created_at'] = _datetime(row['created_at'])
+        row['postings'] = postings[row['id']]
+    return rows
+
+
+def admin_ledger_entry_rows(entries) -> List[Dict[str, Any]]:
+    """AdminLedgerEntrySerializer(entries, many=True).data in two queries instead of one per entry."""
+    rows = list(
+        entries.annotate(debit_total=Sum('postings__amount', filter=Q(postings__direction='DEBIT')))
+        .values('id', 'reference', 'entry_type', 'created_at', 'status', 'memo',
+                'created_by_id', 'created_by__email', 'debit_total')
+    )
+    postings = _postings_by_entry([row['id'] for row in rows])
+    output = []
+    for row in rows:
+        entry = {
+            'id': row['id'],
+            'reference': row['reference'],
+            'entry_type': row['entry_type'],
+            'created_at': _datetime(row['created_at']),
+            'status': row['status'],
+            'memo': row['memo'],
+        }
+        # The serializer skips created_by_email when there is no creator
+        if row['created_by_id'] is not None:
+            entry['created_by_email'] = row['created_by__email']
+        entry['amount'] = row['debit_total'] or 0
+        entry['postings'] = postings[row['id']]
+        output.append(entry)
+    return output
+
+
+def notification_rows(notifications) -> List[Dict[str, Any]]:
+    """NotificationSerializer(notifications, many=True).data in one query."""
+    rows = list(notifications.values(
+        'id', 'notification_type', 'priority', 'title', 'message',
+        'action_url', 'metadata', 'is_read', 'read_at', 'created_at',
+    ))
+    for row in rows:
+        row['read_at'] = _datetime(row['read_at'])
+        row['created_at'] = _datetime(row['created_at'])
+    return rows
+
+
+def kyc_document_rows(documents, request=None) -> List[Dict[str, Any]]:
+    """KYCDocumentSerializer(documents, many=True, context={'request': request}).data in one query."""
+    storage = KYCDocument._meta.get_field('document_file').storage
+    rows = documents.values(
+        'id', 'document_type', 'document_file', 'document_number', 'status', 'rejection_reason',
+        'verified_by_id', 'verified_at', 'admin_notes', 'uploaded_at', 'updated_at', 'expires_at',
+    )
+    output = []
+    for row in rows:
+        name = row['document_file']
+        document_file = document_url = file_size = None
+        if name:
+            document_file = storage.url(name)
+            if request is not None:
+                document_file = document_url = request.build_absolute_uri(document_file)
+            try:
+                file_size = storage.size(name)
+            except Exception:
+                file_size = None
+        output.append({
+            'id': row['id'],
+            'document_type': row['document_type'],
+            'document_type_display': KYC_DOCUMENT_TYPES.get(row['document_type'], row['document_type']),
+            'document_file': document_file,
+            'document_url': document_url,
+            'document_number': row['document_number'],
+            'status': row['status'],
+            'status_display': KYC_STATUSES.get(row['status'], row['status']),
+            'rejection_reason': row['rejection_reason'],
+            'verified_by': row['verified_by_id'],
+            'verified_at': _datetime(row['verified_at']),
+            'admin_notes': row['admin_notes'],
+            'uploaded_at': _datetime(row['uploaded_at']),
+            'updated_at': _datetime(row['updated_at']),
+            'expires_at': _datetime(row['expires_at']),
+            'file_size': file_size,
+        })
+    return output
@@ -0,0 +1,219 @@
+"""
+Retention Utility
+Applies the configured retention policies to the Notification table and clears
+the bodies of old OutgoingEmail audit rows.
+
+Rows are deleted or moved to NotificationArchive in bounded primary-key-range
+batches, each in its own short transaction, so the job never holds long locks
+or produces one huge write.
+"""
+import gzip
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive, OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ACTIONS = ('DELETE', 'ARCHIVE')
+
+ARCHIVED_NOTIFICATION_FIELDS = [
+    'id', 'customer_id', 'notification_type', 'priority', 'title', 'message',
+    'action_url', 'metadata', 'is_read', 'read_at', 'created_at',
+]
+
+
+def get_retention_policies() -> List[Dict[str, Any]]:
+    """Return the configured notification retention policies, validated."""
+    policies = getattr(settings, 'NOTIFICATION_RETENTION_POLICIES', [])
+    for policy in policies:
+        if policy.get('action') not in RETENTION_ACTIONS:
+            raise ValueError(f"Invalid retention action: {policy.get('action')}")
+        if int(policy.get('older_than_days', 0)) <= 0:
+            raise ValueError('Retention policies need a positive older_than_days')
+    return policies
+
+
+def _policy_queryset(policy: Dict[str, Any], cutoff: datetime):
+    notifications = Notification.objects.filter(created_at__lt=cutoff)
+    if policy.get('notification_type'):
+        notifications = notifications.filter(notification_type__in=policy['notification_type'])
+    if policy.get('priority'):
+        notifications = notifications.filter(priority__in=policy['priority'])
+    if policy.get('is_read') is not None:
+        notifications = notifications.filter(is_read=policy['is_read'])
+    return notifications
+
+
+def _apply_batch(batch, action: str) -> int:
+    """Delete or archive one primary-key window. Returns rows removed."""
+    from .services import adjust_unread_count
+
+    with transaction.atomic():
+        rows = list(batch.values(*ARCHIVED_NOTIFICATION_FIELDS))
+        if not rows:
+            return 0
+
+        ids = [row['id'] for row in rows]
+        if action == 'ARCHIVE':
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(original_id=row['id'], **{
+                    field: row[field] for field in ARCHIVED_NOTIFICATION_FIELDS if field != 'id'
+                })
+                for row in rows
+            ], ignore_conflicts=True)
+
+        Notification.objects.filter(pk__in=ids).delete()
+
+        unread = Counter(row['customer_id'] for row in rows if not row['is_read'])
+        for customer_id, count in unread.items():
+            adjust_unread_count(customer_id, -count)
+
+    return len(ids)
+
+
+def apply_policy(
+    policy: Dict[str, Any],
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Apply one retention policy.
+
+    Args:
+        policy: Policy dictionary, see NOTIFICATION_RETENTION_POLICIES in settings
+        now: Reference time for the age cutoff (defaults to now)
+        batch_size: Width of each primary-key window
+
+    Returns:
+        Number of notifications deleted or archived
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_RETENTION_BATCH_SIZE', 5000)
+    cutoff = now - timedelta(days=int(policy['older_than_days']))
+    candidates = _policy_queryset(policy, cutoff)
+
+    bounds = Notification.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    start, high = bounds['low'], bounds['high']
+    if start is None:
+        return 0
+
+    removed = 0
+    while start <= high:
+        end = start + batch_size
+        removed += _apply_batch(candidates.filter(pk__gte=start, pk__lt=end), policy['action'])
+
+        # Primary keys follow created_at, so stop at the first row newer than the
+        # cutoff and skip over empty key ranges.
+        following = (
+            Notification.objects.filter(pk__gte=end)
+            .order_by('pk')
+            .values_list('pk', 'created_at')
+            .first()
+        )
+        if following is None or following[1] >= cutoff:
+            break
+        start = following[0]
+
+    return removed
+
+
+def apply_notification_retention(
+    policies: Optional[List[Dict[str, Any]]] = None,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Apply every retention policy in order.
+
+    Args:
+        policies: Policies to apply (defaults to NOTIFICATION_RETENTION_POLICIES)
+        now: Reference time for the age cutoffs (defaults to now)
+        batch_size: Width of each primary-key window
+
+    Returns:
+        Rows removed keyed by policy name
+    """
+    if policies is None:
+        policies = get_retention_policies()
+
+    results = {}
+    for index, policy in enumerate(policies):
+        name = policy.get('name') or f'policy_{index}'
+        results[name] = apply_policy(policy, now=now, batch_size=batch_size)
+        logger.info(f"Notification retention {name}: {policy['action'].lower()}d {results[name]} notifications")
+    return results
+
+
+# ============ Outgoing email bodies ============
+
+def _write_body_archive(rows: List[Dict[str, Any]], now: datetime) -> str:
+    lines = ''.join(json.dumps(row) + '\n' for row in rows)
+    name = f"outgoing_email_bodies/{now:%Y/%m/%d}/{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+    return default_storage.save(name, ContentFile(gzip.compress(lines.encode('utf-8'))))
+
+
+def archive_email_bodies(
+    older_than_days: Optional[int] = None,
+    action: Optional[str] = None,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Clear text and HTML bodies of old emails, keeping only the headers.
+
+    With the ARCHIVE action each batch of bodies is first written to storage as
+    gzipped JSON lines and the file name is recorded on the rows. DELETE drops
+    the bodies without a copy.
+
+    Args:
+        older_than_days: Age cutoff (defaults to OUTGOING_EMAIL_BODY_RETENTION_DAYS, 0 disables)
+        action: 'ARCHIVE' or 'DELETE' (defaults to OUTGOING_EMAIL_BODY_RETENTION_ACTION)
+        now: Reference time for the age cutoff (defaults to now)
+        batch_size: Rows handled per transaction
+
+    Returns:
+        Number of emails whose bodies were cleared
+    """
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'OUTGOING_EMAIL_BODY_RETENTION_DAYS', 180)
+    action = action or getattr(settings, 'OUTGOING_EMAIL_BODY_RETENTION_ACTION', 'ARCHIVE')
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Invalid retention action: {action}")
+    if older_than_days <= 0:
+        return 0
+
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'OUTGOING_EMAIL_BODY_RETENTION_BATCH_SIZE', 1000)
+    cutoff = now - timedelta(days=older_than_days)
+    candidates = (
+        OutgoingEmail.objects.filter(created_at__lt=cutoff, body_archived_at__isnull=True)
+        .order_by('pk')
+        .values('id', 'text_body', 'html_body')
+    )
+
+    cleared = 0
+    while True:
+        rows = list(candidates[:batch_size])
+        if not rows:
+            break
+
+        archive_name = _write_body_archive(rows, now) if action == 'ARCHIVE' else ''
+        with transaction.atomic():
+            cleared += OutgoingEmail.objects.filter(pk__in=[row['id'] for row in rows]).update(
+                text_body='', html_body='', body_archived_at=now, body_archive_name=archive_name,
+            )
+
+    if cleared:
+        logger.info(f"Email body retention: {action.lower()}d bodies of {cleared} emails")
+    return cleared
@@ -4,4 +4,6 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/support/chat/(?P<conversation_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
     re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
+    re_path(r'ws/admin/presence/$', consumers.SupportPresenceConsumer.as_asgi()),
+    re_path(r'ws/admin/ops/$', consumers.AdminOpsConsumer.as_asgi()),
 ]
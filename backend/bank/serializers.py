@@ -4,8 +4,8 @@ from django.contrib.auth import authenticate, get_user_model
 from django.db.models import Q, Sum
 from rest_framework import serializers
 
-from .models import Account, Beneficiary, CustomerProfile, LedgerEntry, LedgerPosting, Statement, CryptoWallet, CryptoDeposit, SupportConversation, SupportMessage, VirtualCard, KYCDocument, Notification, Loan, LoanPayment, TaxRefundApplication, TaxRefundDocument, Grant, GrantApplication, VerificationCode, TelegramConfig, OutgoingEmail, OutgoingEmailAttachment
-from .services import create_customer_account
+from .models import Account, Beneficiary, CustomerProfile, LedgerEntry, LedgerPosting, Statement, CryptoWallet, CryptoDeposit, SupportConversation, SupportMessage, VirtualCard, KYCDocument, Notification, Loan, LoanPayment, TaxRefundApplication, TaxRefundDocument, Grant, GrantApplication, VerificationCode, TelegramConfig, OutgoingEmail, OutgoingEmailAttachment, RequestProfile
+from .services import create_customer_account, get_support_message_page
 
 User = get_user_model()
 
@@ -123,7 +123,8 @@ class AdminUserCreateSerializer(serializers.Serializer):
         
         # Notify user of their credentials
         from .emails import send_welcome_email
-        send_welcome_email.delay(user.id, password)
+        from .outbox import enqueue_task
+        enqueue_task(send_welcome_email, user.id, password)
         
         return user
 
@@ -642,8 +643,14 @@ class SupportMessageSerializer(serializers.ModelSerializer):
 
 
 class SupportConversationSerializer(serializers.ModelSerializer):
-    """Serializer for support conversations"""
-    messages = SupportMessageSerializer(many=True, read_only=True)
+    """
+    Serializer for support conversations.
+
+    Only one page of messages is embedded: the page passed in the
+    'message_page' context as (messages, has_more), or else the latest page.
+    """
+    messages = serializers.SerializerMethodField()
+    has_more_messages = serializers.SerializerMethodField()
     customer_name = serializers.CharField(source='customer.full_name', read_only=True)
     customer_email = serializers.CharField(source='customer.user.email', read_only=True)
     unread_count = serializers.SerializerMethodField()
@@ -651,20 +658,30 @@ class SupportConversationSerializer(serializers.ModelSerializer):
     class Meta:
         model = SupportConversation
         fields = ['id', 'customer_name', 'customer_email', 'status', 'subject', 'created_at', 
-                  'updated_at', 'last_message_at', 'messages', 'unread_count']
+                  'updated_at', 'last_message_at', 'messages', 'has_more_messages', 'unread_count']
         read_only_fields = ['id', 'customer_name', 'customer_email', 'created_at', 'updated_at', 'last_message_at']
     
+    def get_message_page(self, obj):
+        if 'message_page' not in self.context:
+            self.context['message_page'] = get_support_message_page(obj)
+        return self.context['message_page']
+    
+    def get_messages(self, obj):
+        messages, _ = self.get_message_page(obj)
+        return SupportMessageSerializer(messages, many=True).data
+    
+    def get_has_more_messages(self, obj):
+        _, has_more = self.get_message_page(obj)
+        return has_more
+    
     def get_unread_count(self, obj):
         user = self.context.get('request').user
-        if user.is_staff:
-            # Admin sees unread messages from customers
-            return obj.messages.filter(sender_type='CUSTOMER', is_read=False).count()
-        # Customer sees unread messages from admin
-        return obj.messages.filter(sender_type='ADMIN', is_read=False).count()
+        # Admin sees unread messages from customers, customer sees unread messages from admin
+        return obj.unread_by_admin if user.is_staff else obj.unread_by_customer
 
 
 class SupportConversationListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for conversation lists"""
+    """Lightweight serializer for conversation lists, reads only the denormalized inbox columns"""
     customer_name = serializers.CharField(source='customer.full_name', read_only=True)
     customer_email = serializers.CharField(source='customer.user.email', read_only=True)
     unread_count = serializers.SerializerMethodField()
@@ -678,17 +695,14 @@ class SupportConversationListSerializer(serializers.ModelSerializer):
     
     def get_unread_count(self, obj):
         user = self.context.get('request').user
-        if user.is_staff:
-            return obj.messages.filter(sender_type='CUSTOMER', is_read=False).count()
-        return obj.messages.filter(sender_type='ADMIN', is_read=False).count()
+        return obj.unread_by_admin if user.is_staff else obj.unread_by_customer
     
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
-        if last_msg:
+        if obj.last_message_at and obj.last_message_sender_type:
             return {
-                'message': last_msg.message[:100],  # Truncate for preview
-                'sender_type': last_msg.sender_type,
-                'created_at': last_msg.created_at
+                'message': obj.last_message_preview,
+                'sender_type': obj.last_message_sender_type,
+                'created_at': obj.last_message_at
             }
         return None
 
@@ -938,6 +952,34 @@ class NotificationUpdateSerializer(serializers.ModelSerializer):
         fields = ['is_read']
 
 
+class NotificationBroadcastSerializer(serializers.Serializer):
+    """Serializer for admin notification broadcasts to a customer segment"""
+    segment = serializers.ChoiceField(choices=['ALL', 'TIER', 'KYC_STATUS'])
+    tier = serializers.ChoiceField(choices=CustomerProfile.TIER_CHOICES, required=False)
+    kyc_status = serializers.ChoiceField(choices=CustomerProfile.KYC_CHOICES, required=False)
+    notification_type = serializers.ChoiceField(choices=Notification.TYPE_CHOICES, default='SYSTEM')
+    priority = serializers.ChoiceField(choices=Notification.PRIORITY_CHOICES, default='MEDIUM')
+    title = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+    action_url = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        if data['segment'] == 'TIER' and not data.get('tier'):
+            raise serializers.ValidationError({'tier': 'This field is required for the TIER segment.'})
+        if data['segment'] == 'KYC_STATUS' and not data.get('kyc_status'):
+            raise serializers.ValidationError({'kyc_status': 'This field is required for the KYC_STATUS segment.'})
+        return data
+
+    @property
+    def segment_value(self):
+        segment = self.validated_data['segment']
+        if segment == 'TIER':
+            return self.validated_data['tier']
+        if segment == 'KYC_STATUS':
+            return self.validated_data['kyc_status']
+        return None
+
+
 # ============ Tax Refund Serializers ============
 
 class TaxRefundDocumentSerializer(serializers.ModelSerializer):
@@ -1278,7 +1320,8 @@ class OutgoingEmailListSerializer(serializers.ModelSerializer):
         ]
 
     def get_attachment_count(self, obj):
-        return getattr(obj, 'attachments__count', None) or obj.attachments.count()
+        count = getattr(obj, 'attachments__count', None)
+        return count if count is not None else obj.attachments.count()
 
 
 class OutgoingEmailDetailSerializer(serializers.ModelSerializer):
@@ -1289,5 +1332,23 @@ class OutgoingEmailDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'created_at', 'updated_at', 'sent_at', 'status', 'error_message',
             'backend', 'from_email', 'to_emails', 'cc_emails', 'bcc_emails',
-            'reply_to', 'subject', 'text_body', 'html_body', 'attachments',
+            'reply_to', 'subject', 'text_body', 'html_body', 'body_archived_at',
+            'attachments',
+        ]
+
+
+class RequestProfileListSerializer(serializers.ModelSerializer):
+    requested_by_email = serializers.EmailField(source='requested_by.email', read_only=True, default=None)
+    user_email = serializers.EmailField(source='user.email', read_only=True, default=None)
+
+    class Meta:
+        model = RequestProfile
+        fields = [
+            'id', 'created_at', 'method', 'path', 'route', 'status_code', 'duration_ms',
+            'sql_count', 'sql_time_ms', 'profiler', 'requested_by_email', 'user_email',
         ]
+
+
+class RequestProfileDetailSerializer(RequestProfileListSerializer):
+    class Meta(RequestProfileListSerializer.Meta):
+        fields = RequestProfileListSerializer.Meta.fields + ['summary', 'sql_trace']
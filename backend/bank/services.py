@@ -1,3 +1,4 @@
+import logging
 import uuid
 from decimal import Decimal
 
@@ -7,8 +8,10 @@ from django.db import transaction
 from django.utils import timezone
 
 from .models import Account, CustomerProfile, LedgerEntry, LedgerPosting
+from .ops_feed import emit_ops_event, entry_event_data, loan_event_data
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 def generate_reference():
@@ -79,6 +82,7 @@ def approve_entry(entry, approver):
         entry.approved_by = approver
         entry.approved_at = timezone.now()
         entry.save(update_fields=['status', 'approved_by', 'approved_at'])
+        emit_ops_event('transaction.resolved', entry_event_data(entry), counts=['transactions'])
 
 
 def decline_entry(entry, approver):
@@ -86,6 +90,12 @@ def decline_entry(entry, approver):
     entry.approved_by = approver
     entry.approved_at = timezone.now()
     entry.save(update_fields=['status', 'approved_by', 'approved_at'])
+    emit_ops_event('transaction.resolved', entry_event_data(entry), counts=['transactions'])
+
+
+def announce_pending_entry(entry):
+    """Tell connected admins about a customer entry waiting for approval"""
+    emit_ops_event('transaction.pending', entry_event_data(entry), counts=['transactions'])
 
 
 def create_external_transfer(user, amount, memo, recipient_details, fee):
@@ -130,6 +140,7 @@ def create_external_transfer(user, amount, memo, recipient_details, fee):
         'source_account': source_account.account_number
     }
     entry.save()
+    announce_pending_entry(entry)
     
     return entry
 
@@ -154,26 +165,467 @@ def create_notification(customer, notification_type, title, message, priority='M
     
     # Send real-time notification via WebSocket
     send_realtime_notification(customer.user.id, notification)
+    adjust_unread_count(customer.id, 1)
     
     return notification
 
 
 def send_realtime_notification(user_id, notification):
-    """Send real-time notification via WebSocket"""
+    """Queue a real-time notification for WebSocket delivery after commit"""
+    from .outbox import enqueue_group_send
+    from .serializers import NotificationSerializer
+    
+    # Send to user's notification channel
+    enqueue_group_send(
+        f'notifications_{user_id}',
+        {
+            'type': 'notification_message',
+            'notification': NotificationSerializer(notification).data
+        }
+    )
+
+
+def send_realtime_notifications(notifications, batch_size=500):
+    """Push many notifications over WebSocket, pipelining group_send calls in batches"""
+    import asyncio
     from channels.layers import get_channel_layer
     from asgiref.sync import async_to_sync
     from .serializers import NotificationSerializer
+    from .ws_protocol import with_frames
     
     channel_layer = get_channel_layer()
-    if channel_layer:
-        # Send to user's notification channel
-        async_to_sync(channel_layer.group_send)(
-            f'notifications_{user_id}',
-            {
+    if not channel_layer:
+        return 0
+    
+    async def send_batch(batch):
+        await asyncio.gather(*(
+            channel_layer.group_send(group, message) for group, message in batch
+        ))
+    
+    sent = 0
+    batch = []
+    for notification in notifications:
+        batch.append((
+            f'notifications_{notification.customer.user_id}',
+            with_frames({
                 'type': 'notification_message',
                 'notification': NotificationSerializer(notification).data
-            }
+            })
+        ))
+        if len(batch) >= batch_size:
+            async_to_sync(send_batch)(batch)
+            sent += len(batch)
+            batch = []
+    if batch:
+        async_to_sync(send_batch)(batch)
+        sent += len(batch)
+    return sent
+
+
+def get_notifications_after(customer_id, after_id, limit=None):
+    """
+    Notifications newer than after_id, oldest first, for replay on reconnect.
+    
+    Returns:
+        (notifications, has_more), has_more means the client is further
+        behind than limit and should reload its list instead
+    """
+    from .models import Notification
+    
+    limit = limit or settings.NOTIFICATION_RESUME_LIMIT
+    notifications = list(
+        Notification.objects.filter(customer_id=customer_id, id__gt=after_id).order_by('id')[:limit + 1]
+    )
+    return notifications[:limit], len(notifications) > limit
+
+
+NOTIFICATION_ACK_KEY = 'notifications:ack:{}'
+
+
+def get_notification_ack(user_id):
+    """Highest notification id the user's clients acknowledged, or None"""
+    from django.core.cache import cache
+    
+    return cache.get(NOTIFICATION_ACK_KEY.format(user_id))
+
+
+def record_notification_ack(user_id, notification_id):
+    """Remember a delivery ack, the cursor only moves forward"""
+    from django.core.cache import cache
+    
+    key = NOTIFICATION_ACK_KEY.format(user_id)
+    current = cache.get(key)
+    if current is None or notification_id > current:
+        cache.set(key, notification_id, settings.NOTIFICATION_ACK_TTL_SECONDS)
+        return notification_id
+    return current
+
+
+# ============ Unread Counter Services ============
+
+def get_unread_count(customer_id):
+    """Return the customer's unread notification count, seeding the counter row if missing"""
+    from .models import Notification, NotificationCounter
+    
+    count = NotificationCounter.objects.filter(customer_id=customer_id).values_list('unread_count', flat=True).first()
+    if count is None:
+        counter, _ = NotificationCounter.objects.get_or_create(
+            customer_id=customer_id,
+            defaults={'unread_count': Notification.objects.filter(customer_id=customer_id, is_read=False).count()}
         )
+        count = counter.unread_count
+    return count
+
+
+def adjust_unread_count(customer_id, delta):
+    """
+    Atomically apply delta to a customer's unread counter and push the new value.
+
+    Call this after the Notification rows have been changed: a missing counter
+    row is seeded from the table, which already reflects the change.
+    """
+    from django.db.models import F
+    from django.db.models.functions import Greatest
+    from .models import NotificationCounter
+    
+    counter = NotificationCounter.objects.filter(customer_id=customer_id)
+    counter.update(
+        unread_count=Greatest(F('unread_count') + delta, 0),
+        updated_at=timezone.now()
+    )
+    row = counter.values_list('customer__user_id', 'unread_count').first()
+    if row is None:
+        count = get_unread_count(customer_id)
+        row = (CustomerProfile.objects.filter(pk=customer_id).values_list('user_id', flat=True).first(), count)
+    
+    from .outbox import enqueue_group_send
+    
+    user_id, count = row
+    if user_id:
+        enqueue_group_send(f'notifications_{user_id}', {'type': 'unread_count', 'unread_count': count})
+    return count
+
+
+def push_unread_counts(counts, batch_size=500):
+    """Send (user_id, unread_count) pairs to each user's notification group"""
+    import asyncio
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+    from .ws_protocol import with_frames
+    
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+    
+    async def send_batch(batch):
+        await asyncio.gather(*(
+            channel_layer.group_send(f'notifications_{user_id}', with_frames({
+                'type': 'unread_count',
+                'unread_count': count,
+            }))
+            for user_id, count in batch
+        ))
+    
+    counts = list(counts)
+    try:
+        for start in range(0, len(counts), batch_size):
+            async_to_sync(send_batch)(counts[start:start + batch_size])
+    except Exception as e:
+        # Counters are advisory for clients, they resync on the next connect
+        logger.warning(f"Failed to push unread counts: {e}")
+
+
+def rebuild_unread_counters(customer_ids=None, chunk_size=1000):
+    """Recompute unread counters from the Notification table. Returns customers processed."""
+    from django.db.models import Count
+    from .models import Notification, NotificationCounter
+    
+    customers = CustomerProfile.objects.order_by('pk').values_list('pk', flat=True)
+    if customer_ids is not None:
+        customers = customers.filter(pk__in=customer_ids)
+    
+    def rebuild_chunk(chunk):
+        with transaction.atomic():
+            # Hold the chunk's counters while counting, adjust_unread_count waits and applies
+            # its delta on top of the rebuilt value instead of being overwritten by it
+            list(
+                NotificationCounter.objects.select_for_update()
+                .filter(customer_id__in=chunk).order_by('customer_id').values_list('pk', flat=True)
+            )
+            unread = dict(
+                Notification.objects.filter(customer_id__in=chunk, is_read=False)
+                .values('customer_id').annotate(total=Count('id')).values_list('customer_id', 'total')
+            )
+            now = timezone.now()
+            NotificationCounter.objects.bulk_create(
+                [NotificationCounter(customer_id=cid, unread_count=unread.get(cid, 0), updated_at=now) for cid in chunk],
+                update_conflicts=True,
+                unique_fields=['customer'],
+                update_fields=['unread_count', 'updated_at'],
+            )
+        return len(chunk)
+    
+    processed = 0
+    chunk = []
+    for customer_id in customers.iterator(chunk_size=chunk_size):
+        chunk.append(customer_id)
+        if len(chunk) >= chunk_size:
+            processed += rebuild_chunk(chunk)
+            chunk = []
+    if chunk:
+        processed += rebuild_chunk(chunk)
+    return processed
+
+
+# ============ Broadcast Services ============
+
+BROADCAST_SEGMENTS = [
+    ('ALL', 'All Customers'),
+    ('TIER', 'Customer Tier'),
+    ('KYC_STATUS', 'KYC Status'),
+]
+
+
+def get_broadcast_recipients(segment, segment_value=None):
+    """Return the customer profiles targeted by a broadcast segment"""
+    recipients = CustomerProfile.objects.filter(user__is_active=True, user__is_staff=False)
+    if segment == 'TIER':
+        recipients = recipients.filter(tier=segment_value)
+    elif segment == 'KYC_STATUS':
+        recipients = recipients.filter(kyc_status=segment_value)
+    elif segment != 'ALL':
+        raise ValueError(f'Unknown broadcast segment: {segment}')
+    return recipients
+
+
+def broadcast_notification(segment, title, message, segment_value=None, notification_type='SYSTEM',
+                           priority='MEDIUM', action_url='', metadata=None, chunk_size=1000):
+    """
+    Create the same notification for every customer in a segment.
+
+    Rows are written with one bulk_create per chunk and the WebSocket pushes are
+    handed to a background task per chunk once the chunk is committed.
+    Returns the number of notifications created.
+    """
+    from django.db.models import F
+    from .models import Notification, NotificationCounter
+    from .outbox import enqueue_task
+    from .tasks import push_realtime_notifications
+    
+    metadata = dict(metadata or {})
+    metadata.setdefault('broadcast_id', uuid.uuid4().hex)
+    
+    recipient_ids = get_broadcast_recipients(segment, segment_value).order_by('pk').values_list('pk', flat=True)
+    
+    def write_chunk(customer_ids):
+        with transaction.atomic():
+            created = Notification.objects.bulk_create([
+                Notification(
+                    customer_id=customer_id,
+                    notification_type=notification_type,
+                    priority=priority,
+                    title=title,
+                    message=message,
+                    action_url=action_url,
+                    metadata=metadata,
+                )
+                for customer_id in customer_ids
+            ])
+            NotificationCounter.objects.filter(customer_id__in=customer_ids).update(
+                unread_count=F('unread_count') + 1,
+                updated_at=timezone.now()
+            )
+            enqueue_task(push_realtime_notifications, [notification.pk for notification in created])
+        return len(created)
+    
+    total = 0
+    chunk = []
+    for customer_id in recipient_ids.iterator(chunk_size=chunk_size):
+        chunk.append(customer_id)
+        if len(chunk) >= chunk_size:
+            total += write_chunk(chunk)
+            chunk = []
+    if chunk:
+        total += write_chunk(chunk)
+    
+    logger.info(f"Broadcast {metadata['broadcast_id']} to segment {segment}={segment_value}: {total} notifications")
+    return total
+
+
+# ============ Support Message Services ============
+
+def get_support_message_page(conversation, before=None, after=None, limit=None):
+    """
+    Return one page of a conversation's messages in chronological order.
+
+    Args:
+        conversation: SupportConversation (or its id)
+        before: Only messages with a smaller id, i.e. older history
+        after: Only messages with a larger id, i.e. what a client has not seen yet
+        limit: Page size, capped at SUPPORT_MESSAGE_PAGE_MAX
+
+    Returns:
+        (messages, has_more) where has_more tells whether further messages exist
+        beyond the page in the direction being read. Without before/after the
+        latest page is returned.
+    """
+    from .models import SupportMessage
+
+    default_size = getattr(settings, 'SUPPORT_MESSAGE_PAGE_SIZE', 50)
+    limit = min(max(int(limit or default_size), 1), getattr(settings, 'SUPPORT_MESSAGE_PAGE_MAX', 200))
+    messages = SupportMessage.objects.filter(conversation=conversation).select_related('sender_user__profile')
+
+    if after is not None:
+        page = list(messages.filter(id__gt=after).order_by('id')[:limit + 1])
+        return page[:limit], len(page) > limit
+
+    if before is not None:
+        messages = messages.filter(id__lt=before)
+    page = list(messages.order_by('-id')[:limit + 1])
+    has_more = len(page) > limit
+    return list(reversed(page[:limit])), has_more
+
+
+def get_admin_support_unread_count():
+    """Unread customer messages across all conversations, seeding the counter row if missing"""
+    from django.db.models import Sum
+    from .models import SupportConversation, SupportInboxCounter
+    
+    count = SupportInboxCounter.objects.filter(key='admin').values_list('unread_count', flat=True).first()
+    if count is None:
+        total = SupportConversation.objects.aggregate(total=Sum('unread_by_admin'))['total'] or 0
+        counter, _ = SupportInboxCounter.objects.get_or_create(key='admin', defaults={'unread_count': total})
+        count = counter.unread_count
+    return count
+
+
+def _adjust_admin_support_unread(delta):
+    from django.db.models import F
+    from django.db.models.functions import Greatest
+    from .models import SupportInboxCounter
+    
+    if not SupportInboxCounter.objects.filter(key='admin').update(
+        unread_count=Greatest(F('unread_count') + delta, 0),
+        updated_at=timezone.now()
+    ):
+        # Seeded from the conversations, which already include this change
+        get_admin_support_unread_count()
+
+
+def record_support_message(conversation, sender_user, message_text):
+    """
+    Store a support message and update the conversation's inbox columns.
+
+    The conversation row is changed with a single UPDATE using F() expressions,
+    so concurrent senders never lose an unread increment.
+    """
+    from django.db.models import Case, F, Value, When
+    from .models import SupportConversation, SupportMessage
+    
+    sender_type = 'ADMIN' if sender_user.is_staff else 'CUSTOMER'
+    with transaction.atomic():
+        message = SupportMessage.objects.create(
+            conversation=conversation,
+            sender_type=sender_type,
+            sender_user=sender_user,
+            message=message_text
+        )
+        
+        updates = {
+            'last_message_at': message.created_at,
+            'last_message_preview': message_text[:100],
+            'last_message_sender_type': sender_type,
+            'updated_at': message.created_at,
+        }
+        if sender_type == 'ADMIN':
+            updates['unread_by_customer'] = F('unread_by_customer') + 1
+            updates['status'] = Case(When(status='OPEN', then=Value('IN_PROGRESS')), default=F('status'))
+        else:
+            updates['unread_by_admin'] = F('unread_by_admin') + 1
+        SupportConversation.objects.filter(pk=conversation.pk).update(**updates)
+        
+        if sender_type == 'CUSTOMER':
+            _adjust_admin_support_unread(1)
+            emit_ops_event('support.message', {
+                'conversation_id': conversation.pk,
+                'message_id': message.id,
+                'preview': updates['last_message_preview'],
+                'customer_email': sender_user.email,
+            }, counts=['support_unread'])
+    
+    return message
+
+
+def mark_support_conversation_read(conversation, reader):
+    """
+    Mark the other side's messages read and take them off the reader's unread column.
+
+    The column drops by the number of messages marked instead of being reset,
+    so a message recorded while this runs stays counted as unread.
+    """
+    from django.db.models import F
+    from django.db.models.functions import Greatest
+    from .models import SupportConversation
+    
+    with transaction.atomic():
+        if reader.is_staff:
+            marked = conversation.messages.filter(sender_type='CUSTOMER', is_read=False).update(is_read=True)
+            if marked:
+                SupportConversation.objects.filter(pk=conversation.pk).update(
+                    unread_by_admin=Greatest(F('unread_by_admin') - marked, 0)
+                )
+                conversation.unread_by_admin = max(conversation.unread_by_admin - marked, 0)
+                _adjust_admin_support_unread(-marked)
+                emit_ops_event('support.read', {'conversation_id': conversation.pk}, counts=['support_unread'])
+        else:
+            marked = conversation.messages.filter(sender_type='ADMIN', is_read=False).update(is_read=True)
+            if marked:
+                SupportConversation.objects.filter(pk=conversation.pk).update(
+                    unread_by_customer=Greatest(F('unread_by_customer') - marked, 0)
+                )
+                conversation.unread_by_customer = max(conversation.unread_by_customer - marked, 0)
+
+
+def rebuild_support_inbox(chunk_size=500):
+    """Recompute the inbox columns and the admin unread total from the messages. Returns conversations processed."""
+    from django.db.models import Count, OuterRef, Q, Subquery
+    from .models import SupportConversation, SupportInboxCounter, SupportMessage
+    
+    latest = SupportMessage.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+    conversations = SupportConversation.objects.annotate(
+        admin_unread=Count('messages', filter=Q(messages__sender_type='CUSTOMER', messages__is_read=False)),
+        customer_unread=Count('messages', filter=Q(messages__sender_type='ADMIN', messages__is_read=False)),
+        latest_text=Subquery(latest.values('message')[:1]),
+        latest_sender=Subquery(latest.values('sender_type')[:1]),
+    ).order_by('pk')
+    
+    processed = 0
+    admin_total = 0
+    batch = []
+    for conversation in conversations.iterator(chunk_size=chunk_size):
+        conversation.unread_by_admin = conversation.admin_unread
+        conversation.unread_by_customer = conversation.customer_unread
+        conversation.last_message_preview = (conversation.latest_text or '')[:100]
+        conversation.last_message_sender_type = conversation.latest_sender or ''
+        admin_total += conversation.admin_unread
+        batch.append(conversation)
+        if len(batch) >= chunk_size:
+            processed += _save_inbox_batch(batch)
+            batch = []
+    if batch:
+        processed += _save_inbox_batch(batch)
+    
+    SupportInboxCounter.objects.update_or_create(key='admin', defaults={'unread_count': admin_total})
+    return processed
+
+
+def _save_inbox_batch(batch):
+    from .models import SupportConversation
+    
+    SupportConversation.objects.bulk_update(batch, [
+        'unread_by_admin', 'unread_by_customer', 'last_message_preview', 'last_message_sender_type',
+    ])
+    return len(batch)
 
 
 # ============ Loan Services ============
@@ -205,6 +657,7 @@ def create_loan_application(customer, loan_data):
         action_url=f'/app/loans/{loan.id}',
         metadata={'loan_id': loan.id, 'loan_type': loan.loan_type}
     )
+    emit_ops_event('loan.applied', loan_event_data(loan), counts=['loans'])
     
     return loan
 
@@ -246,6 +699,7 @@ def approve_loan(loan, approver, approved_amount, interest_rate, approval_notes=
             action_url=f'/app/loans/{loan.id}',
             metadata={'loan_id': loan.id, 'approved_amount': float(loan.approved_amount)}
         )
+        emit_ops_event('loan.reviewed', loan_event_data(loan), counts=['loans'])
     
     return loan
 
@@ -268,6 +722,7 @@ def reject_loan(loan, approver, rejection_reason):
         action_url=f'/app/loans/{loan.id}',
         metadata={'loan_id': loan.id, 'status': 'rejected'}
     )
+    emit_ops_event('loan.reviewed', loan_event_data(loan), counts=['loans'])
     
     return loan
 
@@ -351,6 +806,7 @@ def generate_loan_payment_schedule(loan):
     current_date = loan.first_payment_date
     remaining_principal = loan.approved_amount
     monthly_rate = (loan.interest_rate / 100) / 12
+    payments = []
     
     for payment_num in range(1, loan.term_months + 1):
         # Calculate interest and principal for this payment
@@ -364,17 +820,20 @@ def generate_loan_payment_schedule(loan):
         else:
             scheduled_amount = loan.monthly_payment
         
-        LoanPayment.objects.create(
+        payments.append(LoanPayment(
             loan=loan,
             payment_number=payment_num,
             due_date=current_date,
             scheduled_amount=scheduled_amount,
             principal_amount=principal_amount,
             interest_amount=interest_amount
-        )
+        ))
         
         remaining_principal -= principal_amount
         current_date += timedelta(days=30)  # Approximate monthly
+    
+    # One INSERT for the whole schedule instead of one per month
+    LoanPayment.objects.bulk_create(payments)
 
 
 def process_loan_payment(loan, payment_amount, payment_method='MANUAL'):
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CustomerProfile, OutgoingEmailAttachment
+
+
+@receiver(post_delete, sender=OutgoingEmailAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        from .blob_store import release_blob
+
+        release_blob(instance.blob_id)
+
+
+def _invalidate_cached_user(user_id):
+    from .authentication import invalidate_user
+
+    invalidate_user(user_id)
+    # Again after commit, a concurrent request may have cached the old row meanwhile
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_cache(sender, instance, **kwargs):
+    _invalidate_cached_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CustomerProfile)
+def invalidate_profile_user_cache(sender, instance, **kwargs):
+    _invalidate_cached_user(instance.user_id)
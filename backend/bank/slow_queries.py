@@ -0,0 +1,279 @@
+"""
+Slow Query Capture
+An execute wrapper installed on every database connection records statements
+slower than SLOW_QUERY_THRESHOLD_MS with their parameter shape, the view or
+Celery task that ran them and the innermost bank/ frames of the Python stack.
+Statements that fail, such as those cancelled by statement_timeout, are
+recorded with their exception type.
+Captures go to the SlowQuery table, a ring buffer of SLOW_QUERY_BUFFER_SIZE
+slots, so it never grows. Statements are grouped by a fingerprint of the SQL
+with literals and IN lists collapsed.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import time
+import traceback
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BANK_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+STACK_DEPTH = 8
+SQL_MAX_CHARS = 10000
+SLOT_CURSOR_KEY = 'slow_queries:cursor'
+
+# ('VIEW' | 'TASK', name) of the work currently running in this thread or task
+current_source = contextvars.ContextVar('slow_query_source', default=('OTHER', ''))
+_recording = contextvars.ContextVar('slow_query_recording', default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL with literals and placeholders replaced by ? and IN lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?+)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:16]
+
+
+def _type_name(value) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+
+def param_shape(params, many: bool) -> Any:
+    """Types of the parameters, never their values, which may be personal data."""
+    if params is None:
+        return []
+    if many:
+        rows = list(params) if not isinstance(params, (list, tuple)) else params
+        return {'rows': len(rows), 'row': param_shape(rows[0], False) if rows else []}
+    if isinstance(params, dict):
+        return {key: _type_name(value) for key, value in params.items()}
+    return [_type_name(value) for value in params]
+
+
+def bank_stack() -> List[str]:
+    """The innermost frames inside bank/, excluding this module."""
+    frames = [
+        f'{os.path.relpath(frame.filename, os.path.dirname(BANK_DIR.rstrip(os.sep)))}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(BANK_DIR) and not frame.filename.endswith('slow_queries.py')
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+def next_slot() -> int:
+    cache.add(SLOT_CURSOR_KEY, 0, timeout=None)
+    try:
+        cursor = cache.incr(SLOT_CURSOR_KEY)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(SLOT_CURSOR_KEY, 1, timeout=None)
+        cursor = 1
+    return cursor % settings.SLOW_QUERY_BUFFER_SIZE
+
+
+def record(capture: Dict[str, Any]) -> None:
+    from .models import SlowQuery
+
+    token = _recording.set(True)
+    try:
+        SlowQuery.objects.update_or_create(slot=next_slot(), defaults=capture)
+    except Exception as e:
+        logger.warning(f"Could not record slow query: {e}")
+    finally:
+        _recording.reset(token)
+
+
+def _write_pending(connection) -> None:
+    pending = getattr(connection, 'slow_query_pending', None)
+    if not pending:
+        return
+    connection.slow_query_pending = []
+    for capture in pending:
+        record(capture)
+
+
+def flush(connection) -> None:
+    """Write the captures held for the connection once it is outside any transaction."""
+    if not connection.in_atomic_block:
+        _write_pending(connection)
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    """Execute wrapper, only statements over the threshold pay for more than two clock reads."""
+    started = time.perf_counter()
+    error = ''
+    try:
+        return execute(sql, params, many, context)
+    except Exception as e:
+        # Timed out and lock-waiting statements are the slowest of all
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS and not _recording.get():
+            _capture(context['connection'], sql, params, many, elapsed_ms, error)
+
+
+def _capture(connection, sql, params, many, elapsed_ms, error) -> None:
+    """
+    Hold the capture until the connection leaves its transaction, so it is never
+    written in (or rolled back with) the caller's transaction. Pending captures
+    are flushed on commit, at the end of the request or task, and by the next
+    capture made outside a transaction.
+    """
+    try:
+        source_type, source = current_source.get()
+        capture = {
+            'fingerprint': fingerprint(sql),
+            'sql': sql[:SQL_MAX_CHARS],
+            'param_shape': param_shape(params, many),
+            'duration_ms': round(elapsed_ms, 3),
+            'error': error,
+            'source_type': source_type,
+            'source': source[:255],
+            'stack': bank_stack(),
+            'captured_at': timezone.now(),
+        }
+        pending = getattr(connection, 'slow_query_pending', None)
+        if pending is None:
+            pending = connection.slow_query_pending = []
+        pending.append(capture)
+        # The ring buffer would overwrite anything older anyway
+        del pending[:-settings.SLOW_QUERY_BUFFER_SIZE]
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: _write_pending(connection), using=connection.alias, robust=True)
+        elif not sql.lstrip().upper().startswith('BEGIN'):
+            # SQLite opens a transaction by running BEGIN before the atomic block is marked
+            flush(connection)
+    except Exception as e:
+        logger.warning(f"Could not capture slow query: {e}")
+
+
+def flush_all() -> None:
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        flush(connection)
+
+
+def install(sender=None, connection=None, **kwargs):
+    """connection_created: put the capture innermost, so other wrappers can still push and pop."""
+    if capture_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, capture_slow_queries)
+
+
+class SlowQueryContextMiddleware:
+    """Tag queries run by a view with the view's dotted path (the routes carry no URL names)."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_CAPTURE_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_source.set(('VIEW', request.path))
+        try:
+            return self.get_response(request)
+        finally:
+            # Captures from rolled back transactions are written here
+            flush_all()
+            current_source.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        current_source.set(('VIEW', match.view_name if match else request.path))
+
+
+def task_started(task=None, **kwargs):
+    task.request.slow_query_token = current_source.set(('TASK', task.name))
+
+
+def task_finished(task=None, **kwargs):
+    flush_all()
+    token = getattr(task.request, 'slow_query_token', None)
+    if token is not None:
+        current_source.reset(token)
+
+
+def connect():
+    """Install the wrapper on new connections and tag queries run by Celery tasks."""
+    if not getattr(settings, 'SLOW_QUERY_CAPTURE_ENABLED', True):
+        return
+    from celery import signals
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(install, dispatch_uid='bank.slow_queries.install')
+    signals.task_prerun.connect(task_started, weak=False)
+    signals.task_postrun.connect(task_finished, weak=False)
+
+
+def top_offenders(limit: int = 20, source: str = None) -> List[Dict[str, Any]]:
+    """
+    Captured statements grouped by fingerprint, worst total time first.
+
+    Each group carries the most recent capture as its example, with the SQL,
+    parameter shape, source and stack.
+    """
+    from django.db.models import Avg, Count, Max, Sum
+    from .models import SlowQuery
+
+    captures = SlowQuery.objects.all()
+    if source:
+        captures = captures.filter(source=source)
+    groups = list(
+        captures.values('fingerprint')
+        .annotate(count=Count('id'), total_ms=Sum('duration_ms'), avg_ms=Avg('duration_ms'),
+                  max_ms=Max('duration_ms'), last_seen=Max('captured_at'))
+        .order_by('-total_ms')[:limit]
+    )
+    # The buffer is bounded, so one pass over the groups' captures is cheap
+    latest, sources = {}, {}
+    for capture in captures.filter(fingerprint__in=[g['fingerprint'] for g in groups]).order_by('-captured_at'):
+        latest.setdefault(capture.fingerprint, capture)
+        sources.setdefault(capture.fingerprint, set()).add(capture.source)
+
+    offenders = []
+    for group in groups:
+        example = latest[group['fingerprint']]
+        offenders.append({
+            **group,
+            'total_ms': round(group['total_ms'], 3),
+            'avg_ms': round(group['avg_ms'], 3),
+            'normalized_sql': normalize_sql(example.sql),
+            'sources': sorted(sources.get(group['fingerprint'], [])),
+            'example': {
+                'sql': example.sql,
+                'param_shape': example.param_shape,
+                'duration_ms': example.duration_ms,
+                'error': example.error,
+                'source_type': example.source_type,
+                'source': example.source,
+                'stack': example.stack,
+                'captured_at': example.captured_at,
+            },
+        })
+    return offenders
@@ -40,3 +40,93 @@ def generate_statement(statement_id):
     statement.status = 'READY'
     statement.generated_at = timezone.now()
     statement.save(update_fields=['content', 'status', 'generated_at'])
+
+
+@shared_task
+def push_realtime_notifications(notification_ids):
+    from .models import Notification, NotificationCounter
+    from .services import push_unread_counts, send_realtime_notifications
+
+    notifications = Notification.objects.filter(id__in=notification_ids).select_related('customer').order_by('id')
+    sent = send_realtime_notifications(notifications.iterator(chunk_size=500))
+
+    customer_ids = Notification.objects.filter(id__in=notification_ids).values('customer_id')
+    counts = NotificationCounter.objects.filter(customer_id__in=customer_ids).values_list('customer__user_id', 'unread_count')
+    push_unread_counts(counts.iterator(chunk_size=500))
+    return sent
+
+
+@shared_task
+def broadcast_notification_task(segment, title, message, segment_value=None, notification_type='SYSTEM',
+                                priority='MEDIUM', action_url='', metadata=None):
+    from .services import broadcast_notification
+
+    return broadcast_notification(
+        segment=segment,
+        title=title,
+        message=message,
+        segment_value=segment_value,
+        notification_type=notification_type,
+        priority=priority,
+        action_url=action_url,
+        metadata=metadata,
+    )
+
+
+@shared_task
+def rebuild_notification_counters():
+    from .services import rebuild_unread_counters
+
+    return rebuild_unread_counters()
+
+
+@shared_task
+def apply_notification_retention():
+    from .retention import apply_notification_retention as apply_retention
+
+    return apply_retention()
+
+
+@shared_task
+def archive_email_bodies():
+    from .retention import archive_email_bodies as archive_bodies
+
+    return archive_bodies()
+
+
+@shared_task
+def sweep_support_presence():
+    from .presence import sweep
+
+    return len(sweep())
+
+
+@shared_task
+def dispatch_outbox():
+    from .outbox import dispatch
+
+    return dispatch()
+
+
+@shared_task
+def purge_outbox():
+    from .outbox import purge_sent
+
+    return purge_sent()
+
+
+@shared_task
+def purge_request_profiles():
+    from .profiling import purge_profiles
+
+    return purge_profiles()
+
+
+@shared_task
+def collect_email_blobs():
+    from datetime import timedelta
+    from django.conf import settings
+    from .blob_store import collect_garbage, repair_ref_counts
+
+    repair_ref_counts()
+    return collect_garbage(timedelta(seconds=getattr(settings, 'EMAIL_BLOB_GC_GRACE_SECONDS', 3600)))
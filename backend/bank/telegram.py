@@ -1,14 +1,185 @@
 import requests
 import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 from .models import TelegramConfig
 
 logger = logging.getLogger(__name__)
 
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n— — —\n\n"
+
+# Bumped in the shared cache on every config change, so workers drop their copy too
+CONFIG_VERSION_KEY = 'telegram:config_version'
+
+_config_lock = threading.Lock()
+_config_cache = {'expires': 0.0, 'version': None, 'config': None}
+
+_session_lock = threading.Lock()
+_session = None
+
+_rate_lock = threading.Lock()
+_chat_send_times = {}
+
+
+class TelegramRateLimited(Exception):
+    """Telegram answered 429, retry_after is in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Telegram rate limit, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TelegramDeliveryError(Exception):
+    """A digest failed, unsent holds the indexes of the messages that were not delivered"""
+
+    def __init__(self, error, unsent):
+        super().__init__(str(error))
+        self.unsent = unsent
+
+
 def send_telegram_notification(message):
     """
-    Sends a notification message to the configured Telegram chat.
+    Queues a notification message for the configured Telegram chat.
+
+    The message is written to the outbox in the caller's transaction and sent
+    by the outbox dispatcher after commit, never from the request thread.
+    Messages are held for TELEGRAM_COALESCE_SECONDS so bursts go out as one digest.
+    """
+    from .outbox import enqueue_telegram
+
+    enqueue_telegram(message, delay_seconds=getattr(settings, 'TELEGRAM_COALESCE_SECONDS', 5))
+    return True
+
+
+def get_telegram_config():
     """
+    Return the enabled TelegramConfig, cached in-process for TELEGRAM_CONFIG_CACHE_SECONDS.
+
+    The copy is also dropped as soon as the shared config version changes, so
+    a change saved by the web process reaches the Celery workers at once.
+    """
+    now = time.monotonic()
+    version = cache.get(CONFIG_VERSION_KEY, 0)
+    with _config_lock:
+        if _config_cache['expires'] > now and _config_cache['version'] == version:
+            return _config_cache['config']
     config = TelegramConfig.objects.filter(is_enabled=True).first()
+    with _config_lock:
+        _config_cache['config'] = config
+        _config_cache['version'] = version
+        _config_cache['expires'] = now + getattr(settings, 'TELEGRAM_CONFIG_CACHE_SECONDS', 60)
+    return config
+
+
+def invalidate_telegram_config():
+    """Make every process reload the config on its next delivery."""
+    cache.add(CONFIG_VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(CONFIG_VERSION_KEY)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(CONFIG_VERSION_KEY, 1, timeout=None)
+    with _config_lock:
+        _config_cache['expires'] = 0.0
+        _config_cache['config'] = None
+
+
+def get_session():
+    """Pooled HTTP session shared by every delivery in this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def _wait_for_slot(chat_id):
+    """
+    Block until sending to chat_id respects Telegram's limits: about one
+    message per second per chat and 20 per minute in groups (negative ids).
+    """
+    per_minute = 20 if str(chat_id).startswith('-') else 60
+    while True:
+        with _rate_lock:
+            now = time.monotonic()
+            sent = [t for t in _chat_send_times.get(chat_id, []) if now - t < 60]
+            wait = 0.0
+            if sent and now - sent[-1] < 1.0:
+                wait = 1.0 - (now - sent[-1])
+            elif len(sent) >= per_minute:
+                wait = 60 - (now - sent[0])
+            if wait <= 0:
+                sent.append(now)
+                _chat_send_times[chat_id] = sent
+                return
+        time.sleep(wait)
+
+
+def digest_groups(messages):
+    """Indexes of the alert texts going into each digest, as few digests as the length limit allows."""
+    groups = []
+    current = []
+    length = 0
+    for index, text in enumerate(messages):
+        size = min(len(text), MAX_MESSAGE_LENGTH - 64)
+        added = size + (len(DIGEST_SEPARATOR) if current else 0)
+        if current and length + added > MAX_MESSAGE_LENGTH - 64:
+            groups.append(current)
+            current, length = [], 0
+            added = size
+        current.append(index)
+        length += added
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_digests(messages):
+    """Coalesce alert texts into as few messages as Telegram's length limit allows."""
+    if len(messages) == 1:
+        return [messages[0][:MAX_MESSAGE_LENGTH]]
+
+    digests = []
+    for group in digest_groups(messages):
+        texts = [messages[index][:MAX_MESSAGE_LENGTH - 64] for index in group]
+        digests.append(f"{len(texts)} alerts\n\n" + DIGEST_SEPARATOR.join(texts) if len(texts) > 1 else texts[0])
+    return digests
+
+
+def _post_message(config, text):
+    base_url = getattr(settings, 'TELEGRAM_API_BASE', 'https://api.telegram.org')
+    url = f"{base_url}/bot{config.bot_token}/sendMessage"
+    _wait_for_slot(config.chat_id)
+    response = get_session().post(
+        url,
+        json={"chat_id": config.chat_id, "text": text},
+        timeout=getattr(settings, 'TELEGRAM_TIMEOUT_SECONDS', 5),
+    )
+    if response.status_code == 429:
+        retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+        raise TelegramRateLimited(retry_after)
+    response.raise_for_status()
+
+
+def deliver_telegram_messages(messages):
+    """
+    Sends queued alerts to the configured Telegram chat, coalesced into digests.
+
+    Returns False when Telegram is not configured. When a digest fails,
+    TelegramDeliveryError is raised with the indexes of the messages in it and
+    in the digests after it, so the outbox retries only those.
+    """
+    config = get_telegram_config()
     if not config:
         logger.warning("Telegram notification skipped: No enabled TelegramConfig found.")
         return False
@@ -17,16 +188,22 @@ def send_telegram_notification(message):
         logger.warning("Telegram notification skipped: bot_token or chat_id is missing.")
         return False
 
-    url = f"https://api.telegram.org/bot{config.bot_token}/sendMessage"
-    payload = {
-        "chat_id": config.chat_id,
-        "text": message
-    }
+    groups = digest_groups(messages)
+    for position, digest in enumerate(build_digests(messages)):
+        try:
+            try:
+                _post_message(config, digest)
+            except TelegramRateLimited as e:
+                # Short waits are cheaper than a full outbox retry cycle
+                if e.retry_after > getattr(settings, 'TELEGRAM_MAX_INLINE_WAIT_SECONDS', 10):
+                    raise
+                time.sleep(e.retry_after)
+                _post_message(config, digest)
+        except Exception as e:
+            raise TelegramDeliveryError(e, [index for group in groups[position:] for index in group]) from e
+    return True
 
-    try:
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send Telegram notification: {e}")
-        return False
+
+def deliver_telegram_message(message):
+    """Sends a single message to the configured Telegram chat."""
+    return deliver_telegram_messages([message])
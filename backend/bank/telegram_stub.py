@@ -0,0 +1,86 @@
+"""
+Telegram Stub Server
+A local stand-in for the Telegram Bot API sendMessage endpoint, used by the
+tests and for running the alert pipeline without a real bot:
+
+    python -m bank.telegram_stub 8081
+    TELEGRAM_API_BASE=http://127.0.0.1:8081
+"""
+import json
+import sys
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class TelegramStubServer:
+    """
+    Records every sendMessage call. Queue failures with fail_next(), e.g.
+    fail_next(429, retry_after=1) to exercise rate limiting.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.messages: List[Dict[str, Any]] = []
+        self._failures = deque()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if stub._failures:
+                    status, retry_after = stub._failures.popleft()
+                    payload = {'ok': False, 'error_code': status, 'description': 'stub failure'}
+                    if retry_after is not None:
+                        payload['parameters'] = {'retry_after': retry_after}
+                else:
+                    status = 200
+                    token = self.path.split('/')[1][len('bot'):]
+                    stub.messages.append({'token': token, **body})
+                    payload = {'ok': True, 'result': {'message_id': len(stub.messages), **body}}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def fail_next(self, status: int = 500, retry_after: Optional[int] = None):
+        self._failures.append((status, retry_after))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    stub = TelegramStubServer(port=port)
+    print(f'Telegram stub listening on {stub.url}')
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
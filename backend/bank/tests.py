@@ -1,10 +1,11 @@
 from decimal import Decimal
+from unittest import skipUnless
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APIClient
 
-from .models import Account, LedgerEntry
+from .models import Account, CustomerProfile, LedgerEntry, Notification
 from .services import create_customer_account, get_system_accounts
 
 
@@ -193,4 +194,1547 @@ class VirtualCardTests(TestCase):
             'monthly_limit': '10000.00'
         }, format='json')
         self.assertEqual(response.status_code, 400)
-        self.assertIn('Maximum of 3 virtual cards', response.data['detail'])
\ No newline at end of file
+        self.assertIn('Maximum of 3 virtual cards', response.data['detail'])
+
+class ActivityExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='user@example.com', email='user@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+        self.admin = get_user_model().objects.create_user(username='admin@example.com', email='admin@example.com', password='pass1234', is_staff=True, is_active=True)
+        account = self.user.profile.accounts.first()
+        funding, _ = get_system_accounts()
+        for i in range(3):
+            entry = LedgerEntry.objects.create(reference=f'EXP{i}', entry_type='DEPOSIT', created_by=self.user, status='POSTED')
+            account.postings.create(entry=entry, direction='CREDIT', amount=Decimal('10.00'))
+            funding.postings.create(entry=entry, direction='DEBIT', amount=Decimal('10.00'))
+        response = self.client.post('/api/auth/login/', {'email': 'admin@example.com', 'password': 'pass1234'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def read_stream(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_activity_export_ndjson(self):
+        import json
+
+        response = self.client.get('/api/admin/activity-log/export/', {'user_id': self.user.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read_stream(response).splitlines()]
+        self.assertEqual([row['reference'] for row in rows], ['EXP2', 'EXP1', 'EXP0'])
+        self.assertTrue(all(row['user_id'] == self.user.id for row in rows))
+
+    def test_ledger_export_csv(self):
+        # The creator is SET_NULL, an entry whose user was deleted must not end the stream
+        funding, _ = get_system_accounts()
+        orphan = LedgerEntry.objects.create(reference='EXP-ORPHAN', entry_type='DEPOSIT', status='POSTED')
+        funding.postings.create(entry=orphan, direction='DEBIT', amount=Decimal('5.00'))
+
+        response = self.client.get('/api/admin/activity-log/export/', {'dataset': 'ledger', 'export_format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        lines = self.read_stream(response).splitlines()
+        self.assertTrue(lines[0].startswith('entry_id,reference,entry_type'))
+        self.assertEqual(len(lines), 1 + 7)
+        self.assertIn('EXP-ORPHAN', lines[-1])
+
+    def test_export_rejects_unknown_format(self):
+        response = self.client.get('/api/admin/activity-log/export/', {'export_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class NotificationBroadcastTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(username='admin@example.com', email='admin@example.com', password='pass1234', is_staff=True, is_active=True)
+        for i, tier in enumerate(['STANDARD', 'STANDARD', 'VIP']):
+            user = get_user_model().objects.create_user(username=f'user{i}@example.com', email=f'user{i}@example.com', password='pass1234', is_active=True)
+            create_customer_account(user)
+            user.profile.tier = tier
+            user.profile.save(update_fields=['tier'])
+        response = self.client.post('/api/auth/login/', {'email': 'admin@example.com', 'password': 'pass1234'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_broadcast_to_tier(self):
+        from unittest import mock
+        from .models import Notification, OutboxMessage
+        from .tasks import broadcast_notification_task
+
+        with mock.patch('bank.outbox.wake_dispatcher'):
+            response = self.client.post('/api/admin/notifications/broadcast/', {
+                'segment': 'TIER',
+                'tier': 'STANDARD',
+                'title': 'Maintenance',
+                'message': 'Scheduled maintenance on Sunday.',
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['recipients'], 2)
+
+        # The request only records the task, a worker runs it from the outbox
+        message = OutboxMessage.objects.get(kind='TASK')
+        self.assertEqual(message.payload['task'], broadcast_notification_task.name)
+        with mock.patch('bank.outbox.wake_dispatcher'):
+            broadcast_notification_task.apply(kwargs=message.payload['kwargs'])
+        notifications = Notification.objects.filter(title='Maintenance')
+        self.assertEqual(notifications.count(), 2)
+        self.assertEqual(len({n.metadata['broadcast_id'] for n in notifications}), 1)
+
+    def test_broadcast_requires_segment_value(self):
+        response = self.client.post('/api/admin/notifications/broadcast/', {
+            'segment': 'KYC_STATUS',
+            'title': 'Reminder',
+            'message': 'Please complete your KYC.',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_broadcast_service_chunks_and_pushes(self):
+        from unittest import mock
+        from .models import OutboxMessage
+        from .services import broadcast_notification
+        from .tasks import push_realtime_notifications
+
+        with mock.patch('bank.outbox.wake_dispatcher'):
+            with self.captureOnCommitCallbacks(execute=True):
+                total = broadcast_notification('ALL', 'Hello', 'Welcome aboard', chunk_size=2)
+        self.assertEqual(total, 3)
+        pushes = OutboxMessage.objects.filter(kind='TASK').order_by('id')
+        self.assertEqual({m.payload['task'] for m in pushes}, {push_realtime_notifications.name})
+        self.assertEqual([len(m.payload['args'][0]) for m in pushes], [2, 1])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='user@example.com', email='user@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+        self.customer = self.user.profile
+        response = self.client.post('/api/auth/login/', {'email': 'user@example.com', 'password': 'pass1234'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread-count/').data['unread_count']
+
+    def test_counter_follows_notification_changes(self):
+        from .services import create_system_notification
+
+        first = create_system_notification(self.customer, 'One', 'First')
+        second = create_system_notification(self.customer, 'Two', 'Second')
+        create_system_notification(self.customer, 'Three', 'Third')
+        self.assertEqual(self.unread_count(), 3)
+
+        first.mark_as_read()
+        first.mark_as_read()
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.patch(f'/api/notifications/{first.id}/', {'is_read': False}, format='json')
+        self.assertEqual(self.unread_count(), 3)
+
+        self.client.delete(f'/api/notifications/{second.id}/delete/')
+        self.assertEqual(self.unread_count(), 2)
+
+        response = self.client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.unread_count(), 0)
+
+        # A notification already read leaves the counter alone when deleted
+        self.assertEqual(self.client.delete(f'/api/notifications/{first.id}/delete/').status_code, 204)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertEqual(self.client.delete(f'/api/notifications/{first.id}/delete/').status_code, 404)
+
+    def test_rebuild_repairs_drift(self):
+        from .models import NotificationCounter
+        from .services import create_system_notification, rebuild_unread_counters
+
+        create_system_notification(self.customer, 'One', 'First')
+        NotificationCounter.objects.filter(customer=self.customer).update(unread_count=42)
+        self.assertEqual(rebuild_unread_counters(), CustomerProfile.objects.count())
+        self.assertEqual(self.unread_count(), 1)
+        Notification.objects.filter(customer=self.customer).delete()
+        NotificationCounter.objects.all().delete()
+        self.assertEqual(self.unread_count(), 0)
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user@example.com', email='user@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+        self.customer = self.user.profile
+
+    def make_notification(self, days_old, priority='MEDIUM', is_read=False):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        notification = Notification.objects.create(
+            customer=self.customer, notification_type='SYSTEM', priority=priority,
+            title=f'{priority} {days_old}', message='Body', is_read=is_read,
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notification
+
+    def test_policies_delete_and_archive_in_batches(self):
+        from .models import NotificationArchive
+        from .retention import apply_notification_retention
+        from .services import get_unread_count
+
+        read_low = [self.make_notification(40, priority='LOW', is_read=True) for _ in range(3)]
+        unread_low = self.make_notification(40, priority='LOW')
+        ancient = [self.make_notification(400), self.make_notification(400, is_read=True)]
+        recent = self.make_notification(1, priority='LOW', is_read=True)
+        self.assertEqual(get_unread_count(self.customer.id), 2)
+
+        results = apply_notification_retention(policies=[
+            {'name': 'delete', 'priority': ['LOW'], 'is_read': True, 'older_than_days': 30, 'action': 'DELETE'},
+            {'name': 'archive', 'older_than_days': 365, 'action': 'ARCHIVE'},
+        ], batch_size=2)
+
+        self.assertEqual(results, {'delete': 3, 'archive': 2})
+        remaining = set(Notification.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {unread_low.pk, recent.pk})
+        self.assertEqual(
+            set(NotificationArchive.objects.values_list('original_id', flat=True)),
+            {n.pk for n in ancient},
+        )
+        self.assertFalse(Notification.objects.filter(pk__in=[n.pk for n in read_low]).exists())
+        self.assertEqual(get_unread_count(self.customer.id), 1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user@example.com', email='user@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+
+    def test_side_effects_are_queued_not_sent(self):
+        from .models import OutboxMessage
+        from .services import create_system_notification
+
+        create_system_notification(self.user.profile, 'Hello', 'World')
+        messages = OutboxMessage.objects.filter(kind='WEBSOCKET', status='PENDING')
+        self.assertEqual(
+            sorted(m.payload['message']['type'] for m in messages),
+            ['notification_message', 'unread_count'],
+        )
+
+    def test_dispatch_delivers_and_dedupes(self):
+        from unittest import mock
+        from .emails import send_transaction_status_email
+        from .models import OutboxMessage
+        from .outbox import dispatch, enqueue_task
+
+        enqueue_task(send_transaction_status_email, 1, 'APPROVED', dedupe_key='transaction-status:1:APPROVED')
+        enqueue_task(send_transaction_status_email, 1, 'APPROVED', dedupe_key='transaction-status:1:APPROVED')
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+        with mock.patch.object(send_transaction_status_email, 'apply_async') as apply_async:
+            self.assertEqual(dispatch(), 1)
+        apply_async.assert_called_once_with(args=[1, 'APPROVED'], kwargs={}, countdown=None)
+        self.assertEqual(OutboxMessage.objects.get().status, 'SENT')
+
+    def test_failed_delivery_backs_off_then_fails(self):
+        from unittest import mock
+        from .models import OutboxMessage
+        from .outbox import dispatch, enqueue_telegram
+
+        enqueue_telegram('Alert')
+        with override_settings(OUTBOX_MAX_ATTEMPTS=2), \
+                mock.patch('bank.telegram.deliver_telegram_messages', side_effect=RuntimeError('timeout')):
+            dispatch()
+            message = OutboxMessage.objects.get()
+            self.assertEqual((message.status, message.attempts), ('PENDING', 1))
+            self.assertGreater(message.available_at, message.created_at)
+            self.assertEqual(dispatch(), 0)
+
+            OutboxMessage.objects.update(available_at=message.created_at)
+            dispatch()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.last_error), ('FAILED', 2, 'timeout'))
+
+    def test_one_wake_per_transaction_and_delivery_outside_it(self):
+        from unittest import mock
+        from django.db import connection, transaction
+        from django.utils import timezone
+        from .models import OutboxMessage
+        from .outbox import dispatch, enqueue, enqueue_telegram
+
+        with mock.patch('bank.outbox.wake_dispatcher') as wake:
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(5):
+                    enqueue('WEBSOCKET', {'group': 'ops', 'message': {'type': 'ping', 'n': i}})
+                enqueue_telegram('Alert', delay_seconds=5)
+            self.assertEqual(sorted(call.kwargs['countdown'] or 0 for call in wake.call_args_list), [0, 5])
+
+            # A rolled back savepoint drops its own callback, the one registered after it still wakes
+            wake.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        enqueue('WEBSOCKET', {'group': 'ops', 'message': {'type': 'ping'}})
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                enqueue('WEBSOCKET', {'group': 'ops', 'message': {'type': 'pong'}})
+            wake.assert_called_once_with(countdown=None)
+
+        depth = []
+
+        def deliver(messages):
+            # The claim's transaction is closed and the rows leased before delivery starts
+            depth.append(len(connection.savepoint_ids))
+            leased = OutboxMessage.objects.filter(pk__in=[m.pk for m in messages], available_at__gt=timezone.now())
+            self.assertEqual(leased.count(), len(messages))
+            return {}
+
+        outer_depth = len(connection.savepoint_ids)
+        with mock.patch.dict('bank.outbox.DELIVERY_HANDLERS', {'WEBSOCKET': deliver}):
+            self.assertEqual(dispatch(), 6)
+        self.assertEqual(depth, [outer_depth])
+        self.assertEqual(OutboxMessage.objects.filter(kind='WEBSOCKET', status='SENT').count(), 6)
+
+
+class TelegramPipelineTests(TestCase):
+    def setUp(self):
+        from .models import TelegramConfig
+        from .telegram import invalidate_telegram_config
+        from .telegram_stub import TelegramStubServer
+
+        TelegramConfig.objects.create(bot_token='123:abc', chat_id='42')
+        invalidate_telegram_config()
+        self.stub = TelegramStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.addCleanup(invalidate_telegram_config)
+        self.settings_override = override_settings(TELEGRAM_API_BASE=self.stub.url)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_burst_is_coalesced_into_one_digest(self):
+        from .models import OutboxMessage
+        from .outbox import dispatch
+        from .telegram import send_telegram_notification
+
+        for i in range(5):
+            send_telegram_notification(f'Transfer attempt {i}')
+        self.assertEqual(dispatch(), 0)
+
+        OutboxMessage.objects.update(available_at=OutboxMessage.objects.first().created_at)
+        self.assertEqual(dispatch(), 5)
+        self.assertEqual(len(self.stub.messages), 1)
+        self.assertEqual(self.stub.messages[0]['chat_id'], '42')
+        self.assertTrue(self.stub.messages[0]['text'].startswith('5 alerts'))
+        self.assertEqual(OutboxMessage.objects.filter(status='SENT').count(), 5)
+
+    def test_digests_respect_length_limit_and_short_rate_limits(self):
+        from .telegram import MAX_MESSAGE_LENGTH, build_digests, deliver_telegram_messages
+
+        digests = build_digests(['x' * 1500] * 6)
+        self.assertGreater(len(digests), 1)
+        self.assertTrue(all(len(d) <= MAX_MESSAGE_LENGTH for d in digests))
+
+        self.stub.fail_next(429, retry_after=0)
+        self.assertTrue(deliver_telegram_messages(['Withdrawal attempt']))
+        self.assertEqual([m['text'] for m in self.stub.messages], ['Withdrawal attempt'])
+
+    def test_failed_digest_retries_only_its_messages(self):
+        from unittest import mock
+        from .models import OutboxMessage
+        from .outbox import dispatch, enqueue_telegram
+
+        for i in range(6):
+            enqueue_telegram(f'{i}' * 1500)
+        # Three digests of two alerts, the second one fails and the third is never tried
+        with mock.patch('bank.telegram._post_message', side_effect=[None, RuntimeError('Bad Gateway')]) as post:
+            self.assertEqual(dispatch(), 6)
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(
+            [(m.payload['text'][0], m.status) for m in OutboxMessage.objects.order_by('id')],
+            [('0', 'SENT'), ('1', 'SENT'), ('2', 'PENDING'), ('3', 'PENDING'), ('4', 'PENDING'), ('5', 'PENDING')],
+        )
+        self.assertEqual(OutboxMessage.objects.filter(last_error='Bad Gateway').count(), 4)
+
+    def test_config_change_reaches_other_processes(self):
+        from django.core.cache import cache
+        from .models import TelegramConfig
+        from .telegram import CONFIG_VERSION_KEY, get_telegram_config
+
+        self.assertEqual(get_telegram_config().chat_id, '42')
+        TelegramConfig.objects.update(chat_id='77')
+        self.assertEqual(get_telegram_config().chat_id, '42')
+
+        # What invalidate_telegram_config in the web process leaves for a worker to see
+        cache.set(CONFIG_VERSION_KEY, cache.get(CONFIG_VERSION_KEY, 0) + 1, timeout=None)
+        self.assertEqual(get_telegram_config().chat_id, '77')
+
+
+try:
+    import aiosmtpd
+except ImportError:  # pragma: no cover - optional test dependency
+    aiosmtpd = None
+
+
+@skipUnless(aiosmtpd, 'aiosmtpd is required for the SMTP sink')
+class BatchedEmailBackendTests(TestCase):
+    def setUp(self):
+        import logging
+        import socket
+        from aiosmtpd.controller import Controller
+
+        logging.getLogger('mail.log').setLevel(logging.WARNING)
+
+        class Sink:
+            def __init__(self):
+                self.messages = []
+                self.peers = set()
+
+            async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+                if address.startswith('reject'):
+                    return '550 mailbox unavailable'
+                envelope.rcpt_tos.append(address)
+                return '250 OK'
+
+            async def handle_DATA(self, server, session, envelope):
+                self.messages.append(envelope)
+                self.peers.add(session.peer)
+                return '250 Message accepted for delivery'
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.sink = Sink()
+        self.start_sink = lambda: Controller(self.sink, hostname='127.0.0.1', port=self.port)
+        self.controller = self.start_sink()
+        self.controller.start()
+        self.addCleanup(lambda: self.controller.stop())
+
+        override = override_settings(
+            EMAIL_BACKEND='bank.email_backend.AuditingEmailBackend',
+            AUDIT_EMAIL_INNER_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.port, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def tearDown(self):
+        from . import email_backend
+
+        for backend in email_backend._shared_smtp_backends.values():
+            backend.close()
+        email_backend._shared_smtp_backends.clear()
+
+    def make_messages(self, recipients):
+        from django.core.mail import EmailMessage
+
+        return [EmailMessage('Statement', 'Your statement is ready', 'bank@example.com', [to]) for to in recipients]
+
+    def test_send_mass_uses_one_connection_and_bulk_audits(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .emails import send_mass
+        from .models import OutgoingEmail
+
+        with CaptureQueriesContext(connection) as queries:
+            sent = send_mass(self.make_messages([f'user{i}@example.com' for i in range(5)]))
+        self.assertEqual(sent, 5)
+        self.assertEqual(len(self.sink.messages), 5)
+        self.assertEqual(len(self.sink.peers), 1)
+        self.assertEqual(OutgoingEmail.objects.filter(status='SENT').count(), 5)
+        self.assertLessEqual(len(queries), 3)
+
+    def test_failures_are_audited_and_connection_is_reused_with_reconnect(self):
+        from django.core.mail import get_connection
+        from . import email_backend
+        from .models import OutgoingEmail
+
+        backend = get_connection(fail_silently=True)
+        self.assertEqual(backend.send_messages(self.make_messages(['ok@example.com', 'reject@example.com'])), 1)
+        self.assertEqual(
+            dict(OutgoingEmail.objects.values_list('to_emails', 'status')),
+            {'ok@example.com': 'SENT', 'reject@example.com': 'FAILED'},
+        )
+
+        # Drop the server side of the kept-alive connection, the next send reconnects
+        self.controller.stop()
+        self.controller = self.start_sink()
+        self.controller.start()
+        self.assertEqual(get_connection(fail_silently=True).send_messages(self.make_messages(['again@example.com'])), 1)
+        self.assertEqual(OutgoingEmail.objects.get(to_emails='again@example.com').status, 'SENT')
+        self.assertEqual(len(email_backend._shared_smtp_backends), 1)
+
+    def test_unreachable_server_marks_every_message_failed(self):
+        from django.core.mail import get_connection
+        from .models import OutgoingEmail
+
+        import socket
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            closed_port = sock.getsockname()[1]
+        with override_settings(EMAIL_PORT=closed_port):
+            with self.assertRaises(OSError):
+                get_connection().send_messages(self.make_messages(['a@example.com', 'b@example.com']))
+            self.assertEqual(get_connection(fail_silently=True).send_messages(self.make_messages(['c@example.com'])), 0)
+
+        audits = list(OutgoingEmail.objects.values_list('status', 'error_message'))
+        self.assertEqual(len(audits), 3)
+        for status, error in audits:
+            self.assertEqual(status, 'FAILED')
+            self.assertIn('refused', error.lower())
+
+
+class EmailAttachmentBlobTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=media_root,
+            EMAIL_FILE_PATH=media_root,
+            EMAIL_BACKEND='bank.email_backend.AuditingEmailBackend',
+            AUDIT_EMAIL_INNER_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def send_policy(self, to):
+        from django.core.mail import EmailMessage
+
+        message = EmailMessage('Policy update', 'See attached', 'bank@example.com', [to])
+        message.attach('policy.pdf', b'%PDF-1.4 policy' * 1000, 'application/pdf')
+        message.send()
+
+    def test_identical_attachments_share_one_blob_and_are_collected(self):
+        from datetime import timedelta
+        from django.core.files.storage import default_storage
+        from .blob_store import collect_garbage
+        from .models import EmailAttachmentBlob, OutgoingEmail, OutgoingEmailAttachment
+
+        self.send_policy('a@example.com')
+        self.send_policy('b@example.com')
+
+        blob = EmailAttachmentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, len(b'%PDF-1.4 policy') * 1000)
+        self.assertEqual(set(OutgoingEmailAttachment.objects.values_list('file', flat=True)), {blob.file.name})
+        self.assertTrue(default_storage.exists(blob.file.name))
+
+        OutgoingEmail.objects.filter(to_emails='a@example.com').delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(collect_garbage(timedelta(0)), 0)
+
+        OutgoingEmail.objects.all().delete()
+        self.assertEqual(collect_garbage(timedelta(0)), 1)
+        self.assertFalse(EmailAttachmentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.file.name))
+
+    def test_reusing_an_unreferenced_blob_keeps_it_from_collection(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .blob_store import collect_garbage, store_blob
+        from .models import EmailAttachmentBlob, OutgoingEmail
+
+        self.send_policy('a@example.com')
+        OutgoingEmail.objects.all().delete()
+        EmailAttachmentBlob.objects.update(last_used_at=timezone.now() - timedelta(hours=2))
+
+        # A send reuses the blob before adding its reference, collection must leave it alone
+        blob = store_blob(b'%PDF-1.4 policy' * 1000)
+        self.assertEqual(blob.ref_count, 0)
+        self.assertEqual(collect_garbage(timedelta(hours=1)), 0)
+        self.assertTrue(EmailAttachmentBlob.objects.filter(pk=blob.pk).exists())
+
+
+class EmailRenderingTests(TestCase):
+    def test_text_body_comes_from_text_template(self):
+        from django.template.loader import render_to_string
+        from .email_rendering import render_email
+
+        user = get_user_model().objects.create_user(username='renderer', email='r@example.com', first_name='Ria')
+        context = {'user': user, 'code': '123456'}
+        rendered = render_email('emails/verification_code.html', context)
+
+        self.assertEqual(rendered.html, render_to_string('emails/verification_code.html', context))
+        self.assertTrue(rendered.text.startswith('SnelROI\n\nHello Ria,'))
+        self.assertIn('    123456\n', rendered.text)
+        self.assertNotIn('font-family', rendered.text)
+
+    def test_render_many_matches_single_renders_and_isolates_contexts(self):
+        from .email_rendering import available_templates, render_email, render_many
+
+        contexts = [
+            {'user': {'first_name': 'Ann', 'username': 'ann'}, 'amount': '10.00', 'from_desc': 'Bob', 'memo': 'Rent'},
+            {'user': {'first_name': 'Cy', 'username': 'cy'}, 'amount': '5.00', 'from_desc': 'Dee'},
+        ]
+        rendered = render_many('emails/transfer_received.html', contexts)
+
+        self.assertEqual(rendered, [render_email('emails/transfer_received.html', c) for c in contexts])
+        self.assertIn('Memo: Rent', rendered[0].text)
+        self.assertNotIn('Memo', rendered[1].text)
+        self.assertIn('emails/transfer_received.html', available_templates())
+        self.assertNotIn('emails/base.html', available_templates())
+
+
+class OutgoingEmailAuditTests(TestCase):
+    def setUp(self):
+        from .models import OutgoingEmail
+
+        self.client = APIClient()
+        get_user_model().objects.create_user(username='admin@example.com', email='admin@example.com', password='pass1234', is_staff=True, is_active=True)
+        response = self.client.post('/api/auth/login/', {'email': 'admin@example.com', 'password': 'pass1234'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.emails = [
+            OutgoingEmail.objects.create(
+                to_emails=f'user{i}@example.com', subject='Statement' if i % 2 else 'Welcome',
+                text_body=f'text {i}', html_body=f'<p>html {i}</p>', status='SENT',
+            )
+            for i in range(5)
+        ]
+
+    def test_keyset_pages_cover_every_email_once(self):
+        seen = []
+        url = '/api/admin/emails/?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(email['id'] for email in response.data['emails'])
+            cursor = response.data['next_cursor']
+            url = f'/api/admin/emails/?limit=2&cursor={cursor}' if cursor else None
+        self.assertEqual(seen, [email.id for email in reversed(self.emails)])
+
+        response = self.client.get('/api/admin/emails/?q=statement')
+        self.assertEqual({email['to_emails'] for email in response.data['emails']}, {'user1@example.com', 'user3@example.com'})
+        self.assertEqual(response.data['emails'][0]['attachment_count'], 0)
+        self.assertEqual(self.client.get('/api/admin/emails/?cursor=bogus').status_code, 400)
+
+    def test_body_retention_archives_and_keeps_headers(self):
+        import gzip
+        import json
+        import shutil
+        import tempfile
+        from datetime import timedelta
+        from django.core.files.storage import default_storage
+        from django.utils import timezone
+        from .models import OutgoingEmail
+        from .retention import archive_email_bodies
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        OutgoingEmail.objects.filter(pk__in=[e.pk for e in self.emails[:3]]).update(created_at=timezone.now() - timedelta(days=200))
+
+        with override_settings(MEDIA_ROOT=media_root):
+            self.assertEqual(archive_email_bodies(older_than_days=180, batch_size=2), 3)
+            self.assertEqual(archive_email_bodies(older_than_days=180), 0)
+
+            archived = OutgoingEmail.objects.filter(body_archived_at__isnull=False).order_by('pk')
+            self.assertEqual([e.pk for e in archived], [e.pk for e in self.emails[:3]])
+            self.assertEqual({(e.text_body, e.html_body) for e in archived}, {('', '')})
+            self.assertEqual(archived[0].to_emails, 'user0@example.com')
+
+            with default_storage.open(archived[0].body_archive_name) as f:
+                rows = [json.loads(line) for line in gzip.decompress(f.read()).splitlines()]
+        self.assertEqual(rows[0], {'id': self.emails[0].pk, 'text_body': 'text 0', 'html_body': '<p>html 0</p>'})
+        self.assertEqual(OutgoingEmail.objects.get(pk=self.emails[4].pk).text_body, 'text 4')
+
+
+    def test_search_lookup_matches_the_trigram_index_expression(self):
+        import importlib
+        from django.db import connections
+        from django.db.backends.postgresql.base import DatabaseWrapper
+        from .models import OutgoingEmail
+
+        # Compiled for PostgreSQL without connecting, the index only helps if it covers this exact expression
+        postgres = DatabaseWrapper({**connections['default'].settings_dict, 'ENGINE': 'django.db.backends.postgresql'})
+        migration = importlib.import_module('bank.migrations.0029_outgoingemail_upper_trigram_indexes')
+        for _name, column in migration.TRIGRAM_INDEXES:
+            sql, _ = OutgoingEmail.objects.filter(**{f'{column}__icontains': 'x'}).query.get_compiler(connection=postgres).as_sql()
+            self.assertIn(f'UPPER("bank_outgoingemail"."{column}"::text) LIKE UPPER(%s)', sql)
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        self.user = get_user_model().objects.create_user(username='cached@example.com', email='cached@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+        self.header = f'Bearer {AccessToken.for_user(self.user)}'
+
+    def authenticate(self):
+        from rest_framework.test import APIRequestFactory
+        from .authentication import CachedJWTAuthentication
+
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=self.header)
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_warm_cache_authenticates_without_queries_and_invalidates_on_save(self):
+        from rest_framework.exceptions import AuthenticationFailed
+        from .authentication import clear_local_cache
+
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user.profile.user_id, self.user.pk)
+
+        # Served from the shared cache when another process warmed it
+        clear_local_cache()
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+        profile = CustomerProfile.objects.get(user=self.user)
+        profile.full_name = 'Renamed Customer'
+        profile.save(update_fields=['full_name'])
+        self.assertEqual(self.authenticate().profile.full_name, 'Renamed Customer')
+
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_credentials_are_not_cached(self):
+        from django.core.cache import cache
+        from .authentication import USER_CACHE_KEY
+
+        CustomerProfile.objects.filter(user=self.user).update(clear_text_password='pass1234')
+        user = self.authenticate()
+        payload = cache.get(USER_CACHE_KEY.format(self.user.pk))
+        self.assertNotIn(self.user.password.encode(), payload)
+        self.assertNotIn(b'pass1234', payload)
+
+        # Still available on demand, and saving the cached user leaves them untouched
+        self.assertTrue(user.check_password('pass1234'))
+        user.profile.save()
+        self.assertEqual(CustomerProfile.objects.get(user=self.user).clear_text_password, 'pass1234')
+
+    def test_profile_update_does_not_write_back_a_stale_snapshot(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=self.header)
+        self.authenticate()
+        # An admin change that sends no signal, the cached snapshot still has the old tier
+        CustomerProfile.objects.filter(user=self.user).update(tier='VIP')
+        self.assertNotEqual(self.authenticate().profile.tier, 'VIP')
+
+        response = client.patch('/api/profile/', {'city': 'Accra'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        profile = CustomerProfile.objects.get(user=self.user)
+        self.assertEqual((profile.city, profile.tier), ('Accra', 'VIP'))
+
+
+@override_settings(
+    PRESENCE_BACKEND='memory',
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class SupportPresenceTests(TestCase):
+    def setUp(self):
+        from . import presence
+        from .models import SupportConversation
+
+        presence.reset_store()
+        self.addCleanup(presence.reset_store)
+        self.customer = get_user_model().objects.create_user(username='chat@example.com', email='chat@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.customer)
+        self.conversation = SupportConversation.objects.create(customer=self.customer.profile, subject='Card')
+
+    def test_heartbeats_track_sockets_and_sweep_expires_silent_users(self):
+        import time
+        from unittest import mock
+        from . import presence
+
+        self.assertTrue(presence.heartbeat(self.customer.id, 'socket-a'))
+        self.assertFalse(presence.heartbeat(self.customer.id, 'socket-b'))
+        self.assertEqual(
+            [(row['user_id'], row['conversation_ids']) for row in presence.presence_snapshot()],
+            [(self.customer.id, [self.conversation.id])],
+        )
+
+        # Closing one of two tabs keeps the customer online
+        self.assertFalse(presence.disconnect(self.customer.id, 'socket-a'))
+        self.assertEqual(presence.sweep(), [])
+
+        later = time.time() + presence.presence_ttl() + 1
+        with mock.patch('bank.presence.time.time', return_value=later):
+            self.assertEqual(presence.sweep(), [self.customer.id])
+            self.assertEqual(presence.presence_snapshot(), [])
+
+    def test_admin_endpoint_lists_online_customers_with_open_conversations(self):
+        from . import presence
+
+        get_user_model().objects.create_user(username='ops@example.com', email='ops@example.com', password='pass1234', is_staff=True, is_active=True)
+        client = APIClient()
+        response = client.post('/api/auth/login/', {'email': 'ops@example.com', 'password': 'pass1234'}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        presence.heartbeat(self.customer.id, 'socket-a')
+        self.conversation.status = 'CLOSED'
+        self.conversation.save(update_fields=['status'])
+        self.assertEqual(client.get('/api/admin/support/presence/').data, {'online': []})
+
+        self.conversation.status = 'IN_PROGRESS'
+        self.conversation.save(update_fields=['status'])
+        online = client.get('/api/admin/support/presence/').data['online']
+        self.assertEqual(online[0]['conversation_ids'], [self.conversation.id])
+
+
+class SupportMessagePagingTests(TestCase):
+    def setUp(self):
+        from .models import SupportConversation, SupportMessage
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='pager@example.com', email='pager@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+        self.conversation = SupportConversation.objects.create(customer=self.user.profile, subject='Long ticket')
+        self.messages = [
+            SupportMessage.objects.create(conversation=self.conversation, sender_type='CUSTOMER', sender_user=self.user, message=f'message {i}')
+            for i in range(7)
+        ]
+        response = self.client.post('/api/auth/login/', {'email': 'pager@example.com', 'password': 'pass1234'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.url = f'/api/support/conversations/{self.conversation.id}/messages/'
+
+    def ids(self, messages):
+        return [message['id'] for message in messages]
+
+    def test_before_and_after_cursors(self):
+        ids = [message.id for message in self.messages]
+
+        latest = self.client.get(self.url, {'limit': 3}).data
+        self.assertEqual(self.ids(latest['messages']), ids[4:])
+        self.assertTrue(latest['has_more'])
+
+        older = self.client.get(self.url, {'limit': 3, 'before': ids[4]}).data
+        self.assertEqual(self.ids(older['messages']), ids[1:4])
+        oldest = self.client.get(self.url, {'limit': 3, 'before': ids[1]}).data
+        self.assertEqual((self.ids(oldest['messages']), oldest['has_more']), ([ids[0]], False))
+
+        newer = self.client.get(self.url, {'limit': 2, 'after': ids[2]}).data
+        self.assertEqual((self.ids(newer['messages']), newer['has_more']), (ids[3:5], True))
+        self.assertEqual(self.client.get(self.url, {'before': 1, 'after': 1}).status_code, 400)
+
+    def test_detail_embeds_latest_page_only(self):
+        with self.settings(SUPPORT_MESSAGE_PAGE_SIZE=5):
+            data = self.client.get(f'/api/support/conversations/{self.conversation.id}/').data
+        self.assertEqual(self.ids(data['messages']), [message.id for message in self.messages[2:]])
+        self.assertTrue(data['has_more_messages'])
+
+
+class SupportInboxTests(TestCase):
+    def setUp(self):
+        from .models import SupportConversation
+
+        self.customer = get_user_model().objects.create_user(username='inbox@example.com', email='inbox@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.customer)
+        self.admin = get_user_model().objects.create_user(username='agent@example.com', email='agent@example.com', password='pass1234', is_staff=True, is_active=True)
+        self.conversations = [
+            SupportConversation.objects.create(customer=self.customer.profile, subject=f'Ticket {i}') for i in range(3)
+        ]
+
+    def login(self, email):
+        client = APIClient()
+        response = client.post('/api/auth/login/', {'email': email, 'password': 'pass1234'}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    def test_inbox_columns_follow_messages_and_reads(self):
+        from .services import record_support_message
+
+        admin_client = self.login('agent@example.com')
+        customer_client = self.login('inbox@example.com')
+        for conversation in self.conversations:
+            record_support_message(conversation, self.customer, 'Where is my card?')
+        record_support_message(self.conversations[0], self.admin, 'It ships today')
+
+        self.assertEqual(admin_client.get('/api/support/unread-count/').data, {'unread_count': 3})
+        self.assertEqual(customer_client.get('/api/support/unread-count/').data, {'unread_count': 1})
+
+        with self.assertNumQueries(1):
+            page = admin_client.get('/api/support/conversations/', {'page_size': 2}).data
+        self.assertTrue(page['has_next'])
+        first = page['conversations'][0]
+        self.assertEqual(first['id'], self.conversations[0].id)
+        self.assertEqual(first['status'], 'IN_PROGRESS')
+        self.assertEqual(first['last_message']['message'], 'It ships today')
+        self.assertEqual(first['last_message']['sender_type'], 'ADMIN')
+        self.assertEqual(first['unread_count'], 1)
+
+        admin_client.get(f'/api/support/conversations/{self.conversations[1].id}/')
+        self.assertEqual(admin_client.get('/api/support/unread-count/').data, {'unread_count': 2})
+        customer_client.get(f'/api/support/conversations/{self.conversations[0].id}/')
+        self.assertEqual(customer_client.get('/api/support/unread-count/').data, {'unread_count': 0})
+
+    def test_reading_only_takes_off_the_messages_it_marked(self):
+        from django.db.models import F
+        from .models import SupportConversation
+        from .services import mark_support_conversation_read, record_support_message
+
+        conversation = self.conversations[0]
+        record_support_message(conversation, self.customer, 'First')
+        # A message whose increment lands after the reader marked the rows it saw
+        SupportConversation.objects.filter(pk=conversation.pk).update(unread_by_admin=F('unread_by_admin') + 1)
+        conversation.refresh_from_db()
+
+        mark_support_conversation_read(conversation, self.admin)
+        self.assertEqual(conversation.unread_by_admin, 1)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.unread_by_admin, 1)
+
+    def test_conversation_paging_parameters_are_validated(self):
+        admin_client = self.login('agent@example.com')
+        for params in ({'page': 'x'}, {'page_size': 'ten'}):
+            self.assertEqual(admin_client.get('/api/support/conversations/', params).status_code, 400)
+
+        # Out of range sizes are clamped, never an empty page that claims more
+        for page_size in (0, -5):
+            page = admin_client.get('/api/support/conversations/', {'page_size': page_size}).data
+            self.assertEqual(page['page_size'], 1)
+            self.assertEqual(len(page['conversations']), 1)
+            self.assertTrue(page['has_next'])
+
+    def test_sent_message_is_pushed_through_the_outbox(self):
+        from unittest import mock
+        from .models import OutboxMessage
+
+        conversation = self.conversations[0]
+        client = self.login('inbox@example.com')
+        with mock.patch('bank.outbox.wake_dispatcher'):
+            response = client.post(f'/api/support/conversations/{conversation.id}/messages/', {'message': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        push = OutboxMessage.objects.get(kind='WEBSOCKET', payload__group=f'chat_{conversation.id}')
+        self.assertEqual(push.payload['message']['message']['id'], response.data['id'])
+
+    def test_rebuild_matches_incremental_columns(self):
+        from .models import SupportConversation, SupportInboxCounter
+        from .services import rebuild_support_inbox, record_support_message
+
+        record_support_message(self.conversations[0], self.customer, 'Hello')
+        record_support_message(self.conversations[0], self.customer, 'Anyone?')
+        record_support_message(self.conversations[1], self.admin, 'Welcome')
+        before = list(SupportConversation.objects.order_by('pk').values_list('unread_by_admin', 'unread_by_customer', 'last_message_preview'))
+
+        SupportConversation.objects.update(unread_by_admin=0, unread_by_customer=0, last_message_preview='')
+        SupportInboxCounter.objects.all().delete()
+        self.assertEqual(rebuild_support_inbox(), 3)
+
+        after = list(SupportConversation.objects.order_by('pk').values_list('unread_by_admin', 'unread_by_customer', 'last_message_preview'))
+        self.assertEqual(after, before)
+        self.assertEqual(SupportInboxCounter.objects.get(key='admin').unread_count, 2)
+
+
+class AdminOpsFeedTests(TestCase):
+    def setUp(self):
+        self.customer = get_user_model().objects.create_user(username='ops-feed@example.com', email='ops-feed@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.customer)
+        self.admin = get_user_model().objects.create_user(username='ops-admin@example.com', email='ops-admin@example.com', password='pass1234', is_staff=True, is_active=True)
+
+    def ops_events(self):
+        from .models import OutboxMessage
+        from .ops_feed import OPS_GROUP
+
+        return [
+            message.payload['message']
+            for message in OutboxMessage.objects.filter(kind='WEBSOCKET').order_by('id')
+            if message.payload['group'] == OPS_GROUP
+        ]
+
+    def test_new_work_and_resolution_carry_pending_counts(self):
+        from .models import SupportConversation
+        from .ops_feed import pending_counts
+        from .services import approve_entry, create_entry, announce_pending_entry, record_support_message
+
+        entry = create_entry('TRANSFER', self.customer, memo='Rent')
+        announce_pending_entry(entry)
+        conversation = SupportConversation.objects.create(customer=self.customer.profile, subject='Card')
+        record_support_message(conversation, self.customer, 'Hello')
+        approve_entry(entry, self.admin)
+
+        events = self.ops_events()
+        self.assertEqual([event['event'] for event in events], ['transaction.pending', 'support.message', 'transaction.resolved'])
+        self.assertEqual(events[0]['data']['reference'], entry.reference)
+        self.assertEqual(events[0]['counts'], {'transactions': 1})
+        self.assertEqual(events[1]['counts'], {'support_unread': 1})
+        self.assertEqual(events[2]['counts'], {'transactions': 0})
+
+        counts = pending_counts()
+        self.assertEqual(set(counts), {
+            'transactions', 'kyc_documents', 'loans', 'virtual_cards', 'tax_refunds', 'grants', 'crypto_deposits', 'support_unread',
+        })
+        self.assertEqual(counts['support_unread'], 1)
+
+    def test_consumer_requires_staff_and_sends_snapshot_then_events(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from django.test import override_settings
+        from .consumers import AdminOpsConsumer
+        from .ops_feed import OPS_GROUP
+
+        async def scenario():
+            rejected = WebsocketCommunicator(AdminOpsConsumer.as_asgi(), '/ws/admin/ops/')
+            rejected.scope['user'] = self.customer
+            connected, _ = await rejected.connect()
+            self.assertFalse(connected)
+
+            communicator = WebsocketCommunicator(AdminOpsConsumer.as_asgi(), '/ws/admin/ops/')
+            communicator.scope['user'] = self.admin
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot['type'], 'ops_snapshot')
+            self.assertEqual(snapshot['counts']['transactions'], 0)
+
+            await get_channel_layer().group_send(OPS_GROUP, {
+                'type': 'ops_event', 'event': 'loan.applied', 'data': {'id': 1}, 'counts': {'loans': 1}, 'at': 'now',
+            })
+            event = await communicator.receive_json_from()
+            self.assertEqual((event['event'], event['counts']), ('loan.applied', {'loans': 1}))
+            await communicator.disconnect()
+
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            async_to_sync(scenario)()
+
+
+class NotificationResumeTests(TestCase):
+    def setUp(self):
+        from .services import create_notification
+
+        self.user = get_user_model().objects.create_user(username='resume@example.com', email='resume@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+        self.notifications = [
+            create_notification(self.user.profile, 'SYSTEM', f'Notice {i}', 'Body') for i in range(5)
+        ]
+
+    def test_get_notifications_after_returns_only_newer_in_order(self):
+        from .services import get_notifications_after
+
+        newer, has_more = get_notifications_after(self.user.profile.id, self.notifications[1].id)
+        self.assertEqual([n.id for n in newer], [n.id for n in self.notifications[2:]])
+        self.assertFalse(has_more)
+
+        newer, has_more = get_notifications_after(self.user.profile.id, 0, limit=2)
+        self.assertEqual([n.id for n in newer], [n.id for n in self.notifications[:2]])
+        self.assertTrue(has_more)
+
+    def test_resume_replays_missed_notifications_and_falls_back_to_ack(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from django.core.cache import cache
+        from django.test import override_settings
+        from .consumers import NotificationConsumer
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        ids = [n.id for n in self.notifications]
+
+        async def connect(query=''):
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), f'/ws/notifications/{query}')
+            communicator.scope['user'] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'connection_established')
+            self.assertEqual((await communicator.receive_json_from())['type'], 'unread_count')
+            return communicator
+
+        async def scenario():
+            communicator = await connect(f'?last_id={ids[2]}')
+            frame = await communicator.receive_json_from()
+            self.assertEqual(frame['type'], 'resume')
+            self.assertEqual([n['id'] for n in frame['notifications']], ids[3:])
+            self.assertEqual(frame['last_id'], ids[-1])
+            self.assertFalse(frame['has_more'])
+
+            # Without a cursor or an ack the client is told to reload
+            await communicator.send_json_to({'type': 'resume'})
+            frame = await communicator.receive_json_from()
+            self.assertEqual((frame['notifications'], frame['has_more']), ([], True))
+
+            await communicator.send_json_to({'type': 'ack', 'notification_id': ids[3]})
+            await communicator.send_json_to({'type': 'ack', 'notification_id': ids[1]})
+            await communicator.disconnect()
+
+            communicator = await connect()
+            await communicator.send_json_to({'type': 'resume'})
+            frame = await communicator.receive_json_from()
+            self.assertEqual([n['id'] for n in frame['notifications']], ids[4:])
+            await communicator.disconnect()
+
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            async_to_sync(scenario)()
+
+
+class WebSocketFrameProtocolTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='frames@example.com', email='frames@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+
+    def test_with_frames_encodes_the_client_frame_once_for_both_formats(self):
+        import json
+        from . import ws_protocol
+
+        message = ws_protocol.with_frames({'type': 'unread_count', 'unread_count': 3})
+        # The raw payload is not carried through the channel layer next to its frames
+        self.assertEqual(set(message), {'type', 'frames'})
+        self.assertEqual(json.loads(message['frames']['json']), {'type': 'unread_count', 'unread_count': 3})
+        self.assertEqual(ws_protocol.decode(message['frames']['msgpack']), {'type': 'unread_count', 'unread_count': 3})
+        # Messages without a client frame pass through untouched
+        self.assertNotIn('frames', ws_protocol.with_frames({'type': 'user_status', 'status': 'online'}))
+
+    def test_msgpack_subprotocol_gets_binary_frames(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from django.test import override_settings
+        from . import ws_protocol
+        from .consumers import NotificationConsumer
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                NotificationConsumer.as_asgi(), '/ws/notifications/', subprotocols=[ws_protocol.MSGPACK_SUBPROTOCOL]
+            )
+            communicator.scope['user'] = self.user
+            connected, subprotocol = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual(subprotocol, ws_protocol.MSGPACK_SUBPROTOCOL)
+            established = ws_protocol.decode((await communicator.receive_output())['bytes'])
+            self.assertEqual(established['type'], 'connection_established')
+            await communicator.receive_output()
+
+            # Pre-encoded and legacy group messages both arrive as msgpack
+            await get_channel_layer().group_send(
+                f'notifications_{self.user.id}', ws_protocol.with_frames({'type': 'unread_count', 'unread_count': 4})
+            )
+            frame = ws_protocol.decode((await communicator.receive_output())['bytes'])
+            self.assertEqual(frame, {'type': 'unread_count', 'unread_count': 4})
+            await get_channel_layer().group_send(f'notifications_{self.user.id}', {'type': 'unread_count', 'unread_count': 5})
+            frame = ws_protocol.decode((await communicator.receive_output())['bytes'])
+            self.assertEqual(frame['unread_count'], 5)
+
+            # Binary client frames are understood too
+            await communicator.send_to(bytes_data=ws_protocol.encode({'type': 'ping'}, ws_protocol.MSGPACK))
+            self.assertEqual(ws_protocol.decode((await communicator.receive_output())['bytes']), {'type': 'pong'})
+            await communicator.disconnect()
+
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            async_to_sync(scenario)()
+
+
+class WebSocketLoadTestCommandTests(TransactionTestCase):
+    # Consumers read users from worker threads, which must not wait on a test transaction
+    def test_load_test_connects_every_socket_and_cleans_up(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command(
+            'loadtest_websockets', connections=3, duration=0.5, ping_interval=0.2, fanout_interval=0.2,
+            message_rate=0, typing_rate=0, json=True, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['connections'], report['connect_failures']), (6, 0))
+        self.assertEqual(report['connect_latency_ms']['count'], 6)
+        self.assertGreater(report['message_latency_ms']['notification_fanout']['count'], 0)
+        self.assertFalse(get_user_model().objects.filter(email__endswith='@loadtest.invalid').exists())
+
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional test dependency
+    httpx = None
+
+
+@skipUnless(httpx, 'httpx is required for loadtest_api')
+class ApiLoadTestCommandTests(TransactionTestCase):
+    # Requests run in worker threads, which must not wait on a test transaction
+    def test_journeys_and_approvals_are_reported_per_endpoint(self):
+        import json
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        output = os.path.join(tempfile.mkdtemp(), 'report.json')
+        # Serial journeys without the concurrent admin loop, the in-memory test database locks under parallel writers
+        call_command('loadtest_api', users=2, concurrency=1, iterations=1, admins=0, output=output, stdout=StringIO())
+        with open(output) as report_file:
+            report = json.load(report_file)
+
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['endpoints']['POST /api/auth/register/']['count'], 2)
+        self.assertEqual(report['endpoints']['POST /api/transfers/']['status_codes'], {'201': 2})
+        self.assertEqual(report['endpoints']['GET /api/dashboard/']['errors'], 0)
+        self.assertFalse(get_user_model().objects.filter(email__endswith='@loadtest.invalid').exists())
+
+
+class ServiceBenchmarkTests(TestCase):
+    def test_query_budgets_do_not_grow_with_the_dataset(self):
+        from django.db import transaction
+        from . import benchmarks
+
+        class Rollback(Exception):
+            pass
+
+        queries = {}
+        for size in (2, 10):
+            try:
+                with transaction.atomic():
+                    results = benchmarks.run_benchmarks(benchmarks.seed_dataset(size), repeat=2)
+                    raise Rollback
+            except Rollback:
+                pass
+            self.assertEqual(benchmarks.check_results(results, {}, size, tolerance=2.0), [])
+            queries[size] = {name: result['queries'] for name, result in results.items()}
+
+        self.assertEqual(set(queries[2]), set(benchmarks.BENCHMARKS))
+        self.assertEqual(queries[2], queries[10])
+
+    def test_serializer_fast_paths_render_the_same_json(self):
+        from django.db import transaction
+        from . import benchmarks
+
+        class Rollback(Exception):
+            pass
+
+        try:
+            with transaction.atomic():
+                results = benchmarks.compare_serializers(benchmarks.seed_dataset(3), repeat=1)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.assertEqual(set(results), set(benchmarks.SERIALIZER_COMPARISONS))
+        for name, result in results.items():
+            self.assertTrue(result['identical'], name)
+            self.assertGreater(result['rows'], 0, name)
+        self.assertLessEqual(results['admin_transactions']['fast_queries'], 2)
+
+
+class ReadSerializerTests(TestCase):
+    """The list endpoints' fast paths must render exactly what the serializers they replace did."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(username='user@example.com', email='user@example.com', password='pass1234')
+        self.account = create_customer_account(self.user)
+        self.profile = self.user.profile
+        self.client = APIClient()
+
+    def render(self, data):
+        from rest_framework.renderers import JSONRenderer
+
+        return JSONRenderer().render(data)
+
+    def test_transaction_lists_match_the_model_serializers(self):
+        from .models import LedgerPosting
+        from .serializers import AdminLedgerEntrySerializer, LedgerEntrySerializer
+
+        funding, _ = get_system_accounts()
+        for index, amount in enumerate(['125.50', '0.07', '980']):
+            entry = LedgerEntry.objects.create(
+                reference=f'FAST-{index}', entry_type='DEPOSIT', created_by=self.user, status='POSTED', memo='Fast path',
+            )
+            LedgerPosting.objects.create(entry=entry, account=self.account, direction='CREDIT', amount=Decimal(amount))
+            LedgerPosting.objects.create(entry=entry, account=funding, direction='DEBIT', amount=Decimal(amount), description='Funding')
+        # No creator and no postings: the serializer omits created_by_email and reports an amount of 0
+        LedgerEntry.objects.create(reference='FAST-EMPTY', entry_type='TRANSFER', status='PENDING')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/transactions/')
+        entries = LedgerEntry.objects.filter(postings__account__customer=self.profile).distinct().order_by('-created_at')
+        self.assertEqual(
+            self.render(response.data['transactions']),
+            self.render(LedgerEntrySerializer(entries, many=True).data),
+        )
+        self.assertEqual(len(response.data['transactions']), 3)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/admin/transactions/')
+        self.assertEqual(
+            response.content,
+            self.render(AdminLedgerEntrySerializer(LedgerEntry.objects.order_by('-created_at'), many=True).data),
+        )
+        self.assertNotIn('created_by_email', next(row for row in response.data if row['reference'] == 'FAST-EMPTY'))
+
+    def test_notification_and_kyc_lists_match_the_model_serializers(self):
+        from django.core.files.base import ContentFile
+        from django.test import RequestFactory
+        from django.utils import timezone
+        from .models import KYCDocument
+        from .serializers import KYCDocumentSerializer, NotificationSerializer
+
+        for index in range(3):
+            Notification.objects.create(
+                customer=self.profile, notification_type='TRANSACTION', title=f'Notice {index}', message='Body',
+                metadata={'amount': '25.00', 'tags': ['a', index]}, is_read=index == 0,
+                read_at=timezone.now() if index == 0 else None,
+            )
+        document = KYCDocument(customer=self.profile, document_type='PASSPORT', document_number='P123', verified_by=self.admin, verified_at=timezone.now())
+        document.document_file.save('passport.pdf', ContentFile(b'%PDF-1.4 test'), save=True)
+        KYCDocument.objects.create(customer=self.profile, document_type='SELFIE', document_file='', status='REJECTED', rejection_reason='Blurry')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/notifications/?page_size=2')
+        notifications = Notification.objects.filter(customer=self.profile).order_by('-created_at')[:2]
+        self.assertEqual(
+            self.render(response.data['notifications']),
+            self.render(NotificationSerializer(notifications, many=True).data),
+        )
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/admin/kyc/documents/')
+        request = RequestFactory().get('/api/admin/kyc/documents/')
+        documents = KYCDocument.objects.order_by('-uploaded_at')
+        self.assertEqual(response.content, self.render(KYCDocumentSerializer(documents, many=True, context={'request': request}).data))
+        uploaded = next(row for row in response.data if row['document_type'] == 'PASSPORT')
+        self.assertEqual(uploaded['file_size'], 13)
+        self.assertTrue(uploaded['document_url'].startswith('http://testserver/'))
+
+
+from .metrics import prometheus_client
+
+
+@skipUnless(prometheus_client, 'prometheus_client is not installed')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='user@example.com', email='user@example.com', password='pass1234', is_active=True)
+        create_customer_account(self.user)
+
+    def sample(self, body, name, **labels):
+        from prometheus_client.parser import text_string_to_metric_families
+
+        for family in text_string_to_metric_families(body):
+            for sample in family.samples:
+                if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                    return sample.value
+        return 0
+
+    def test_requests_are_labelled_by_route(self):
+        self.client.force_authenticate(self.user)
+        before = self.client.get('/metrics').content.decode()
+        self.client.get('/api/dashboard/')
+        self.client.get('/api/notifications/999999/')
+        body = self.client.get('/metrics').content.decode()
+
+        def delta(name, **labels):
+            return self.sample(body, name, **labels) - self.sample(before, name, **labels)
+
+        self.assertEqual(delta('http_requests_total', route='api/dashboard/', method='GET', status='200'), 1)
+        self.assertEqual(delta('http_request_sql_queries_count', route='api/dashboard/', method='GET'), 1)
+        self.assertGreater(delta('http_request_sql_queries_sum', route='api/dashboard/', method='GET'), 0)
+        self.assertGreater(delta('http_response_size_bytes_sum', route='api/dashboard/', method='GET'), 0)
+        self.assertEqual(delta('http_requests_total', route='api/notifications/<int:pk>/', method='GET', status='404'), 1)
+        self.assertNotIn('route="api/notifications/999999/"', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_requests_total', response.content)
+
+
+@skipUnless(prometheus_client, 'prometheus_client is not installed')
+class CeleryTaskMetricsTests(TestCase):
+    def sample(self, name, **labels):
+        return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_run_time_failures_and_queue_wait_are_recorded_per_task(self):
+        import time
+        from .metrics import record_task_start, stamp_published_at
+        from .tasks import generate_statement, rebuild_notification_counters
+
+        name = rebuild_notification_counters.name
+        runs = self.sample('celery_task_runtime_seconds_count', task=name, state='SUCCESS')
+        rebuild_notification_counters.apply()
+        self.assertEqual(self.sample('celery_task_runtime_seconds_count', task=name, state='SUCCESS'), runs + 1)
+
+        failures = self.sample('celery_task_failures_total', task=generate_statement.name, exception='TypeError')
+        generate_statement.apply(args=[])
+        self.assertEqual(
+            self.sample('celery_task_failures_total', task=generate_statement.name, exception='TypeError'), failures + 1
+        )
+
+        headers = {}
+        stamp_published_at(headers=headers)
+        waits = self.sample('celery_task_queue_wait_seconds_count', task=name)
+        rebuild_notification_counters.push_request(id='queued', published_at=headers['published_at'] - 3)
+        try:
+            record_task_start(task_id='queued', task=rebuild_notification_counters)
+        finally:
+            rebuild_notification_counters.pop_request()
+        self.assertEqual(self.sample('celery_task_queue_wait_seconds_count', task=name), waits + 1)
+        self.assertGreaterEqual(self.sample('celery_task_queue_wait_seconds_sum', task=name), 3)
+
+    def test_queue_depths_are_read_from_the_broker(self):
+        from celery import Celery
+        from .metrics import celery_queue_depths
+
+        # Not the current app, shared tasks must keep running eagerly on the project app
+        app = Celery('queue-depth-test', broker='memory://', set_as_current=False)
+        for _ in range(3):
+            app.send_task('bank.tasks.dispatch_outbox')
+        self.assertEqual(celery_queue_depths(app), {'celery': 3})
+
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='customer@example.com', password='pass1234'))
+        self.assertEqual(client.get('/api/admin/tasks/queues/').status_code, 403)
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(username='user@example.com', email='user@example.com', password='pass1234')
+        create_customer_account(self.user)
+        self.client = APIClient()
+
+    def test_signed_header_profiles_the_request_and_admin_can_download_it(self):
+        import marshal
+        from .models import RequestProfile
+
+        self.client.force_authenticate(self.admin)
+        token = self.client.post('/api/admin/profiles/token/').data['token']
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 200)
+        self.assertFalse(RequestProfile.objects.exists())
+
+        response = self.client.get('/api/dashboard/', HTTP_X_SNEL_PROFILE=token)
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(pk=response['X-Request-Profile-Id'])
+        self.assertEqual((profile.route, profile.user, profile.requested_by), ('api/dashboard/', self.user, self.admin))
+        self.assertEqual(profile.sql_count, len(profile.sql_trace))
+        self.assertGreater(profile.sql_count, 0)
+        self.assertTrue(all(isinstance(shape, str) for query in profile.sql_trace for shape in query['param_shape']))
+        self.assertFalse(any('params' in query for query in profile.sql_trace))
+
+        # The token was good for one request
+        self.assertNotIn('X-Request-Profile-Id', self.client.get('/api/dashboard/', HTTP_X_SNEL_PROFILE=token))
+
+        self.client.force_authenticate(self.admin)
+        listed = self.client.get('/api/admin/profiles/').data
+        self.assertEqual([item['id'] for item in listed], [profile.pk])
+        download = self.client.get(f'/api/admin/profiles/{profile.pk}/download/')
+        stats = marshal.loads(b''.join(download.streaming_content))
+        self.assertTrue(any(func[2] == 'get' for func in stats))
+
+    def test_forged_or_customer_tokens_are_ignored(self):
+        from .models import RequestProfile
+        from .profiling import issue_token
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post('/api/admin/profiles/token/').status_code, 403)
+        for token in ('forged', issue_token(self.user)):
+            response = self.client.get(f'/api/dashboard/?__profile={token}')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Request-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+    def test_token_uses_are_limited_and_old_profiles_purged(self):
+        from .models import RequestProfile
+        from .profiling import purge_profiles
+
+        self.client.force_authenticate(self.admin)
+        issued = self.client.post('/api/admin/profiles/token/', {'uses': 500}, format='json').data
+        self.assertEqual(issued['uses'], 20)
+        token = self.client.post('/api/admin/profiles/token/', {'uses': 3}, format='json').data['token']
+
+        self.client.force_authenticate(self.user)
+        profiled = [
+            'X-Request-Profile-Id' in self.client.get('/api/dashboard/', HTTP_X_SNEL_PROFILE=token) for _ in range(4)
+        ]
+        self.assertEqual(profiled, [True, True, True, False])
+
+        oldest = RequestProfile.objects.order_by('created_at', 'pk').first()
+        with override_settings(REQUEST_PROFILE_MAX_STORED=2):
+            self.assertEqual(purge_profiles(), 1)
+        self.assertFalse(RequestProfile.objects.filter(pk=oldest.pk).exists())
+        self.assertFalse(oldest.profile_file.storage.exists(oldest.profile_file.name))
+
+
+class SlowQueryCaptureTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='pass1234', is_staff=True)
+        self.user = User.objects.create_user(username='user@example.com', email='user@example.com', password='pass1234')
+        create_customer_account(self.user)
+        self.client = APIClient()
+
+    def test_captures_keep_call_site_and_wrap_around_the_buffer(self):
+        from .models import SlowQuery
+        from .slow_queries import fingerprint
+
+        self.client.force_authenticate(self.user)
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_BUFFER_SIZE=4):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.assertEqual(self.client.get('/api/dashboard/').status_code, 200)
+        self.assertGreater(len(callbacks), 4)
+
+        captures = list(SlowQuery.objects.all())
+        self.assertEqual(len(captures), 4)
+        capture = captures[0]
+        self.assertEqual((capture.source_type, capture.source), ('VIEW', 'bank.views.DashboardView'))
+        self.assertTrue(any(frame.startswith('bank/views.py:') for frame in capture.stack))
+        self.assertTrue(all(isinstance(shape, str) for shape in capture.param_shape))
+
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND name = \'a\''),
+            fingerprint('SELECT *  FROM t WHERE id IN (%s, %s, %s) AND name = \'bob\''),
+        )
+
+    def test_admin_lists_top_offenders_by_fingerprint(self):
+        from .models import SlowQuery
+        from .slow_queries import fingerprint
+
+        for slot, (sql, duration) in enumerate([
+            ('SELECT * FROM bank_account WHERE id = %s', 300),
+            ('SELECT * FROM bank_account WHERE id = %s', 500),
+            ('SELECT COUNT(*) FROM bank_notification', 250),
+        ]):
+            SlowQuery.objects.create(
+                slot=slot, fingerprint=fingerprint(sql), sql=sql,
+                duration_ms=duration, source_type='TASK', source='bank.tasks.auto_post_entry',
+            )
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/admin/slow-queries/').status_code, 403)
+        self.client.force_authenticate(self.admin)
+        offenders = self.client.get('/api/admin/slow-queries/').data['offenders']
+        self.assertEqual([(o['count'], o['total_ms']) for o in offenders], [(2, 800), (1, 250)])
+        self.assertEqual(offenders[0]['sources'], ['bank.tasks.auto_post_entry'])
+        self.assertEqual(offenders[0]['normalized_sql'], 'SELECT * FROM bank_account WHERE id = ?')
+
+
+class SlowQueryRollbackTests(TransactionTestCase):
+    def test_failed_statement_in_rolled_back_transaction_is_recorded(self):
+        from django.db import DatabaseError, connection, transaction
+        from .models import SlowQuery
+
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    SlowQuery.objects.exists()
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT * FROM bank_no_such_table WHERE id = %s', [1])
+            # The first statement after the rollback flushes what the transaction captured
+            SlowQuery.objects.exists()
+        captures = list(SlowQuery.objects.values_list('sql', 'error'))
+        self.assertIn(('SELECT * FROM bank_no_such_table WHERE id = %s', 'OperationalError'), captures)
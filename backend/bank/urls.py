@@ -69,6 +69,7 @@ urlpatterns = [
     path('notifications/mark-all-read/', views.NotificationMarkAllReadView.as_view()),
     path('notifications/unread-count/', views.NotificationUnreadCountView.as_view()),
     path('notifications/<int:pk>/delete/', views.NotificationDeleteView.as_view()),
+    path('admin/notifications/broadcast/', views.AdminNotificationBroadcastView.as_view()),
 
     # Virtual Card Endpoints
     path('virtual-cards/', views.VirtualCardsView.as_view()),
@@ -88,6 +89,7 @@ urlpatterns = [
     path('support/conversations/<int:pk>/', views.SupportConversationDetailView.as_view()),
     path('support/conversations/<int:conversation_id>/messages/', views.SendSupportMessageView.as_view()),
     path('support/unread-count/', views.SupportUnreadCountView.as_view()),
+    path('admin/support/presence/', views.AdminSupportPresenceView.as_view()),
     
     # KYC Document Endpoints
     path('kyc/documents/', views.KYCDocumentsView.as_view()),
@@ -124,9 +126,16 @@ urlpatterns = [
     
     # Admin Activity & Dashboard Endpoints
     path('admin/activity-log/', views.AdminActivityLogView.as_view()),
+    path('admin/activity-log/export/', views.AdminActivityLogExportView.as_view()),
     path('admin/users/<int:pk>/activity/', views.AdminUserActivityView.as_view()),
     path('admin/dashboard/stats/', views.AdminDashboardStatsView.as_view()),
     path('admin/recent-activity/', views.AdminRecentActivityView.as_view()),
     path('admin/verification-codes/', views.AdminVerificationCodesView.as_view()),
     path('admin/telegram-config/', views.AdminTelegramConfigView.as_view()),
+    path('admin/tasks/queues/', views.AdminTaskQueuesView.as_view()),
+    path('admin/profiles/', views.AdminRequestProfilesView.as_view()),
+    path('admin/profiles/token/', views.AdminRequestProfileTokenView.as_view()),
+    path('admin/profiles/<int:pk>/', views.AdminRequestProfileDetailView.as_view()),
+    path('admin/profiles/<int:pk>/download/', views.AdminRequestProfileDownloadView.as_view()),
+    path('admin/slow-queries/', views.AdminSlowQueriesView.as_view()),
 ]
@@ -1,3 +1,4 @@
+import base64
 from datetime import datetime, timedelta
 from decimal import Decimal
 import random
@@ -5,7 +6,7 @@ import random
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, Sum
 from django.utils import timezone
 from rest_framework import permissions, status
@@ -14,11 +15,10 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Account, CustomerProfile, LedgerEntry, LedgerPosting, Statement, VerificationCode, CryptoWallet, CryptoDeposit, SupportConversation, SupportMessage, VirtualCard, KYCDocument, Notification, Loan, LoanPayment, TaxRefundApplication, TaxRefundDocument, Grant, GrantApplication, TelegramConfig, WithdrawalAttempt, OutgoingEmail
+from .models import Account, CustomerProfile, LedgerEntry, LedgerPosting, Statement, VerificationCode, CryptoWallet, CryptoDeposit, SupportConversation, SupportMessage, VirtualCard, KYCDocument, Notification, Loan, LoanPayment, TaxRefundApplication, TaxRefundDocument, Grant, GrantApplication, TelegramConfig, WithdrawalAttempt, OutgoingEmail, OutgoingEmailAttachment, RequestProfile
+from .read_serializers import admin_ledger_entry_rows, kyc_document_rows, ledger_entry_rows, notification_rows
 from .serializers import (
     AccountSerializer,
     AdminAccountSerializer,
@@ -66,15 +66,25 @@ from .serializers import (
     TelegramConfigSerializer,
     OutgoingEmailListSerializer,
     OutgoingEmailDetailSerializer,
+    RequestProfileListSerializer,
+    RequestProfileDetailSerializer,
 )
 from .services import (
     add_posting,
+    announce_pending_entry,
     approve_entry,
     create_customer_account,
     create_entry,
     decline_entry,
+    get_admin_support_unread_count,
+    get_support_message_page,
     get_system_accounts,
+    mark_support_conversation_read,
+    record_support_message,
 )
+from .authentication import fresh_profile
+from .ops_feed import crypto_deposit_event_data, emit_ops_event, kyc_event_data
+from .outbox import enqueue_group_send, enqueue_task
 from .tasks import auto_post_entry, generate_statement
 
 
@@ -88,7 +98,7 @@ class RegisterView(APIView):
         verification_code = create_verification_code(user, 'EMAIL_VERIFICATION')
         
         from .emails import send_verification_email
-        send_verification_email.delay(user.id, verification_code.code)
+        enqueue_task(send_verification_email, user.id, verification_code.code)
         
         return Response({
             'detail': 'Verification code sent to your email.',
@@ -202,7 +212,7 @@ class ResendVerificationView(APIView):
         if user and not user.is_active:
             verification_code = create_verification_code(user, 'EMAIL_VERIFICATION')
             from .emails import send_verification_email
-            send_verification_email.delay(user.id, verification_code.code)
+            enqueue_task(send_verification_email, user.id, verification_code.code)
 
         return Response({'detail': 'If the email exists, a verification code has been sent.'})
 
@@ -220,7 +230,7 @@ class PasswordResetRequestView(APIView):
         if user:
             reset_code = create_verification_code(user, 'PASSWORD_RESET')
             from .emails import send_password_reset_email
-            send_password_reset_email.delay(user.id, reset_code.code)
+            enqueue_task(send_password_reset_email, user.id, reset_code.code)
 
         return Response({'detail': 'If the email exists, a reset code has been sent.'})
 
@@ -386,7 +396,7 @@ class TransactionsView(APIView):
         ).order_by('-created_at')
 
         return Response({
-            'transactions': LedgerEntrySerializer(entries, many=True).data,
+            'transactions': ledger_entry_rows(entries),
             'unsettled_crypto_deposits': CryptoDepositSerializer(unsettled_crypto, many=True).data
         })
 
@@ -414,6 +424,7 @@ class DepositView(APIView):
         entry = create_entry('DEPOSIT', request.user, memo=memo)
         add_posting(entry, account, 'CREDIT', amount, 'Customer deposit')
         add_posting(entry, funding, 'DEBIT', amount, 'Funding source')
+        announce_pending_entry(entry)
 
         from .services import create_transaction_notification
         create_transaction_notification(
@@ -425,7 +436,7 @@ class DepositView(APIView):
         )
 
         if settings.AUTO_APPROVE_DEPOSITS:
-            auto_post_entry.apply_async((entry.id,), countdown=settings.TRANSACTION_REVIEW_DELAY_SECONDS)
+            enqueue_task(auto_post_entry, entry.id, countdown=settings.TRANSACTION_REVIEW_DELAY_SECONDS)
 
         return Response(LedgerEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
 
@@ -442,23 +453,27 @@ class TransferView(APIView):
         recipient = Account.objects.filter(account_number=target_account_number).first()
         if not recipient:
             return Response({'detail': 'Recipient account not found'}, status=status.HTTP_400_BAD_REQUEST)
-        entry = create_entry('TRANSFER', request.user, memo=memo)
-        add_posting(entry, account, 'DEBIT', amount, 'Transfer out')
-        add_posting(entry, recipient, 'CREDIT', amount, 'Transfer in')
-        
-        # Notify recipient
         from .emails import send_transfer_received_email
-        send_transfer_received_email.delay(recipient.customer.user.id, amount, f"User {request.user.email}", memo)
-        
-        # Telegram notification
         from .telegram import send_telegram_notification
-        send_telegram_notification(
-            f"New Transfer Attempt\n"
-            f"User: {request.user.email}\n"
-            f"Amount: {amount} USD\n"
-            f"To: {recipient.account_number}\n"
-            f"Memo: {memo}"
-        )
+        
+        # The entry and its side effects (queued in the outbox) commit together
+        with transaction.atomic():
+            entry = create_entry('TRANSFER', request.user, memo=memo)
+            add_posting(entry, account, 'DEBIT', amount, 'Transfer out')
+            add_posting(entry, recipient, 'CREDIT', amount, 'Transfer in')
+            announce_pending_entry(entry)
+            
+            # Notify recipient
+            enqueue_task(send_transfer_received_email, recipient.customer.user.id, amount, f"User {request.user.email}", memo)
+            
+            # Telegram notification
+            send_telegram_notification(
+                f"New Transfer Attempt\n"
+                f"User: {request.user.email}\n"
+                f"Amount: {amount} USD\n"
+                f"To: {recipient.account_number}\n"
+                f"Memo: {memo}"
+            )
         
         return Response(LedgerEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
 
@@ -517,7 +532,7 @@ class StatementsGenerateView(APIView):
             period_start=period_start,
             period_end=period_end,
         )
-        generate_statement.apply_async((statement.id,))
+        enqueue_task(generate_statement, statement.id)
         return Response(StatementSerializer(statement).data, status=status.HTTP_201_CREATED)
 
 
@@ -526,7 +541,7 @@ class ProfileView(APIView):
         return Response(ProfileSerializer(request.user.profile).data)
 
     def patch(self, request):
-        profile = request.user.profile
+        profile = fresh_profile(request.user)
         serializer = ProfileSerializer(profile, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -553,7 +568,7 @@ class AdminTransactionsView(APIView):
         entries = LedgerEntry.objects.all().order_by('-created_at')
         if status_filter:
             entries = entries.filter(status=status_filter)
-        return Response(AdminLedgerEntrySerializer(entries, many=True).data)
+        return Response(admin_ledger_entry_rows(entries))
 
 
 class AdminTransactionDetailView(APIView):
@@ -588,7 +603,7 @@ class AdminTransactionApproveView(APIView):
         
         # Notify user via email
         from .emails import send_transaction_status_email
-        send_transaction_status_email.delay(entry.id, 'APPROVED')
+        enqueue_task(send_transaction_status_email, entry.id, 'APPROVED', dedupe_key=f'transaction-status:{entry.id}:APPROVED')
         
         return Response(AdminLedgerEntrySerializer(entry).data)
 
@@ -614,7 +629,7 @@ class AdminTransactionDeclineView(APIView):
         
         # Notify user via email
         from .emails import send_transaction_status_email
-        send_transaction_status_email.delay(entry.id, 'DECLINED')
+        enqueue_task(send_transaction_status_email, entry.id, 'DECLINED', dedupe_key=f'transaction-status:{entry.id}:DECLINED')
         
         return Response(AdminLedgerEntrySerializer(entry).data)
 
@@ -698,7 +713,7 @@ class AdminAccountDetailView(APIView):
         # Notify user if status changed
         if 'status' in serializer.validated_data and serializer.validated_data['status'] != old_status:
             from .emails import send_account_status_email
-            send_account_status_email.delay(account.id, serializer.validated_data['status'])
+            enqueue_task(send_account_status_email, account.id, serializer.validated_data['status'])
             
         return Response(AdminAccountSerializer(account).data)
 
@@ -711,27 +726,73 @@ class AdminAuditView(APIView):
         return Response({'entries': AdminLedgerEntrySerializer(recent_entries, many=True).data})
 
 
+def _encode_email_cursor(email):
+    raw = f"{email.created_at.isoformat()}|{email.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_email_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(pk)
+
+
 class AdminOutgoingEmailsView(APIView):
+    """
+    Keyset-paginated email audit log, newest first.
+
+    Pass the returned next_cursor back as ?cursor= to fetch the following page.
+    Free-text search covers subject and recipients, which are trigram indexed
+    on PostgreSQL.
+    """
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        qs = OutgoingEmail.objects.all().order_by('-created_at')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = OutgoingEmail.objects.defer('text_body', 'html_body', 'error_message').order_by('-created_at', '-id')
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                created_at, pk = _decode_email_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                return Response({'detail': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
 
         status_filter = request.query_params.get('status')
         if status_filter:
             qs = qs.filter(status=status_filter.upper())
 
+        sender = request.query_params.get('from')
+        if sender:
+            qs = qs.filter(from_email__iexact=sender)
+
         q = request.query_params.get('q')
         if q:
-            qs = qs.filter(
-                Q(subject__icontains=q)
-                | Q(to_emails__icontains=q)
-                | Q(from_email__icontains=q)
-            )
+            qs = qs.filter(Q(subject__icontains=q) | Q(to_emails__icontains=q))
 
-        qs = qs.annotate(models.Count('attachments'))
-        serializer = OutgoingEmailListSerializer(qs, many=True, context={'request': request})
-        return Response(serializer.data)
+        emails = list(qs[:limit + 1])
+        has_next = len(emails) > limit
+        emails = emails[:limit]
+
+        # One grouped query for the page instead of a join over the whole table
+        counts = dict(
+            OutgoingEmailAttachment.objects.filter(email__in=[e.pk for e in emails])
+            .values_list('email').annotate(models.Count('id'))
+        )
+        for email in emails:
+            email.attachments__count = counts.get(email.pk, 0)
+
+        serializer = OutgoingEmailListSerializer(emails, many=True, context={'request': request})
+        return Response({
+            'emails': serializer.data,
+            'next_cursor': _encode_email_cursor(emails[-1]) if has_next else None,
+            'has_next': has_next,
+        })
 
 
 class AdminOutgoingEmailDetailView(APIView):
@@ -801,7 +862,7 @@ class FreezeAccountView(APIView):
         print(f"DEBUG: FreezeAccountView triggered for {account_number}")
         # Notify user
         from .emails import send_account_status_email
-        send_account_status_email.delay(account.id, 'FROZEN')
+        enqueue_task(send_account_status_email, account.id, 'FROZEN')
         
         return Response({'detail': f'Account {account_number} has been frozen'}, status=status.HTTP_200_OK)
 
@@ -829,7 +890,7 @@ class UnfreezeAccountView(APIView):
         print(f"DEBUG: UnfreezeAccountView triggered for {account_number}")
         # Notify user
         from .emails import send_account_status_email
-        send_account_status_email.delay(account.id, 'ACTIVE')
+        enqueue_task(send_account_status_email, account.id, 'ACTIVE')
         
         return Response({'detail': f'Account {account_number} has been unfrozen'}, status=status.HTTP_200_OK)
 
@@ -872,6 +933,7 @@ class CryptoDepositInitiateView(APIView):
             tx_hash=serializer.validated_data.get('tx_hash', ''),
             verification_status='PENDING_VERIFICATION'  # Directly to verification since proof is provided
         )
+        emit_ops_event('crypto.proof_submitted', crypto_deposit_event_data(crypto_deposit), counts=['crypto_deposits'])
 
         response_serializer = CryptoDepositSerializer(crypto_deposit, context={'request': request})
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -900,6 +962,7 @@ class CryptoDepositUploadProofView(APIView):
         crypto_deposit.tx_hash = serializer.validated_data.get('tx_hash', '')
         crypto_deposit.verification_status = 'PENDING_VERIFICATION'
         crypto_deposit.save()
+        emit_ops_event('crypto.proof_submitted', crypto_deposit_event_data(crypto_deposit), counts=['crypto_deposits'])
 
         response_serializer = CryptoDepositSerializer(crypto_deposit, context={'request': request})
         return Response(response_serializer.data)
@@ -1086,7 +1149,7 @@ class AdminCryptoDepositVerifyView(APIView):
 
             # Notify user
             from .emails import send_crypto_approval_email
-            send_crypto_approval_email.delay(crypto_deposit.id)
+            enqueue_task(send_crypto_approval_email, crypto_deposit.id, dedupe_key=f'crypto-approved:{crypto_deposit.id}')
 
         elif action == 'reject':
             crypto_deposit.verification_status = 'REJECTED'
@@ -1097,8 +1160,9 @@ class AdminCryptoDepositVerifyView(APIView):
 
             # Notify user
             from .emails import send_crypto_rejection_email
-            send_crypto_rejection_email.delay(crypto_deposit.id, admin_notes)
+            enqueue_task(send_crypto_rejection_email, crypto_deposit.id, admin_notes, dedupe_key=f'crypto-rejected:{crypto_deposit.id}')
 
+        emit_ops_event('crypto.reviewed', crypto_deposit_event_data(crypto_deposit), counts=['crypto_deposits'])
         response_serializer = CryptoDepositSerializer(crypto_deposit, context={'request': request})
         return Response(response_serializer.data)
 
@@ -1165,7 +1229,7 @@ class AdminManualTransferView(APIView):
             
             # Notify recipient
             from .emails import send_transfer_received_email
-            send_transfer_received_email.delay(to_account.customer.user.id, amount, source_label or "System Funding", memo)
+            enqueue_task(send_transfer_received_email, to_account.customer.user.id, amount, source_label or "System Funding", memo)
             
         return Response({
             'detail': f'Successfully transferred ${amount} to {to_account.account_number}',
@@ -1187,17 +1251,36 @@ class SupportConversationsView(APIView):
             conversations = SupportConversation.objects.all()
             status_filter = request.query_params.get('status')
             if status_filter:
-                conversations = conversations.filter(status=status_filter)
+                conversations = conversations.filter(status=status_filter.upper())
         else:
             # Customer sees only their conversations
             conversations = SupportConversation.objects.filter(customer=user.profile)
         
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 200)
+            page = max(int(request.query_params.get('page', 1)), 1)
+        except ValueError:
+            return Response({'detail': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        start = (page - 1) * page_size
+        
+        # Inbox columns are denormalized, so the whole page is one query
+        rows = list(
+            conversations.select_related('customer__user')
+            .order_by('-last_message_at', '-created_at', '-id')[start:start + page_size + 1]
+        )
+        
         serializer = SupportConversationListSerializer(
-            conversations, 
+            rows[:page_size], 
             many=True, 
             context={'request': request}
         )
-        return Response(serializer.data)
+        return Response({
+            'conversations': serializer.data,
+            'page': page,
+            'page_size': page_size,
+            'has_next': len(rows) > page_size,
+            'has_previous': page > 1
+        })
     
     def post(self, request):
         """Create a new conversation (customers only)"""
@@ -1218,8 +1301,20 @@ class SupportConversationsView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
+def _support_message_page_params(request):
+    """Parse the before/after/limit cursor parameters, raising ValueError on bad input"""
+    params = {}
+    for name in ('before', 'after', 'limit'):
+        value = request.query_params.get(name)
+        if value not in (None, ''):
+            params[name] = int(value)
+    if 'before' in params and 'after' in params:
+        raise ValueError('Use either before or after, not both')
+    return params
+
+
 class SupportConversationDetailView(APIView):
-    """Get conversation details with messages"""
+    """Get conversation details with one page of messages (latest by default, see before/after/limit)"""
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self, pk, user):
@@ -1240,15 +1335,19 @@ class SupportConversationDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Mark messages as read
-        if request.user.is_staff:
-            # Admin marks customer messages as read
-            conversation.messages.filter(sender_type='CUSTOMER', is_read=False).update(is_read=True)
-        else:
-            # Customer marks admin messages as read
-            conversation.messages.filter(sender_type='ADMIN', is_read=False).update(is_read=True)
+        try:
+            params = _support_message_page_params(request)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = SupportConversationSerializer(conversation, context={'request': request})
+        # Mark messages as read, paging back through older history reveals nothing new
+        if 'before' not in params:
+            mark_support_conversation_read(conversation, request.user)
+        
+        serializer = SupportConversationSerializer(conversation, context={
+            'request': request,
+            'message_page': get_support_message_page(conversation, **params),
+        })
         return Response(serializer.data)
     
     def patch(self, request, pk):
@@ -1276,9 +1375,26 @@ class SupportConversationDetailView(APIView):
 
 
 class SendSupportMessageView(APIView):
-    """Send a message in a conversation"""
+    """Page through or send messages in a conversation"""
     permission_classes = [permissions.IsAuthenticated]
     
+    def get(self, request, conversation_id):
+        """One page of messages, oldest first: ?before=<id> for history, ?after=<id> for new ones"""
+        conversation = SupportConversation.objects.filter(pk=conversation_id).select_related('customer').first()
+        if not conversation or (not request.user.is_staff and conversation.customer.user_id != request.user.id):
+            return Response({'detail': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            params = _support_message_page_params(request)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        messages, has_more = get_support_message_page(conversation, **params)
+        return Response({
+            'messages': SupportMessageSerializer(messages, many=True).data,
+            'has_more': has_more,
+        })
+    
     def post(self, request, conversation_id):
         try:
             conversation = SupportConversation.objects.get(pk=conversation_id)
@@ -1298,34 +1414,17 @@ class SendSupportMessageView(APIView):
         serializer = SendMessageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Determine sender type
-        sender_type = 'ADMIN' if request.user.is_staff else 'CUSTOMER'
-        
-        # Create message
-        message = SupportMessage.objects.create(
-            conversation=conversation,
-            sender_type=sender_type,
-            sender_user=request.user,
-            message=serializer.validated_data['message']
-        )
-        
-        # Update conversation
-        conversation.last_message_at = timezone.now()
-        if conversation.status == 'OPEN' and sender_type == 'ADMIN':
-            conversation.status = 'IN_PROGRESS'
-        conversation.save(update_fields=['last_message_at', 'status'])
+        with transaction.atomic():
+            # Create message and update the conversation's inbox columns
+            message = record_support_message(conversation, request.user, serializer.validated_data['message'])
+            
+            response_serializer = SupportMessageSerializer(message)
         
-        response_serializer = SupportMessageSerializer(message)
-    
-        # Broadcast to WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chat_{conversation_id}',
-            {
+            # Broadcast to WebSocket after commit
+            enqueue_group_send(f'chat_{conversation_id}', {
                 'type': 'chat_message',
                 'message': response_serializer.data
-            }
-        )
+            })
     
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -1338,22 +1437,27 @@ class SupportUnreadCountView(APIView):
         user = request.user
         
         if user.is_staff:
-            # Count unread customer messages across all conversations
-            unread_count = SupportMessage.objects.filter(
-                sender_type='CUSTOMER',
-                is_read=False
-            ).count()
+            # Running total of unread customer messages across all conversations
+            unread_count = get_admin_support_unread_count()
         else:
-            # Count unread admin messages in user's conversations
-            unread_count = SupportMessage.objects.filter(
-                conversation__customer=user.profile,
-                sender_type='ADMIN',
-                is_read=False
-            ).count()
+            # Sum of the unread columns of the user's few conversations
+            unread_count = SupportConversation.objects.filter(
+                customer=user.profile
+            ).aggregate(total=Sum('unread_by_customer'))['total'] or 0
         
         return Response({'unread_count': unread_count})
 
 
+class AdminSupportPresenceView(APIView):
+    """Online customers with open support conversations, see ws/admin/presence/ for live changes"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from .presence import presence_snapshot
+
+        return Response({'online': presence_snapshot()})
+
+
 # ============ Virtual Card Views ============
 
 class VirtualCardsView(APIView):
@@ -1648,7 +1752,7 @@ class KYCDocumentsView(APIView):
         document = serializer.save()
         
         # Recalculate profile completion
-        request.user.profile.calculate_profile_completion()
+        fresh_profile(request.user).calculate_profile_completion()
         
         return Response(
             KYCDocumentSerializer(document, context={'request': request}).data,
@@ -1696,7 +1800,7 @@ class KYCDocumentDetailView(APIView):
         document.delete()
         
         # Recalculate profile completion
-        request.user.profile.calculate_profile_completion()
+        fresh_profile(request.user).calculate_profile_completion()
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -1707,7 +1811,7 @@ class KYCSubmitView(APIView):
 
     def post(self, request):
         """Submit KYC documents for review"""
-        profile = request.user.profile
+        profile = fresh_profile(request.user)
         
         # Check if profile has required information
         required_fields = ['full_name', 'phone', 'date_of_birth', 'address_line_1', 'city', 'country']
@@ -1752,10 +1856,11 @@ class KYCSubmitView(APIView):
         profile.kyc_status = 'UNDER_REVIEW'
         profile.kyc_submitted_at = timezone.now()
         profile.save(update_fields=['kyc_status', 'kyc_submitted_at'])
+        emit_ops_event('kyc.submitted', kyc_event_data(profile), counts=['kyc_documents'])
         
         # Send email notification
-        from .emails import send_kyc_status_email
-        send_kyc_status_email(profile, 'UNDER_REVIEW')
+        from .emails import send_kyc_status_email_task
+        enqueue_task(send_kyc_status_email_task, profile.id, 'UNDER_REVIEW')
         
         # Create notification
         from .services import create_notification
@@ -1795,8 +1900,7 @@ class AdminKYCDocumentsView(APIView):
                 Q(customer__user__email__icontains=customer_filter)
             )
         
-        serializer = KYCDocumentSerializer(documents, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(kyc_document_rows(documents, request))
 
 
 class AdminKYCDocumentDetailView(APIView):
@@ -1872,10 +1976,11 @@ class AdminKYCDocumentDetailView(APIView):
                 customer.kyc_verified_at = timezone.now()
                 customer.kyc_verified_by = request.user
                 customer.save(update_fields=['kyc_status', 'kyc_verified_at', 'kyc_verified_by'])
+                emit_ops_event('kyc.reviewed', kyc_event_data(customer), counts=['kyc_documents'])
                 
                 # Send verification email
                 from .emails import send_account_active_email
-                send_account_active_email.delay(customer.user.id)
+                enqueue_task(send_account_active_email, customer.user.id)
 
         serializer = KYCDocumentSerializer(document, context={'request': request})
         return Response(serializer.data)
@@ -1929,8 +2034,8 @@ class AdminKYCProfileDetailView(APIView):
             profile.kyc_rejection_reason = ''
             
             # Send KYC verification email
-            from .emails import send_kyc_status_email
-            send_kyc_status_email(profile, 'VERIFIED')
+            from .emails import send_kyc_status_email_task
+            enqueue_task(send_kyc_status_email_task, profile.id, 'VERIFIED')
             
         elif action == 'reject':
             rejection_reason = request.data.get('rejection_reason', '')
@@ -1944,10 +2049,11 @@ class AdminKYCProfileDetailView(APIView):
             profile.kyc_verified_by = None
             
             # Send KYC rejection email
-            from .emails import send_kyc_status_email
-            send_kyc_status_email(profile, 'REJECTED', rejection_reason)
+            from .emails import send_kyc_status_email_task
+            enqueue_task(send_kyc_status_email_task, profile.id, 'REJECTED', rejection_reason)
         
         profile.save()
+        emit_ops_event('kyc.reviewed', kyc_event_data(profile), counts=['kyc_documents'])
         
         # Create notification for the customer
         from .services import create_notification
@@ -2208,10 +2314,8 @@ class NotificationsView(APIView):
         total_count = notifications.count()
         notifications_page = notifications[start:end]
         
-        serializer = NotificationSerializer(notifications_page, many=True)
-        
         return Response({
-            'notifications': serializer.data,
+            'notifications': notification_rows(notifications_page),
             'total_count': total_count,
             'page': page,
             'page_size': page_size,
@@ -2259,9 +2363,7 @@ class NotificationDetailView(APIView):
             if serializer.validated_data['is_read'] and not notification.is_read:
                 notification.mark_as_read()
             elif not serializer.validated_data['is_read'] and notification.is_read:
-                notification.is_read = False
-                notification.read_at = None
-                notification.save(update_fields=['is_read', 'read_at'])
+                notification.mark_as_unread()
 
         return Response(NotificationSerializer(notification).data)
 
@@ -2272,18 +2374,17 @@ class NotificationMarkAllReadView(APIView):
 
     def post(self, request):
         """Mark all unread notifications as read"""
-        unread_notifications = Notification.objects.filter(
-            customer=request.user.profile,
-            is_read=False
-        )
+        from .services import adjust_unread_count
         
-        count = unread_notifications.count()
+        customer = request.user.profile
         
-        # Bulk update
-        unread_notifications.update(
+        # Bulk update, the affected row count is the number of newly read notifications
+        count = Notification.objects.filter(customer=customer, is_read=False).update(
             is_read=True,
             read_at=timezone.now()
         )
+        if count:
+            adjust_unread_count(customer.id, -count)
         
         return Response({
             'detail': f'Marked {count} notifications as read',
@@ -2297,12 +2398,9 @@ class NotificationUnreadCountView(APIView):
 
     def get(self, request):
         """Get count of unread notifications"""
-        count = Notification.objects.filter(
-            customer=request.user.profile,
-            is_read=False
-        ).count()
+        from .services import get_unread_count
         
-        return Response({'unread_count': count})
+        return Response({'unread_count': get_unread_count(request.user.profile.id)})
 
 
 class NotificationDeleteView(APIView):
@@ -2311,15 +2409,55 @@ class NotificationDeleteView(APIView):
 
     def delete(self, request, pk):
         """Delete a notification"""
-        try:
-            notification = Notification.objects.get(pk=pk, customer=request.user.profile)
-            notification.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Notification.DoesNotExist:
+        from .services import adjust_unread_count
+        
+        customer_id = request.user.profile.id
+        notification = Notification.objects.filter(pk=pk, customer_id=customer_id)
+        # The unread row is deleted conditionally, so a concurrent mark as read
+        # and this delete never both take it off the counter
+        unread_deleted, _ = notification.filter(is_read=False).delete()
+        if unread_deleted:
+            adjust_unread_count(customer_id, -1)
+        elif not notification.delete()[0]:
             return Response(
                 {'detail': 'Notification not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AdminNotificationBroadcastView(APIView):
+    """Broadcast a notification to a customer segment"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        from .serializers import NotificationBroadcastSerializer
+        from .services import get_broadcast_recipients
+        from .tasks import broadcast_notification_task
+
+        serializer = NotificationBroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        segment_value = serializer.segment_value
+
+        recipients = get_broadcast_recipients(data['segment'], segment_value).count()
+        enqueue_task(
+            broadcast_notification_task,
+            segment=data['segment'],
+            title=data['title'],
+            message=data['message'],
+            segment_value=segment_value,
+            notification_type=data['notification_type'],
+            priority=data['priority'],
+            action_url=data['action_url'],
+            metadata={'sent_by': request.user.id},
+        )
+
+        return Response({
+            'segment': data['segment'],
+            'segment_value': segment_value,
+            'recipients': recipients,
+        }, status=status.HTTP_202_ACCEPTED)
 
 # ============ Tax Refund Views ============
 
@@ -2990,6 +3128,84 @@ class AdminActivityLogView(APIView):
         })
 
 
+class AdminActivityLogExportView(APIView):
+    """Stream the platform activity log or the ledger audit as NDJSON or CSV"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        import csv
+        import json
+        from django.http import StreamingHttpResponse
+        from .activity_log import (
+            ACTIVITY_EXPORT_FIELDS, LEDGER_EXPORT_FIELDS,
+            iter_ledger_audit, iter_platform_activity,
+        )
+
+        # `format` is reserved by DRF for renderer selection
+        export_format = request.query_params.get('export_format', 'ndjson').lower()
+        dataset = request.query_params.get('dataset', 'activity').lower()
+        if export_format not in ('ndjson', 'csv'):
+            return Response({'detail': 'export_format must be ndjson or csv.'}, status=status.HTTP_400_BAD_REQUEST)
+        if dataset not in ('activity', 'ledger'):
+            return Response({'detail': 'dataset must be activity or ledger.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.query_params.get('user_id')
+        activity_types = request.query_params.getlist('activity_type')
+        try:
+            user_id = int(user_id) if user_id else None
+            date_from = request.query_params.get('date_from')
+            date_to = request.query_params.get('date_to')
+            date_from = datetime.fromisoformat(date_from.replace('Z', '+00:00')) if date_from else None
+            date_to = datetime.fromisoformat(date_to.replace('Z', '+00:00')) if date_to else None
+        except ValueError:
+            return Response({'detail': 'Invalid user_id or date filter.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if dataset == 'ledger':
+            rows = iter_ledger_audit(
+                user_id=user_id,
+                entry_types=activity_types or None,
+                date_from=date_from,
+                date_to=date_to,
+            )
+            fields = LEDGER_EXPORT_FIELDS
+        else:
+            rows = iter_platform_activity(
+                activity_types=activity_types or None,
+                user_id=user_id,
+                date_from=date_from,
+                date_to=date_to,
+            )
+            fields = ACTIVITY_EXPORT_FIELDS
+
+        if export_format == 'csv':
+            class Echo:
+                def write(self, value):
+                    return value
+
+            writer = csv.writer(Echo())
+
+            def stream():
+                yield writer.writerow(fields)
+                for row in rows:
+                    yield writer.writerow([
+                        json.dumps(row[field]) if isinstance(row[field], dict) else row[field]
+                        for field in fields
+                    ])
+
+            content_type = 'text/csv'
+        else:
+            def stream():
+                for row in rows:
+                    yield json.dumps(row) + '\n'
+
+            content_type = 'application/x-ndjson'
+
+        filename = f"{dataset}-export-{timezone.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+        response = StreamingHttpResponse(stream(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 class AdminUserActivityView(APIView):
     """Get activity log for a specific user"""
     permission_classes = [permissions.IsAdminUser]
@@ -3189,4 +3405,131 @@ class AdminTelegramConfigView(APIView):
         serializer = TelegramConfigSerializer(instance=config, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        
+        from .telegram import invalidate_telegram_config
+        invalidate_telegram_config()
         return Response(serializer.data)
+
+
+class AdminTaskQueuesView(APIView):
+    """Live Celery queue depths and per-worker load (Admin only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from .metrics import celery_queue_depths, celery_worker_load
+
+        try:
+            queues = celery_queue_depths()
+        except Exception as e:
+            return Response(
+                {'detail': f'Broker unavailable: {e}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        # Workers that do not answer the broadcast in time are simply missing
+        workers, workers_error = {}, None
+        try:
+            workers = celery_worker_load()
+        except Exception as e:
+            workers_error = str(e)
+        return Response({
+            'queues': queues,
+            'total_waiting': sum(queues.values()),
+            'workers': workers,
+            'workers_error': workers_error,
+            'checked_at': timezone.now().isoformat(),
+        })
+
+
+class AdminRequestProfileTokenView(APIView):
+    """Issue a short-lived token that makes the next requests carrying it get profiled (Admin only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        from .profiling import PROFILE_QUERY_PARAM, issue_token
+
+        try:
+            uses = int(request.data.get('uses', settings.REQUEST_PROFILE_TOKEN_USES))
+        except (TypeError, ValueError):
+            return Response({'detail': 'uses must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        uses = min(max(uses, 1), settings.REQUEST_PROFILE_TOKEN_MAX_USES)
+
+        return Response({
+            'token': issue_token(request.user, uses=uses),
+            'header': 'X-Snel-Profile',
+            'query_param': PROFILE_QUERY_PARAM,
+            'uses': uses,
+            'expires_in': settings.REQUEST_PROFILE_TOKEN_MAX_AGE,
+        }, status=status.HTTP_201_CREATED)
+
+
+class AdminRequestProfilesView(APIView):
+    """Stored request profiles, newest first (Admin only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        profiles = RequestProfile.objects.select_related('requested_by', 'user').defer('sql_trace', 'summary')
+        route = request.query_params.get('route')
+        if route:
+            profiles = profiles.filter(route=route)
+        serializer = RequestProfileListSerializer(profiles[:limit], many=True)
+        return Response(serializer.data)
+
+
+class AdminRequestProfileDetailView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        try:
+            profile = RequestProfile.objects.select_related('requested_by', 'user').get(pk=pk)
+        except RequestProfile.DoesNotExist:
+            return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(RequestProfileDetailSerializer(profile).data)
+
+    def delete(self, request, pk):
+        profile = RequestProfile.objects.filter(pk=pk).first()
+        if not profile:
+            return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        profile.profile_file.delete(save=False)
+        profile.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AdminRequestProfileDownloadView(APIView):
+    """Raw profiler output: a pstats dump for cProfile, an HTML flame view for pyinstrument"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        from django.http import FileResponse
+
+        profile = RequestProfile.objects.filter(pk=pk).first()
+        if not profile or not profile.profile_file:
+            return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        extension = profile.profile_file.name.rsplit('.', 1)[-1]
+        return FileResponse(
+            profile.profile_file.open('rb'),
+            as_attachment=True,
+            filename=f'request-profile-{profile.pk}.{extension}',
+            content_type='text/html' if extension == 'html' else 'application/octet-stream',
+        )
+
+
+class AdminSlowQueriesView(APIView):
+    """Slowest statements grouped by SQL fingerprint, worst total time first (Admin only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from .slow_queries import top_offenders
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+            'offenders': top_offenders(limit, request.query_params.get('source')),
+        })
@@ -0,0 +1,57 @@
+"""
+WebSocket Frame Encoding
+Clients of the notification and support chat sockets may negotiate the
+snel.msgpack.v1 subprotocol to receive MessagePack binary frames instead of
+JSON text frames. The frame contents are identical in both formats.
+
+Group messages that fan out to many sockets carry only their client frame,
+already encoded in both formats (with_frames), so the encoding happens once
+per group_send instead of once per receiving consumer. The raw payload is
+left out: the channel layer serializes the whole message for every channel,
+and the consumers only forward the frame. Messages without frames (sent by
+older code) are still encoded by the consumer.
+"""
+import json
+from typing import Any, Callable, Dict, Union
+
+import msgpack
+
+MSGPACK_SUBPROTOCOL = 'snel.msgpack.v1'
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+
+def encode(frame: Dict[str, Any], frame_format: str) -> Union[str, bytes]:
+    if frame_format == MSGPACK:
+        return msgpack.packb(frame, use_bin_type=True)
+    return json.dumps(frame)
+
+
+def decode(data: bytes) -> Dict[str, Any]:
+    return msgpack.unpackb(data, raw=False)
+
+
+# Client frame for each group message type that is pre-encoded, built from the
+# same keys the consumers handled before frames existed
+FRAME_BUILDERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    'notification_message': lambda message: {'type': 'notification', 'notification': message['notification']},
+    'unread_count': lambda message: {'type': 'unread_count', 'unread_count': message['unread_count']},
+    'chat_message': lambda message: {'type': 'message', 'message': message['message']},
+}
+
+
+def client_frame(message: Dict[str, Any]) -> Dict[str, Any]:
+    return FRAME_BUILDERS[message['type']](message)
+
+
+def with_frames(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the group message reduced to its type and its client frame
+    pre-encoded for every format. Message types without a frame builder are
+    returned unchanged.
+    """
+    builder = FRAME_BUILDERS.get(message['type'])
+    if builder is None or 'frames' in message:
+        return message
+    frame = builder(message)
+    return {'type': message['type'], 'frames': {JSON: encode(frame, JSON), MSGPACK: encode(frame, MSGPACK)}}
@@ -23,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bank.metrics.RequestMetricsMiddleware',
+    'bank.profiling.RequestProfilerMiddleware',
+    'bank.slow_queries.SlowQueryContextMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -97,7 +100,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'bank.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -121,6 +124,86 @@ CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
 CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true'
 
+# Periodic tasks, run with `celery -A banking beat`
+from celery.schedules import crontab
+CELERY_BEAT_SCHEDULE = {
+    'apply-notification-retention': {
+        'task': 'bank.tasks.apply_notification_retention',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'archive-email-bodies': {
+        'task': 'bank.tasks.archive_email_bodies',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'rebuild-notification-counters': {
+        'task': 'bank.tasks.rebuild_notification_counters',
+        'schedule': crontab(hour=4, minute=30),
+    },
+    # Safety net, commits normally wake the dispatcher straight away
+    'dispatch-outbox': {
+        'task': 'bank.tasks.dispatch_outbox',
+        'schedule': 15.0,
+    },
+    'sweep-support-presence': {
+        'task': 'bank.tasks.sweep_support_presence',
+        'schedule': 30.0,
+    },
+    'purge-outbox': {
+        'task': 'bank.tasks.purge_outbox',
+        'schedule': crontab(hour=5, minute=0),
+    },
+    'collect-email-blobs': {
+        'task': 'bank.tasks.collect_email_blobs',
+        'schedule': crontab(hour=5, minute=30),
+    },
+    'purge-request-profiles': {
+        'task': 'bank.tasks.purge_request_profiles',
+        'schedule': crontab(minute=15),
+    },
+}
+
+# Unreferenced email attachment blobs younger than this are kept by the GC
+EMAIL_BLOB_GC_GRACE_SECONDS = int(os.environ.get('EMAIL_BLOB_GC_GRACE_SECONDS', '3600'))
+
+# Transactional outbox for emails, Telegram alerts and WebSocket pushes
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', '5'))
+OUTBOX_RETRY_MAX_SECONDS = int(os.environ.get('OUTBOX_RETRY_MAX_SECONDS', '3600'))
+OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', '7'))
+# Claimed messages are skipped by other workers for this long, keep it above the slowest delivery
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '300'))
+
+# Telegram alerts, bursts within the coalesce window are sent as one digest
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+TELEGRAM_COALESCE_SECONDS = int(os.environ.get('TELEGRAM_COALESCE_SECONDS', '5'))
+TELEGRAM_CONFIG_CACHE_SECONDS = int(os.environ.get('TELEGRAM_CONFIG_CACHE_SECONDS', '60'))
+TELEGRAM_TIMEOUT_SECONDS = int(os.environ.get('TELEGRAM_TIMEOUT_SECONDS', '5'))
+
+# Notification retention, policies are applied in order by the nightly job.
+# Optional filters: notification_type, priority (lists) and is_read.
+NOTIFICATION_RETENTION_POLICIES = [
+    {
+        'name': 'delete_read_low_priority',
+        'priority': ['LOW'],
+        'is_read': True,
+        'older_than_days': int(os.environ.get('NOTIFICATION_RETENTION_LOW_DAYS', '30')),
+        'action': 'DELETE',
+    },
+    {
+        'name': 'archive_old',
+        'older_than_days': int(os.environ.get('NOTIFICATION_ARCHIVE_DAYS', '365')),
+        'action': 'ARCHIVE',
+    },
+]
+NOTIFICATION_RETENTION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_RETENTION_BATCH_SIZE', '5000'))
+
+# Outgoing email audit rows keep their headers forever, bodies only this long (0 keeps them).
+# ARCHIVE copies the bodies to gzipped JSON lines in media storage first, DELETE drops them.
+OUTGOING_EMAIL_BODY_RETENTION_DAYS = int(os.environ.get('OUTGOING_EMAIL_BODY_RETENTION_DAYS', '180'))
+OUTGOING_EMAIL_BODY_RETENTION_ACTION = os.environ.get('OUTGOING_EMAIL_BODY_RETENTION_ACTION', 'ARCHIVE')
+OUTGOING_EMAIL_BODY_RETENTION_BATCH_SIZE = int(os.environ.get('OUTGOING_EMAIL_BODY_RETENTION_BATCH_SIZE', '1000'))
+
 # JWT Configuration
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -166,6 +249,9 @@ else:
     AUDIT_EMAIL_INNER_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
     EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
+# Keep one SMTP connection open per worker process instead of one per email
+AUDIT_EMAIL_PERSISTENT_CONNECTION = os.environ.get('AUDIT_EMAIL_PERSISTENT_CONNECTION', 'true').lower() == 'true'
+
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL') or os.environ.get('EMAIL_HOST_USER') or 'no-reply@snelroi.local'
 
 # Frontend URL for email links
@@ -197,6 +283,67 @@ LOGGING = {
     },
 }
 
+# Shared cache, Redis when REDIS_CACHE_URL is set (e.g. redis://redis:6379/1)
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL', '')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Authenticated users (with their profile) are cached by id for HTTP and WebSocket auth.
+# The per-process copy cannot be invalidated remotely, so keep it short.
+AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', '60'))
+AUTH_USER_LOCAL_CACHE_SECONDS = int(os.environ.get('AUTH_USER_LOCAL_CACHE_SECONDS', '5'))
+
+# Support conversations embed and page messages in pages of this size
+SUPPORT_MESSAGE_PAGE_SIZE = int(os.environ.get('SUPPORT_MESSAGE_PAGE_SIZE', '50'))
+SUPPORT_MESSAGE_PAGE_MAX = int(os.environ.get('SUPPORT_MESSAGE_PAGE_MAX', '200'))
+
+# Notification sockets replay at most this many missed notifications on resume,
+# a client further behind reloads its list. Acks are kept for the resume cursor.
+NOTIFICATION_RESUME_LIMIT = int(os.environ.get('NOTIFICATION_RESUME_LIMIT', '100'))
+NOTIFICATION_ACK_TTL_SECONDS = int(os.environ.get('NOTIFICATION_ACK_TTL_SECONDS', str(7 * 24 * 3600)))
+
+# Request and Celery task metrics on /metrics, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+# when it is set. Multi-process servers also need PROMETHEUS_MULTIPROC_DIR in the environment, and
+# METRICS_COLLECT_DIRS lists other processes' directories (e.g. Celery workers on a shared volume) to include.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_COLLECT_DIRS = [path for path in os.environ.get('METRICS_COLLECT_DIRS', '').split(',') if path]
+
+# Admins profile requests with a token from /api/admin/profiles/token/, good for
+# REQUEST_PROFILE_TOKEN_USES requests (up to REQUEST_PROFILE_TOKEN_MAX_USES on request)
+# within REQUEST_PROFILE_TOKEN_MAX_AGE seconds.
+# REQUEST_PROFILER is cprofile or pyinstrument (when installed, for HTML flame views).
+REQUEST_PROFILING_ENABLED = os.environ.get('REQUEST_PROFILING_ENABLED', 'true').lower() == 'true'
+REQUEST_PROFILER = os.environ.get('REQUEST_PROFILER', 'cprofile')
+REQUEST_PROFILE_TOKEN_MAX_AGE = int(os.environ.get('REQUEST_PROFILE_TOKEN_MAX_AGE', '900'))
+REQUEST_PROFILE_TOKEN_USES = int(os.environ.get('REQUEST_PROFILE_TOKEN_USES', '1'))
+REQUEST_PROFILE_TOKEN_MAX_USES = int(os.environ.get('REQUEST_PROFILE_TOKEN_MAX_USES', '20'))
+# Stored profiles are purged hourly past these limits
+REQUEST_PROFILE_MAX_STORED = int(os.environ.get('REQUEST_PROFILE_MAX_STORED', '200'))
+REQUEST_PROFILE_RETENTION_DAYS = int(os.environ.get('REQUEST_PROFILE_RETENTION_DAYS', '7'))
+
+# Statements slower than the threshold are kept, with their call site, in a ring buffer of this many rows
+SLOW_QUERY_CAPTURE_ENABLED = os.environ.get('SLOW_QUERY_CAPTURE_ENABLED', 'true').lower() == 'true'
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', '1000'))
+
+# Support chat presence, clients ping every 30s so a socket counts as live for 2.5 intervals
+PRESENCE_BACKEND = os.environ.get('PRESENCE_BACKEND', 'redis')
+PRESENCE_REDIS_URL = os.environ.get('PRESENCE_REDIS_URL', f"redis://{os.environ.get('REDIS_HOST', 'redis')}:6379/2")
+PRESENCE_TTL_SECONDS = int(os.environ.get('PRESENCE_TTL_SECONDS', '75'))
+PRESENCE_BATCH_SECONDS = float(os.environ.get('PRESENCE_BATCH_SECONDS', '1'))
+
 # Channels Configuration
 CHANNEL_LAYERS = {
     'default': {
@@ -2,7 +2,7 @@ import { LayoutDashboard, Users, CreditCard, Settings, LogOut, Wallet, Bitcoin,
 import { Link, useLocation } from "react-router-dom";
 import { cn } from "@/lib/utils";
 import { useEffect, useState } from "react";
-import { chatService } from "@/services/chatService";
+import { opsService } from "@/services/opsService";
 import { Badge } from "@/components/ui/badge";
 import { Logo } from "@/components/Logo";
 
@@ -27,17 +27,10 @@ export function Sidebar() {
   const [unreadCount, setUnreadCount] = useState(0);
 
   useEffect(() => {
-    const fetchUnread = async () => {
-      try {
-        const count = await chatService.getUnreadCount();
-        setUnreadCount(count);
-      } catch (err) {
-        console.error("Failed to fetch unread support messages", err);
-      }
-    };
-    fetchUnread();
-    const interval = setInterval(fetchUnread, 30000); // Poll every 30s
-    return () => clearInterval(interval);
+    // Counts arrive as a snapshot on connect, then with every ops event
+    return opsService.subscribe((counts) => {
+      if (counts.support_unread !== undefined) setUnreadCount(counts.support_unread);
+    });
   }, []);
 
   return (
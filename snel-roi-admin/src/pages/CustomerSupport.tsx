@@ -76,14 +76,13 @@ export default function CustomerSupport() {
   const loadConversations = async () => {
     try {
       setLoading(true);
-      const convs = await chatService.getConversations();
-      
-      // Filter by status
-      const filtered = statusFilter === 'all' 
-        ? convs 
-        : convs.filter(c => c.status === statusFilter.toUpperCase());
+      const params = new URLSearchParams({ page_size: '200' });
+      if (statusFilter !== 'all') {
+        params.set('status', statusFilter.toUpperCase());
+      }
+      const convs = await chatService.getConversations(params);
       
-      setConversations(filtered);
+      setConversations(convs);
     } catch (error) {
       toast.error('Failed to load conversations');
       console.error(error);
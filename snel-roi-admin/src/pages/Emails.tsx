@@ -41,6 +41,8 @@ export default function Emails() {
   const [items, setItems] = useState<OutgoingEmailListItem[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [isRefreshing, setIsRefreshing] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   const [q, setQ] = useState("");
   const [status, setStatus] = useState<string>("");
@@ -60,7 +62,8 @@ export default function Emails() {
   const fetchList = async () => {
     try {
       const data = await emailService.getAll(params);
-      setItems(data);
+      setItems(data.emails);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error("Failed to fetch emails", err);
     } finally {
@@ -69,6 +72,22 @@ export default function Emails() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const p = new URLSearchParams(params);
+      p.set("cursor", nextCursor);
+      const data = await emailService.getAll(p);
+      setItems((current) => [...current, ...data.emails]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Failed to fetch more emails", err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchList();
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -124,7 +143,7 @@ export default function Emails() {
             <Input
               value={q}
               onChange={(e) => setQ(e.target.value)}
-              placeholder="Search subject / to / from"
+              placeholder="Search subject / recipient"
             />
             <div className="flex gap-2">
               <Button
@@ -200,6 +219,14 @@ export default function Emails() {
           {items.length === 0 && (
             <div className="text-sm text-muted-foreground">No emails found.</div>
           )}
+
+          {nextCursor && (
+            <div className="flex justify-center">
+              <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                {isLoadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
 
@@ -290,6 +317,10 @@ export default function Emails() {
                           className="prose prose-sm max-w-none dark:prose-invert"
                           dangerouslySetInnerHTML={{ __html: detail.html_body }}
                         />
+                      ) : detail.body_archived_at ? (
+                        <div className="text-sm text-muted-foreground">
+                          Body archived on {formatDateTime(detail.body_archived_at)}.
+                        </div>
                       ) : (
                         <div className="text-sm text-muted-foreground">No HTML body.</div>
                       )}
@@ -39,6 +39,14 @@ export interface ConversationListItem {
     } | null;
 }
 
+export interface ConversationPage {
+    conversations: ConversationListItem[];
+    page: number;
+    page_size: number;
+    has_next: boolean;
+    has_previous: boolean;
+}
+
 export type ConnectionStatus = 'connected' | 'connecting' | 'disconnected' | 'reconnecting';
 
 interface WebSocketMessage {
@@ -70,8 +78,10 @@ class ChatService {
         });
     }
 
-    async getConversations(): Promise<ConversationListItem[]> {
-        return await apiRequest<ConversationListItem[]>('/support/conversations/');
+    async getConversations(params?: URLSearchParams): Promise<ConversationListItem[]> {
+        const query = params ? `?${params.toString()}` : '';
+        const page = await apiRequest<ConversationPage>(`/support/conversations/${query}`);
+        return page.conversations;
     }
 
     async getConversation(conversationId: number): Promise<SupportConversation> {
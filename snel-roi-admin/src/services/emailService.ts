@@ -37,13 +37,20 @@ export interface OutgoingEmailDetail {
   subject: string;
   text_body: string;
   html_body: string;
+  body_archived_at: string | null;
   attachments: OutgoingEmailAttachment[];
 }
 
+export interface OutgoingEmailPage {
+  emails: OutgoingEmailListItem[];
+  next_cursor: string | null;
+  has_next: boolean;
+}
+
 export const emailService = {
   getAll: async (params?: URLSearchParams) => {
     const queryString = params ? `?${params.toString()}` : "";
-    return apiRequest<OutgoingEmailListItem[]>(`/admin/emails/${queryString}`);
+    return apiRequest<OutgoingEmailPage>(`/admin/emails/${queryString}`);
   },
   getById: async (id: number) => {
     return apiRequest<OutgoingEmailDetail>(`/admin/emails/${id}/`);
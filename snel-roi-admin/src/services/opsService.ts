@@ -0,0 +1,121 @@
+export type PendingCounts = Partial<{
+    transactions: number;
+    kyc_documents: number;
+    loans: number;
+    virtual_cards: number;
+    tax_refunds: number;
+    grants: number;
+    crypto_deposits: number;
+    support_unread: number;
+}>;
+
+export interface OpsEvent {
+    event: string;
+    data: Record<string, unknown>;
+    counts: PendingCounts;
+    at: string;
+}
+
+type CountsHandler = (counts: PendingCounts) => void;
+type EventHandler = (event: OpsEvent) => void;
+
+class OpsService {
+    private socket: WebSocket | null = null;
+    private counts: PendingCounts = {};
+    private countsHandlers = new Set<CountsHandler>();
+    private eventHandlers = new Set<EventHandler>();
+    private reconnectAttempts = 0;
+    private reconnectTimeout: ReturnType<typeof setTimeout> | null = null;
+    private heartbeatInterval: ReturnType<typeof setInterval> | null = null;
+
+    subscribe(onCounts: CountsHandler, onEvent?: EventHandler): () => void {
+        this.countsHandlers.add(onCounts);
+        if (onEvent) this.eventHandlers.add(onEvent);
+        onCounts(this.counts);
+        if (!this.socket) this.connect();
+
+        return () => {
+            this.countsHandlers.delete(onCounts);
+            if (onEvent) this.eventHandlers.delete(onEvent);
+            if (this.countsHandlers.size === 0 && this.eventHandlers.size === 0) this.disconnect();
+        };
+    }
+
+    private connect() {
+        const token = localStorage.getItem('admin_token');
+        if (!token) return;
+        const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
+
+        let wsProtocol = 'ws:';
+        let wsHost = window.location.hostname + ':8000';
+
+        if (apiUrl.startsWith('http')) {
+            const url = new URL(apiUrl);
+            wsProtocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+            wsHost = url.host;
+        }
+
+        this.socket = new WebSocket(`${wsProtocol}//${wsHost}/ws/admin/ops/?token=${token}`);
+
+        this.socket.onopen = () => {
+            this.reconnectAttempts = 0;
+            this.heartbeatInterval = setInterval(() => {
+                if (this.socket?.readyState === WebSocket.OPEN) {
+                    this.socket.send(JSON.stringify({ type: 'ping' }));
+                }
+            }, 30000);
+        };
+
+        this.socket.onmessage = (message) => {
+            let data;
+            try {
+                data = JSON.parse(message.data);
+            } catch {
+                return;
+            }
+            if (data.type === 'ops_snapshot') {
+                this.updateCounts(data.counts);
+            } else if (data.type === 'ops_event') {
+                this.updateCounts(data.counts);
+                this.eventHandlers.forEach((handler) => handler(data as OpsEvent));
+            }
+        };
+
+        this.socket.onclose = (event) => {
+            this.stopHeartbeat();
+            this.socket = null;
+            // 4001 means the token is not a staff token, retrying will not help
+            if (event.code !== 4001 && event.code !== 1000) this.scheduleReconnect();
+        };
+    }
+
+    private updateCounts(counts: PendingCounts) {
+        this.counts = { ...this.counts, ...counts };
+        this.countsHandlers.forEach((handler) => handler(this.counts));
+    }
+
+    private scheduleReconnect() {
+        this.reconnectAttempts += 1;
+        const delay = Math.min(1000 * Math.pow(2, this.reconnectAttempts - 1), 30000);
+        this.reconnectTimeout = setTimeout(() => this.connect(), delay);
+    }
+
+    private stopHeartbeat() {
+        if (this.heartbeatInterval) {
+            clearInterval(this.heartbeatInterval);
+            this.heartbeatInterval = null;
+        }
+    }
+
+    private disconnect() {
+        if (this.reconnectTimeout) {
+            clearTimeout(this.reconnectTimeout);
+            this.reconnectTimeout = null;
+        }
+        this.stopHeartbeat();
+        this.socket?.close(1000);
+        this.socket = null;
+    }
+}
+
+export const opsService = new OpsService();
@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useEffect, ReactNode, useCallback } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef, ReactNode, useCallback } from 'react';
 import { useQuery, useQueryClient, useMutation } from '@tanstack/react-query';
 import { notificationService, Notification, NotificationFilters } from '@/services/notificationService';
 import { useAuth } from './AuthContext';
@@ -27,6 +27,8 @@ export const NotificationProvider: React.FC<{ children: ReactNode }> = ({ childr
   const [filters, setFilters] = useState<NotificationFilters>({ page: 1, page_size: 20 });
   const [websocket, setWebsocket] = useState<WebSocket | null>(null);
   const [error, setError] = useState<string | null>(null);
+  // Highest notification id seen over the socket, sent as the resume cursor on reconnect
+  const lastIdRef = useRef<number | null>(null);
 
   // Query for notifications
   const {
@@ -111,6 +113,15 @@ export const NotificationProvider: React.FC<{ children: ReactNode }> = ({ childr
       ws.onopen = () => {
         console.log('Notification WebSocket connected');
         setError(null);
+        // Ask only for what was missed, the server falls back to our last ack
+        ws.send(JSON.stringify({ type: 'resume', last_id: lastIdRef.current }));
+      };
+
+      const acknowledge = (id: number) => {
+        if (lastIdRef.current === null || id > lastIdRef.current) {
+          lastIdRef.current = id;
+          ws.send(JSON.stringify({ type: 'ack', notification_id: id }));
+        }
       };
 
       ws.onmessage = (event) => {
@@ -130,6 +141,14 @@ export const NotificationProvider: React.FC<{ children: ReactNode }> = ({ childr
 
             // Update queries
             queryClient.invalidateQueries({ queryKey: ['notifications'] });
+            acknowledge(notification.id);
+            
+          } else if (data.type === 'resume') {
+            // has_more means we were too far behind to replay, so reload the list
+            if (data.has_more || data.notifications.length > 0) {
+              queryClient.invalidateQueries({ queryKey: ['notifications'] });
+            }
+            if (data.last_id !== null) acknowledge(data.last_id);
             
           } else if (data.type === 'connection_established') {
             console.log('Notification WebSocket connection established');
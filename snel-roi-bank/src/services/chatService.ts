@@ -39,6 +39,14 @@ export interface ConversationListItem {
     } | null;
 }
 
+export interface ConversationPage {
+    conversations: ConversationListItem[];
+    page: number;
+    page_size: number;
+    has_next: boolean;
+    has_previous: boolean;
+}
+
 export type ConnectionStatus = 'connected' | 'connecting' | 'disconnected' | 'reconnecting';
 
 interface WebSocketMessage {
@@ -77,7 +85,8 @@ class ChatService {
      * Get all conversations for current user
      */
     async getConversations(): Promise<ConversationListItem[]> {
-        return await apiRequest<ConversationListItem[]>('/support/conversations/');
+        const page = await apiRequest<ConversationPage>('/support/conversations/');
+        return page.conversations;
     }
 
     /**